@@ -0,0 +1,55 @@
+# Benchmark for $calc on typical expressions
+# Times the tokenizer, compiling to a program (Shunting Yard) and evaluating compiled programs in-process,
+# then the full path through the worker process (uncached, as used for expressions with `rand`) and the result cache
+# Usage: python -m benchmarks.calculator [repeats]
+
+from sys import argv
+from timeit import timeit
+
+from src.calculator import calculate, calculate_pure, calculator, CALC_TIMEOUT, compile_expression, evaluate, tokenize
+from src.process_worker import run_killable
+
+
+DEFAULT_REPEATS = 2_000
+
+EXPRESSIONS = ("6 * 7", "sin(pi/2)", "2(3+4)", "-2^2", "10!/8!", "deg(asin(1))", "sqrt(16) + abs(-3) * 2pi",
+               "(1+2)(3+4) % 5", "log(1000) - ln(e)", "((((1+2)*3)-4)/5)^2", "2^100", "100!", "1.5 ^ 3.25 / tau")
+RANGE_EXPRESSION = "sin(x)^2 + x for x in 0..100"
+
+
+def report(name, elapsed, count):
+    print(f"{name:<32} {elapsed / count * 1_000_000:>10.2f} us/value")
+
+def main():
+    repeats = int(argv[1]) if len(argv) > 1 else DEFAULT_REPEATS
+    count = repeats * len(EXPRESSIONS)
+
+    print(f"{len(EXPRESSIONS)} expressions x {repeats:,}\n")
+
+    report("tokenize", timeit(lambda: [tokenize(i) for i in EXPRESSIONS], number=repeats), count)
+
+    def compile_uncached():
+        compile_expression.cache_clear()
+
+        return [compile_expression(i) for i in EXPRESSIONS]
+
+    report("tokenize + shunting yard", timeit(compile_uncached, number=repeats), count)
+    programs = compile_uncached()
+    report("evaluate compiled", timeit(lambda: [evaluate(i) for i in programs], number=repeats), count)
+    report("calculator (compiled cached)", timeit(lambda: [calculator(i) for i in EXPRESSIONS], number=repeats), count)
+
+    # One program evaluated across a range, as for `$calc sin(x)^2 + x for x in 0..100`
+    report("range of 101 values", timeit(lambda: calculator(RANGE_EXPRESSION), number=repeats) / 101, repeats)
+
+    # Worker round trips are far slower, fewer of them are timed
+    worker_repeats = max(1, repeats // 20)
+    run_killable(calculator, "1", timeout=CALC_TIMEOUT)
+    report("worker process (uncached)", timeit(lambda: [run_killable(calculator, i, timeout=CALC_TIMEOUT) for i in EXPRESSIONS],
+                                               number=worker_repeats), worker_repeats * len(EXPRESSIONS))
+
+    calculate_pure.cache_clear()
+    report("calculate (cached)", timeit(lambda: [calculate(i) for i in EXPRESSIONS], number=repeats), count)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# Benchmark for the $diff engine on realistic file pairs
+# Compares difflib.SequenceMatcher (the previous engine) against LineMatcher in src/functions/diff.py
+# Usage: python -m benchmarks.diff [line_count]
+
+from difflib import SequenceMatcher
+from random import choice, randint, random, seed
+from sys import argv
+from timeit import timeit
+
+from src.functions.diff import LineMatcher
+
+
+DEFAULT_LINE_COUNT = 20_000
+REPEATS = 3
+
+WORDS = ("the", "quick", "brown", "fox", "jumps", "over", "lazy", "dog", "python", "discord", "server",
+         "return", "self", "value", "index", "line", "file", "guild", "message", "channel")
+# Lines that repeat throughout real files (blank lines, closing brackets, separators)
+COMMON_LINES = ('\n', "}\n", "    return\n", "---\n", "        pass\n")
+
+
+def make_line():
+    if random() < 0.2:
+        return choice(COMMON_LINES)
+
+    return ' ' * 4 * randint(0, 3) + ' '.join(choice(WORDS) for _ in range(randint(2, 10))) + '\n'
+
+def make_file(count):
+    return [make_line() for _ in range(count)]
+
+# A few percent of lines edited in place, inserted or deleted
+def scattered_edits(lines, rate=0.02):
+    edited = []
+
+    for line in lines:
+        if (roll := random()) < rate / 3:
+            continue
+        elif roll < rate * 2 / 3:
+            edited.append(make_line())
+        elif roll < rate:
+            edited.extend((line, make_line()))
+        else:
+            edited.append(line)
+
+    return edited
+
+# A large block moved from the start to the end of the file
+def moved_block(lines):
+    size = len(lines) // 5
+
+    return lines[size:] + lines[:size]
+
+# Every line of the second half is rewritten
+def rewritten_half(lines):
+    half = len(lines) // 2
+
+    return lines[:half] + make_file(len(lines) - half)
+
+def count_changes(matcher):
+    return sum(max(i2 - i1, j2 - j1) for tag, i1, i2, j1, j2 in matcher.get_opcodes() if tag != "equal")
+
+def main():
+    count = int(argv[1]) if len(argv) > 1 else DEFAULT_LINE_COUNT
+    seed(0)
+    original = make_file(count)
+    pairs = (("identical", list(original)),
+             ("2% scattered edits", scattered_edits(original)),
+             ("moved block", moved_block(original)),
+             ("rewritten half", rewritten_half(original)))
+
+    print(f"{count:,} lines per file\n")
+    print(f"{'pair':<20} {'engine':<16} {'time':>10} {'changed lines':>14}")
+
+    for name, edited in pairs:
+        for engine, make_matcher in (("SequenceMatcher", lambda: SequenceMatcher(None, original, edited)),
+                                     ("LineMatcher", lambda: LineMatcher(original, edited))):
+            elapsed = min(timeit(lambda: make_matcher().get_opcodes(), number=1) for _ in range(REPEATS))
+            print(f"{name:<20} {engine:<16} {elapsed * 1000:>8.1f}ms {count_changes(make_matcher()):>14,}")
+
+
+if __name__ == "__main__":
+    main()
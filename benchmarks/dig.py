@@ -0,0 +1,136 @@
+# Benchmark for $dig +trace against a local stub DNS hierarchy, so no real nameservers are needed
+# Every zone has one fast and one slow server, the slow ones answering after SLOW_DELAY. The trace is timed trying
+# one server at a time (the previous behaviour) and racing TRACE_RACE_WIDTH servers, both with a cold and a warm cache.
+# A batch of BATCH_NAMES lookups is then timed one at a time (-j 1) and with the default in-flight limit
+# Usage: python -m benchmarks.dig [runs]
+
+from asyncio import DatagramProtocol, get_running_loop, run
+from statistics import median
+from sys import argv
+from time import perf_counter
+
+import dns.message
+import dns.rrset
+
+import src.functions.dig as dig_module
+from src.functions.dig import DEFAULT_BATCH_LIMIT, dig, DigOptions, DNS_CACHE, trace_lookup
+
+
+DEFAULT_RUNS = 5
+FAST_DELAY = 0.02
+SLOW_DELAY = 0.4
+TTL = 300
+BATCH_NAMES = 40
+
+RESOLVER = "127.0.0.10"
+# address -> (delay, zone it serves)
+SERVERS = {
+    # Root, delegates test. to nameservers without glue, which the resolver has to look up
+    "127.0.0.1": (FAST_DELAY, "root"),
+    "127.0.0.2": (SLOW_DELAY, "root"),
+    # test., delegates sub.test. with glue
+    "127.0.0.3": (FAST_DELAY, "test"),
+    "127.0.0.4": (SLOW_DELAY, "test"),
+    # sub.test., authoritative for www.sub.test.
+    "127.0.0.5": (FAST_DELAY, "sub"),
+    "127.0.0.6": (SLOW_DELAY, "sub"),
+    RESOLVER: (FAST_DELAY, "resolver"),
+}
+ZONES = {
+    "root": {"authority": ["test. {ttl} IN NS ns1.nameservers.example.", "test. {ttl} IN NS ns2.nameservers.example."]},
+    "test": {"authority": ["sub.test. {ttl} IN NS ns1.sub.test.", "sub.test. {ttl} IN NS ns2.sub.test."],
+             "additional": ["ns1.sub.test. {ttl} IN A 127.0.0.5", "ns2.sub.test. {ttl} IN A 127.0.0.6"]},
+    "sub": {"answer": ["{qname} {ttl} IN A 192.0.2.1"]},
+    "resolver": {},
+}
+RESOLVER_ADDRESSES = {"ns1.nameservers.example.": "127.0.0.3", "ns2.nameservers.example.": "127.0.0.4"}
+
+
+def make_rrset(record, qname):
+    name, ttl, rdclass, rdtype, data = record.format(ttl=TTL, qname=qname).split(' ', 4)
+
+    return dns.rrset.from_text(name, int(ttl), rdclass, rdtype, data)
+
+
+class StubServer(DatagramProtocol):
+    def __init__(self, delay, zone):
+        self.delay = delay
+        self.zone = zone
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        query = dns.message.from_wire(data)
+        question = query.question[0]
+        response = dns.message.make_response(query)
+        qname = question.name.to_text()
+
+        if self.zone == "resolver":
+            if question.rdtype == dns.rdatatype.A and (address := RESOLVER_ADDRESSES.get(qname.lower())):
+                response.answer.append(dns.rrset.from_text(qname, TTL, "IN", "A", address))
+        else:
+            for section, records in ZONES[self.zone].items():
+                getattr(response, section).extend(make_rrset(i, qname) for i in records)
+
+        get_running_loop().call_later(self.delay, self.transport.sendto, response.to_wire(), addr)
+
+
+async def start_servers(port):
+    loop = get_running_loop()
+
+    return [(await loop.create_datagram_endpoint(lambda i=i: StubServer(*i), local_addr=(address, port)))[0]
+            for address, i in SERVERS.items()]
+
+async def time_trace(options, runs, cold):
+    times = []
+
+    for _ in range(runs):
+        if cold:
+            DNS_CACHE.entries.clear()
+
+        start = perf_counter()
+        output = await trace_lookup(options, root_servers=["127.0.0.1", "127.0.0.2"])
+        times.append(perf_counter() - start)
+
+    assert "192.0.2.1" in output, output
+
+    return median(times)
+
+async def time_batch(port, limit, runs):
+    times = []
+
+    for _ in range(runs):
+        start = perf_counter()
+        result = await dig(f"@127.0.0.5 -p {port} -j {limit} +short", stdin=iter(f"host{i}.sub.test" for i in range(BATCH_NAMES)))
+        times.append(perf_counter() - start)
+
+    assert result.stdout.count("192.0.2.1") == BATCH_NAMES, result
+
+    return median(times)
+
+async def main():
+    runs = int(argv[1]) if len(argv) > 1 else DEFAULT_RUNS
+    transports = await start_servers(port := 5300)
+    # +nodnssec keeps the stub's answers plain, the priming query goes to the resolver
+    options = DigOptions(f"@{RESOLVER} -p {port} www.sub.test +trace +nodnssec")
+
+    try:
+        for width in (1, dig_module.TRACE_RACE_WIDTH):
+            dig_module.TRACE_RACE_WIDTH = width
+
+            for cold in (True, False):
+                print(f"race width {width}, {'cold' if cold else 'warm'} cache: {await time_trace(options, runs, cold) * 1000:>8.1f} ms")
+
+        print()
+
+        for limit in (1, DEFAULT_BATCH_LIMIT):
+            print(f"{BATCH_NAMES} names, -j {limit:<2}:               {await time_batch(port, limit, runs) * 1000:>8.1f} ms")
+    finally:
+        for transport in transports:
+            transport.close()
+
+
+if __name__ == "__main__":
+    run(main())
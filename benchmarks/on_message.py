@@ -0,0 +1,81 @@
+# Micro-benchmark for the regex heuristics run by on_message on ordinary (non-command) messages
+# Compares the previous inline `re.search` calls against the precompiled helpers in src/patterns.py
+# Usage: python -m benchmarks.on_message [message_count]
+
+from random import choice, randint, seed
+from re import findall, search
+from sys import argv
+from timeit import timeit
+
+from src.patterns import find_votes, has_url, is_tag_only, mentions_bot, starts_with_vote
+
+
+DEFAULT_MESSAGE_COUNT = 20_000
+REPEATS = 5
+REPLY_CHANCE = 1
+REPLY_UPPER_LIMIT = 100
+
+WORDS = ("the", "quick", "brown", "fox", "jumps", "over", "lazy", "dog", "python", "discord", "server",
+         "tonight", "anyone", "playing", "magic", "card", "game", "lol", "what", "really", "think")
+EXTRAS = ("python++", "(bad puns)--", "<@123456789>", "@everyone", "https://example.com/page", "www.gnu.org",
+          "karn", "Karn++", "see example.org/docs")
+
+
+def make_corpus(count):
+    seed(0)
+    corpus = []
+
+    for _ in range(count):
+        words = [choice(WORDS) for _ in range(randint(1, 16))]
+
+        if not randint(0, 3):
+            words.insert(randint(0, len(words)), choice(EXTRAS))
+
+        corpus.append(' '.join(words))
+
+    return corpus
+
+def legacy_filters(content):
+    search(r"[Kk]arn(?:\Z|[^+\-])", content)
+
+    if len(content.split()) > 1:
+        if all(search(r"^<@&*\d+>$|@everyone|@here", word) for word in content.split()):
+            pass
+        elif search(r"\A(?:\([\w\s']+\)|[\w']+)(?:--|\+\+)", content):
+            pass
+        elif search(r"(?i)\b((?:https?://|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)(?:[^\s()<>]+|\(([^\s()<>]+|"
+                    r"(\([^\s()<>]+\)))*\))+(?:\(([^\s()<>]+|(\([^\s()<>]+\)))*\)|[^\s`!()\[\]{};:'\".,<>?«»“”‘’]))",
+                    content):
+            pass
+        else:
+            randint(1, REPLY_UPPER_LIMIT) <= REPLY_CHANCE
+
+    findall(r"\([\w\s']+\)(?:\+\+|--)|[\w]+(?:\+\+|--)", content)
+
+def precompiled_filters(content):
+    mentions_bot(content)
+
+    if len(content.split()) > 1:
+        will_reply = randint(1, REPLY_UPPER_LIMIT) <= REPLY_CHANCE
+        will_increase = not will_reply and not randint(0, REPLY_CHANCE)
+
+        if will_reply or will_increase:
+            is_tag_only(content) or starts_with_vote(content) or has_url(content)
+
+    find_votes(content)
+
+def run(corpus, filters):
+    for content in corpus:
+        filters(content)
+
+def main():
+    count = int(argv[1]) if len(argv) > 1 else DEFAULT_MESSAGE_COUNT
+    corpus = make_corpus(count)
+
+    for name, filters in (("inline re.search", legacy_filters), ("precompiled", precompiled_filters)):
+        elapsed = min(timeit(lambda: run(corpus, filters), number=1) for _ in range(REPEATS))
+        print(f"{name:<18} {count / elapsed:>12,.0f} messages/s  ({elapsed * 1000:.1f} ms for {count:,} messages)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+# Benchmark for random line selection from guild text files (`#file` expansion and file context for the AI)
+# Compares reading every line and picking from the list against sampling through the file's line index
+# Usage: python -m benchmarks.random_lines [line_count]
+
+from pathlib import Path
+from random import choice, randint, seed
+from sys import argv
+from tempfile import TemporaryDirectory
+from timeit import timeit
+
+from src.file_store import GuildFileStore, INDEX_DIR
+
+
+DEFAULT_LINE_COUNT = 1_000_000
+SAMPLE_SIZE = 128   # MAXIMUM_FILE_LINES in src/Cogs/AI.py
+REPEATS = 5
+
+WORDS = ("the", "quick", "brown", "fox", "jumps", "over", "lazy", "dog", "python", "discord", "server")
+
+
+def write_file(path, count):
+    seed(0)
+
+    with open(path, 'w') as out_file:
+        for _ in range(count):
+            out_file.write(' '.join(choice(WORDS) for _ in range(randint(1, 12))) + '\n')
+
+def legacy_random_line(path):
+    with open(path, 'r') as in_file:
+        return choice(in_file.readlines()).strip()
+
+def legacy_sample(path):
+    with open(path, 'r') as in_file:
+        lines = in_file.readlines()
+
+    return [lines.pop(randint(0, len(lines) - 1)) for _ in range(min(SAMPLE_SIZE, len(lines)))]
+
+def report(name, elapsed):
+    print(f"{name:<28} {elapsed * 1000:>10.3f} ms")
+
+def main():
+    count = int(argv[1]) if len(argv) > 1 else DEFAULT_LINE_COUNT
+
+    with TemporaryDirectory() as directory:
+        store = GuildFileStore(0)
+        store.directory = Path(directory)
+        store.index_dir = store.directory / INDEX_DIR
+        path = store.get_path("bench")
+
+        write_file(path, count)
+        print(f"{count:,} lines, {path.stat().st_size / 1024 ** 2:.1f} MiB\n")
+
+        report("index build (first read)", timeit(lambda: store.get_index("bench"), number=1))
+        store.indexes.clear()
+        report("index load (after restart)", timeit(lambda: store.get_index("bench"), number=1))
+        print()
+
+        for name, func in (("readlines + choice", lambda: legacy_random_line(path)),
+                           ("indexed random_line", lambda: store.random_line("bench")),
+                           (f"readlines + pop x{SAMPLE_SIZE}", lambda: legacy_sample(path)),
+                           (f"indexed sample_lines({SAMPLE_SIZE})", lambda: store.sample_lines("bench", SAMPLE_SIZE))):
+            report(name, min(timeit(func, number=1) for _ in range(REPEATS)))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,48 @@
+# Import time profile of the bot's start up, everything bot.py imports before it can connect and handle commands
+# Runs the imports in fresh interpreters, reports the wall time and the slowest top level packages (-X importtime)
+# Usage: python -m benchmarks.startup [runs]
+
+from collections import defaultdict
+from statistics import median
+from subprocess import run
+from sys import argv, executable
+from time import perf_counter
+
+
+DEFAULT_RUNS = 5
+TOP_PACKAGES = 15
+
+STARTUP_IMPORTS = "import discord, dotenv, mysql.connector; import src.cogs, src.pipeline, src.help_command, src.warmup"
+
+
+def time_imports():
+    start = perf_counter()
+    run([executable, "-c", STARTUP_IMPORTS], check=True)
+
+    return perf_counter() - start
+
+# Returns top level package -> microseconds spent importing it and its submodules (self time, so nothing is counted twice)
+def profile_imports():
+    output = run([executable, "-X", "importtime", "-c", STARTUP_IMPORTS], check=True, capture_output=True, text=True).stderr
+    packages = defaultdict(int)
+
+    for line in output.splitlines()[1:]:
+        _, self_time, _, name = (i.strip() for i in line.replace(':', '|', 1).split('|'))
+        packages[name.split('.')[0]] += int(self_time)
+
+    return packages
+
+def main():
+    runs = int(argv[1]) if len(argv) > 1 else DEFAULT_RUNS
+
+    time_imports()
+    print(f"start up imports: {median(time_imports() for _ in range(runs)) * 1000:.0f} ms (median of {runs})\n")
+
+    packages = profile_imports()
+
+    for name, microseconds in sorted(packages.items(), key=lambda i: i[1], reverse=True)[:TOP_PACKAGES]:
+        print(f"{name:<24} {microseconds / 1000:>8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
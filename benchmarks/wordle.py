@@ -0,0 +1,59 @@
+# Benchmark for $wordle feedback scoring and the hint solver
+# Compares the previous Counter based scoring against packed words, then times feedback rows and hints
+# Usage: python -m benchmarks.wordle [pair_count]
+
+from collections import Counter
+from random import choice, sample, seed
+from sys import argv
+from timeit import timeit
+
+from src.wordle import OPENING_GUESS, pack_word, score_pattern, unpack_word, WordRepository
+
+
+DEFAULT_PAIR_COUNT = 100_000
+HINT_GAMES = 20
+
+
+def legacy_score_guess(guess, word):
+    result = ["absent"] * len(word)
+    remaining = Counter(word)
+
+    for i, (g, w) in enumerate(zip(guess, word)):
+        if g == w:
+            result[i] = "correct"
+            remaining[g] -= 1
+
+    for i, g in enumerate(guess):
+        if result[i] != "correct" and remaining[g] > 0:
+            result[i] = "present"
+            remaining[g] -= 1
+
+    return result
+
+def report(name, elapsed, count, unit="us"):
+    scale = 1_000_000 if unit == "us" else 1_000
+    print(f"{name:<28} {elapsed / count * scale:>10.2f} {unit}")
+
+def main():
+    count = int(argv[1]) if len(argv) > 1 else DEFAULT_PAIR_COUNT
+    seed(0)
+    repo = WordRepository()
+    words = [(unpack_word(choice(repo.guesses)), unpack_word(choice(repo.answers))) for _ in range(count)]
+    packed = [(pack_word(guess), pack_word(answer)) for guess, answer in words]
+
+    print(f"{len(repo.answers):,} answers, {len(repo.guesses):,} guesses\n")
+
+    report("Counter scoring (per pair)", timeit(lambda: [legacy_score_guess(*i) for i in words], number=1), count)
+    report("packed scoring (per pair)", timeit(lambda: [score_pattern(*i) for i in packed], number=1), count)
+
+    report("feedback row (cold)", timeit(lambda: repo.feedback.row(packed[0][0]), number=1), 1, unit="ms")
+    report("feedback row (cached)", timeit(lambda: repo.feedback.row(packed[0][0]), number=100), 100, unit="ms")
+
+    # Hints after an opening guess, the slowest point of a game (the most candidates are left)
+    games = [unpack_word(i) for i in sample(list(repo.answers), HINT_GAMES)]
+    report("hint after one guess", timeit(lambda: [repo.best_guess(repo.candidates([OPENING_GUESS], i)) for i in games], number=1),
+           HINT_GAMES, unit="ms")
+
+
+if __name__ == "__main__":
+    main()
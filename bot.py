@@ -24,7 +24,8 @@ from src.help_command import CustomHelpCommand
 from src.pipeline import run_pipeline
 from src.response_strings import NO_DM_SUPPORT
 from src.sql import connect_to_sql_database
-from src.utils import make_guild_dir
+from src.utils import make_guild_dir, package_message
+from src.warmup import warmup
 
 activity = discord.Activity(type=discord.ActivityType.streaming,
                             name="",
@@ -58,14 +59,15 @@ async def on_ready():
     if not bot.cogs:
         await add_cogs(bot, sql_connection)
         change_activity.start()
+        # Slash commands only change on restart, syncing on every reconnect only delays handling commands
+        await bot.tree.sync()
+        bot.loop.create_task(warmup(bot))
 
     print(f"\n{bot.user} is connected to the following guild(s):\n")
     
     for guild in bot.guilds:
         print(f"{guild.name} (ID: {guild.id})\nGuild Members: {len(guild.members)}\n")
 
-    await bot.tree.sync()
-
 @tasks.loop(hours=1)
 async def change_activity():
     activity.name = choice(activities)
@@ -86,8 +88,12 @@ async def on_message(msg):
         return
 
     if msg.content[0] == bot.command_prefix:
+        # Answered straight from the rendered help, without parsing the message as a command
         if "--help" in msg.content:
-            msg.content = f"$help {msg.content.split()[0][1:]}"
+            if (text := bot.help_command.index.get_help(msg.content.split()[0][1:])) is not None:
+                await package_message(text, msg.channel, multi_send=True)
+
+            return
 
         if '|' in msg.content:
             ctx = await bot.get_context(msg)
@@ -97,7 +103,8 @@ async def on_message(msg):
         return await bot.process_commands(msg)
     
     if not await send_line(msg, bot):
-        if not await bot.get_cog("Games").wordle_listener(msg):
+        # Only channels with an ongoing game can have a guess in them
+        if msg.channel.id not in (games := bot.get_cog("Games")).active_channels or not await games.wordle_listener(msg):
             await bot.get_cog("AI").send_reply(msg)
 
     bot.get_cog("Rating").rate_listener(msg)
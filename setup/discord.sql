@@ -80,9 +80,12 @@ DROP TABLE IF EXISTS `Hat`;
 /*!40101 SET @saved_cs_client     = @@character_set_client */;
 /*!40101 SET character_set_client = utf8mb4 */;
 CREATE TABLE `Hat` (
+  `id` int(10) unsigned NOT NULL AUTO_INCREMENT,
   `guild_id` bigint(20) NOT NULL,
   `hat_name` varchar(128) NOT NULL,
-  `item` varchar(256) NOT NULL
+  `item` varchar(256) NOT NULL,
+  PRIMARY KEY (`id`),
+  KEY `guild_id_hat_name` (`guild_id`,`hat_name`)
 ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
 /*!40101 SET character_set_client = @saved_cs_client */;
 
@@ -141,6 +144,58 @@ LOCK TABLES `Users` WRITE;
 /*!40000 ALTER TABLE `Users` DISABLE KEYS */;
 /*!40000 ALTER TABLE `Users` ENABLE KEYS */;
 UNLOCK TABLES;
+
+--
+-- Table structure for table `WordleGames`
+--
+
+DROP TABLE IF EXISTS `WordleGames`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8mb4 */;
+CREATE TABLE `WordleGames` (
+  `channel_id` bigint(20) unsigned NOT NULL,
+  `word` int(10) unsigned NOT NULL,
+  `guesses` varbinary(32) NOT NULL,
+  `daily` date DEFAULT NULL,
+  PRIMARY KEY (`channel_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `WordleGames`
+--
+
+LOCK TABLES `WordleGames` WRITE;
+/*!40000 ALTER TABLE `WordleGames` DISABLE KEYS */;
+/*!40000 ALTER TABLE `WordleGames` ENABLE KEYS */;
+UNLOCK TABLES;
+
+--
+-- Table structure for table `WordleStats`
+--
+
+DROP TABLE IF EXISTS `WordleStats`;
+/*!40101 SET @saved_cs_client     = @@character_set_client */;
+/*!40101 SET character_set_client = utf8mb4 */;
+CREATE TABLE `WordleStats` (
+  `user_id` bigint(20) unsigned NOT NULL,
+  `played` int(10) unsigned NOT NULL DEFAULT 0,
+  `won` int(10) unsigned NOT NULL DEFAULT 0,
+  `streak` int(10) unsigned NOT NULL DEFAULT 0,
+  `max_streak` int(10) unsigned NOT NULL DEFAULT 0,
+  `distribution` varbinary(32) NOT NULL,
+  PRIMARY KEY (`user_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+/*!40101 SET character_set_client = @saved_cs_client */;
+
+--
+-- Dumping data for table `WordleStats`
+--
+
+LOCK TABLES `WordleStats` WRITE;
+/*!40000 ALTER TABLE `WordleStats` DISABLE KEYS */;
+/*!40000 ALTER TABLE `WordleStats` ENABLE KEYS */;
+UNLOCK TABLES;
 /*!40103 SET TIME_ZONE=@OLD_TIME_ZONE */;
 
 /*!40101 SET SQL_MODE=@OLD_SQL_MODE */;
@@ -0,0 +1,20 @@
+-- Adds the tables persisting Wordle games and stats to databases created before them
+-- Usage: mysql discord < setup/migrations/001_wordle_tables.sql
+
+CREATE TABLE IF NOT EXISTS `WordleGames` (
+  `channel_id` bigint(20) unsigned NOT NULL,
+  `word` int(10) unsigned NOT NULL,
+  `guesses` varbinary(32) NOT NULL,
+  `daily` date DEFAULT NULL,
+  PRIMARY KEY (`channel_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
+
+CREATE TABLE IF NOT EXISTS `WordleStats` (
+  `user_id` bigint(20) unsigned NOT NULL,
+  `played` int(10) unsigned NOT NULL DEFAULT 0,
+  `won` int(10) unsigned NOT NULL DEFAULT 0,
+  `streak` int(10) unsigned NOT NULL DEFAULT 0,
+  `max_streak` int(10) unsigned NOT NULL DEFAULT 0,
+  `distribution` varbinary(32) NOT NULL,
+  PRIMARY KEY (`user_id`)
+) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4 COLLATE=utf8mb4_general_ci;
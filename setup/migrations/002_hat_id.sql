@@ -0,0 +1,7 @@
+-- Gives Hat items an id, along with the index every hat command looks items up by, for databases created before them
+-- InnoDB secondary indexes include the primary key, so (guild_id, hat_name) also keeps each hat's items in id order
+-- Usage: mysql discord < setup/migrations/002_hat_id.sql
+
+ALTER TABLE `Hat`
+  ADD COLUMN `id` int(10) unsigned NOT NULL AUTO_INCREMENT PRIMARY KEY FIRST,
+  ADD INDEX `guild_id_hat_name` (`guild_id`,`hat_name`);
@@ -1,28 +1,34 @@
 from asyncio import sleep
+from contextlib import nullcontext
 from datetime import datetime, timedelta
 from discord import ClientException, Interaction, Message
 from discord.app_commands import ContextMenu
 from discord.ext.tasks import loop
-from discord.ext.commands import Bot, Cog, Context, errors, hybrid_command
+from discord.ext.commands import Bot, Cog, command, Context, errors, hybrid_command
 from json import dumps, loads
-from openai import APIError, AsyncOpenAI
 from os import getenv
 from random import choice, randint
-from re import DOTALL, IGNORECASE, search, sub
+from re import search
 from requests import post
-from tiktoken import encoding_for_model
 from zoneinfo import ZoneInfo
 
 
 # Local dependencies
 from src.Cogs.Query import get_weather
+from src.file_cache import load_cached
+from src.file_store import get_store
 from src.global_vars import FILE_ROOT_DIR
 import src.help_messages as hlp
+from src.llm_scheduler import get_bucket_key, get_priority, LLMScheduler, PRIORITY_PROMPT
+from src.patterns import clean_context_text, compile_phrase_matcher, has_url, is_tag_only, is_unhelpful_reply, \
+                         mentions_bot, replace_ai_descriptor, starts_with_vote, strip_input_format
 from src.utils import DEFAULT_TTS_SPEED, DEFAULT_TTS_VOICE, SUPPORTED_SPEEDS, SUPPORTED_VOICES,             \
-                      get_cursor, get_flags, get_id_from_mention, get_json_from_socket, get_readme,         \
+                      get_flags, get_id_from_mention, get_json_from_socket, get_readme,                     \
                       is_slash_command, package_message, send_tts_if_in_vc, smart_typing, text_to_speech
 from src.util_objects import BoTracker
-from src.tools import get_tool_token_cost, tools
+from src.tokenizer import Tokenizer
+from src.workers import run_in_worker
+from src.tools import get_tool_strings, get_tool_token_cost, tools
 
 OPENAI_API_KEY = getenv("CHATGPT_TOKEN")
 OPENAI_ORGANIZATION = getenv("CHATGPT_ORG")
@@ -34,7 +40,7 @@ LEONARDO_URL = "https://cloud.leonardo.ai/api/rest/v1/generations"
 
 # Constants (set by OpenAI and the encoding they use)
 MODEL = "gpt-5-mini"
-ENCODING = encoding_for_model(MODEL)
+TOKENIZER = Tokenizer(MODEL)
 TOKENS_PER_MESSAGE = 3  # Tokens required for each context message regardless of message length
 TOKENS_PER_REPLY = 3    # Tokens required for the response from OpenAI regardless of response length
 INPUT_COST = 0.25 / 1_000_000
@@ -99,41 +105,43 @@ class AI(Cog):
 
     # param          bot - our client
     # param         conn - connection to the SQL database
+    # param     settings - SettingsCache shared with the other cogs
     #  attr reply_chance - chance the bot will respond to a message unprompted [%]
-    def __init__(self, bot: Bot, conn):
+    def __init__(self, bot: Bot, conn, settings):
         self.bot = bot
         self.conn = conn
+        self.settings = settings
+        self.scheduler = LLMScheduler()
         self.reply_chance = 1
-        self.client = AsyncOpenAI(api_key=OPENAI_API_KEY, organization=OPENAI_ORGANIZATION)
-        self.tools_token_cost = get_tool_token_cost(tools, ENCODING)
+        self._client = None
         self.trackers = {}
 
+        TOKENIZER.warmup(static_texts=[GENESIS_MESSAGE["content"], FILE_GENESIS["content"], *get_tool_strings(tools)])
+
         self.generate_menu = ContextMenu(name="Generate image", callback=self.generate_from_message)
         bot.tree.add_command(self.generate_menu)
 
-    # Import "rude" phrases from input file
-    def get_rude_messages(self, guild_id):
-        try:
-            with open(f"{FILE_ROOT_DIR}/{guild_id}/{RUDE_MESSAGES_FILENAME}", 'r') as in_file:
-                return [i.strip().lower() for i in in_file.readlines()]
-        except FileNotFoundError:
-            return [DEFAULT_RUDE_MESSAGE]
+    # Created on first use, importing openai takes most of a second and is not needed until the first request
+    @property
+    def client(self):
+        if self._client is None:
+            from openai import AsyncOpenAI
 
-    # Import "nice" phrases from input file
-    def get_nice_messages(self, guild_id):
-        try:
-            with open(f"{FILE_ROOT_DIR}/{guild_id}/{NICE_MESSAGES_FILENAME}", 'r') as in_file:
-                return [i.strip().lower() for i in in_file.readlines()]
-        except FileNotFoundError:
-            return [DEFAULT_NICE_MESSAGE]
+            self._client = AsyncOpenAI(api_key=OPENAI_API_KEY, organization=OPENAI_ORGANIZATION)
+
+        return self._client
+
+    # Matcher for "rude" phrases from input file, recompiled only when the file changes
+    def get_rude_matcher(self, guild_id):
+        return load_cached(f"{FILE_ROOT_DIR}/{guild_id}/{RUDE_MESSAGES_FILENAME}", load_phrase_matcher, DEFAULT_RUDE_MATCHER)
+
+    # Matcher for "nice" phrases from input file, recompiled only when the file changes
+    def get_nice_matcher(self, guild_id):
+        return load_cached(f"{FILE_ROOT_DIR}/{guild_id}/{NICE_MESSAGES_FILENAME}", load_phrase_matcher, DEFAULT_NICE_MATCHER)
 
     # Import self descriptors from input file
     def get_descriptors(self, guild_id):
-        try:
-            with open(f"{FILE_ROOT_DIR}/{guild_id}/{AI_DESCRIPTOR_FILENAME}", 'r') as in_file:
-                return [i.strip() for i in in_file.readlines()]
-        except FileNotFoundError:
-            return [DEFAULT_DESCRIPTOR]
+        return load_cached(f"{FILE_ROOT_DIR}/{guild_id}/{AI_DESCRIPTOR_FILENAME}", load_descriptors, [DEFAULT_DESCRIPTOR])
     
     async def generate_from_message(self, interaction: Interaction, message: Message):
         ctx = await Context.from_interaction(interaction)
@@ -351,21 +359,16 @@ class AI(Cog):
 
         if 'f' in flags:
             try:
-                context, encoded_len = self.build_context_from_file(ctx.guild.id, flags['f'])
+                # Reading the file can (re)build its line index, kept off the event loop along with the token counting
+                context, encoded_len = await run_in_worker(self.build_context_from_file, ctx.guild.id, flags['f'])
             except FileNotFoundError:
                 return await ctx.send("Input file not found. Use `$ls` to view available input files.")
             
             chat_completion = True
         else:
-            cursor = get_cursor(self.conn)
-
-            cursor.execute("SELECT content FROM Genesis WHERE channel_id = %s", [channel_id])
-
-            if not (sys_msg := [{"role": "developer", "content": content[0]} for content in cursor.fetchall()]):
+            if not (sys_msg := [{"role": "developer", "content": content} for content in self.settings.get_genesis(channel_id)]):
                 sys_msg = [{key: val for key, val in GENESIS_MESSAGE.items()}]
 
-            cursor.close()
-
             context, encoded_len = await self.build_context(channel, sys_msg, chat_completion, inp_msg)
 
         max_output_tokens = int((TARGET_COST - encoded_len * INPUT_COST) / OUTPUT_COST)
@@ -411,31 +414,24 @@ class AI(Cog):
                 
                 openai_kwargs["input"].append(TOOL_RESPONSE)
                 openai_kwargs["previous_response_id"] = chat.id
-                chat = await self.request_response(ctx, chat_completion, openai_kwargs, kwargs)
+                
+                if (chat := await self.request_response(ctx, chat_completion, openai_kwargs, kwargs)) is False:
+                    return
             
             reply = chat.output_text
             
         # Prevent bot from sending unprompted messages that are not helpful
-        if kwargs.get("prompted") is False:
-            # https://regex101.com/r/8MiYow/1
-            if search(r"If you need any assistance or|[Ff]eel free to|If you have any|[Ll]et me know|I'm sorry, but I",
-                      reply):
-                return
+        if kwargs.get("prompted") is False and is_unhelpful_reply(reply):
+            return
 
         if ctx.guild is not None:
             descriptors = self.get_descriptors(ctx.guild.id)
 
             # Replace instances of the bot saying "...as an AI..." with self descriptors of the bot
-            # https://regex101.com/r/oWjuWt/2
-            reply = sub("([aA]s|I am)* an* (?:digital)*(?:virtual)*(?:responsible)*(?:time-traveling)* *(?:golem)* "
-                        "*(?:AI|digital|artificial intelligence|language model)"
-                        "(?: language)*(?: text-based)*(?: model)*(?: assistant)*",
-                        r"\1 " + choice(descriptors),
-                        reply)
+            reply = replace_ai_descriptor(reply, choice(descriptors))
         
         # Ensure bot is not formatting the response with the input formatting
-        # https://regex101.com/r/Cuv7zX/1
-        reply = sub(r"time: .+message: ", '', reply, flags=DOTALL)
+        reply = strip_input_format(reply)
 
         # Send error message if OpenAI sent a blank response
         if not reply:
@@ -446,20 +442,38 @@ class AI(Cog):
         await send_tts_if_in_vc(self.bot, author, reply)
 
     async def request_response(self, ctx, chat_completion, openai_kwargs, kwargs):
-        # Make the bot appear to be typing while waiting for the response from OpenAI
-        async with ctx.typing():
-            try:
-                if chat_completion:
-                    return await self.client.chat.completions.create(**openai_kwargs)
-                
-                return await self.client.responses.create(**openai_kwargs)
-            except APIError as e:
-                if kwargs.get("prompted") is not False:
-                    await ctx.send("Sorry I am unable to assist currently. Please try again later.")
-                
-                print(f"\nOpenAI request failed with error:\n{e}\n")
-                
-                return False
+        priority = get_priority(ctx.message.author.bot, kwargs.get("prompted"))
+        # Explicit prompts type while they wait for a slot too, so a busy queue is not silent
+        # Optional replies may be dropped, they only type once admitted
+        typing_while_queued = priority == PRIORITY_PROMPT
+
+        async with ctx.typing() if typing_while_queued else nullcontext():
+            # Wait for a free slot, unprompted requests may be dropped if this guild is busy
+            async with self.scheduler.slot(get_bucket_key(ctx), priority) as admitted:
+                if not admitted:
+                    return False
+
+                from openai import APIError
+
+                # Make the bot appear to be typing while waiting for the response from OpenAI
+                async with nullcontext() if typing_while_queued else ctx.typing():
+                    try:
+                        if chat_completion:
+                            return await self.client.chat.completions.create(**openai_kwargs)
+                        
+                        return await self.client.responses.create(**openai_kwargs)
+                    except APIError as e:
+                        if kwargs.get("prompted") is not False:
+                            await ctx.send("Sorry I am unable to assist currently. Please try again later.")
+                        
+                        print(f"\nOpenAI request failed with error:\n{e}\n")
+                        
+                        return False
+
+    # Hidden command that reports the LLM request queue metrics
+    @command(hidden=True)
+    async def llm_stats(self, ctx):
+        await ctx.send('\n'.join(f"{key}: {val}" for key, val in self.scheduler.metrics().items()))
 
 
     async def handle_functions(self, ctx, item):
@@ -485,27 +499,25 @@ class AI(Cog):
         if search(r"\W", filename):
             raise FileNotFoundError
 
-        filepath = f"{FILE_ROOT_DIR}/{guild_id}/{filename.lower()}.txt"
+        # Only the lines that can make it into the context are read from the file
+        lines = get_store(guild_id).sample_lines(filename.lower(), MAXIMUM_FILE_LINES)
 
-        with open(filepath, "r") as in_file:
-            lines = in_file.readlines()
-
-        num_tokens = TOKENS_PER_REPLY + get_token_len(FILE_GENESIS)
+        num_tokens = TOKENS_PER_REPLY + get_token_len(FILE_GENESIS, static=True)
         context = [FILE_GENESIS]
         usr_msg = {"role": "user", "content": f"#{filename}"}
+        # The file name differs per request, counted once here instead of memoized with the static strings
         usr_tokens = get_token_len(usr_msg)
-        lines_read = 0
 
-        while lines and lines_read < MAXIMUM_FILE_LINES:
-            msg = {"role": "assistant", "content": lines.pop(randint(0, len(lines) - 1))}
+        for line in lines:
+            msg = {"role": "assistant", "content": line}
             
+            # MAX_INPUT_TOKENS is a hard limit, so lines are counted exactly (estimates undercount CJK, emoji, and code)
             if (encoding_len := get_token_len(msg)) + usr_tokens + num_tokens > MAX_INPUT_TOKENS:
                 break
 
             num_tokens += encoding_len + usr_tokens
             context.append(usr_msg)
             context.append(msg)
-            lines_read += 1
 
         context.append(usr_msg)
 
@@ -518,17 +530,17 @@ class AI(Cog):
     #       context - list of dictionaries containing messages with a total token length < `MAX_MSG_LEN`
     #    num_tokens - number of tokens used by the context
     async def build_context(self, channel, sys_msg, chat_completion=False, inp_prompt=None):
-        num_tokens = TOKENS_PER_REPLY + get_token_len(sys_msg) + self.tools_token_cost if not chat_completion else 0
+        num_tokens = TOKENS_PER_REPLY + get_token_len(sys_msg, static=True) + get_tool_token_cost(tools, TOKENIZER) if not chat_completion else 0
         num_tokens += get_token_len(inp_prompt) if inp_prompt is not None else 0
         context = [] if inp_prompt is None else [inp_prompt]
         after = datetime.now() - timedelta(days=MAX_DAYS_OLD)
         target_input_cost = TARGET_COST / 2
+        token_budget = int(target_input_cost / INPUT_COST)
 
         # Build the list of context messages
         async for message in channel.history(after=after, oldest_first=False):
-            content_text = sub(r"\A\$prompt ", '', message.clean_content)
-            # Remove character that can cause blank responses from OpenAI
-            content_text = sub(r"‐", '', content_text)
+            # Remove the command prefix and any character that can cause blank responses from OpenAI
+            content_text = clean_context_text(message.clean_content)
             is_bot = message.author == self.bot.user
             content_blocks = []
             synthetic_user_image_blocks = []
@@ -557,7 +569,7 @@ class AI(Cog):
                 synthetic_blocks = [{"type": f"{'' if chat_completion else 'input_'}text", "text": label}] + synthetic_user_image_blocks
                 synthetic_msg = {"role": "user", "content": synthetic_blocks}
 
-                if ((encoding_len := get_token_len(synthetic_msg)) + num_tokens) * INPUT_COST > target_input_cost:
+                if ((encoding_len := get_token_len(synthetic_msg, budget=(num_tokens, token_budget))) + num_tokens) * INPUT_COST > target_input_cost:
                     break
 
                 num_tokens += encoding_len
@@ -569,7 +581,7 @@ class AI(Cog):
             msg = {"role": "assistant" if is_bot else "user", "content": content_blocks}
             
             # Break the loop if adding the next messages pushes us past the token limit
-            if ((encoding_len := get_token_len(msg)) + num_tokens) * INPUT_COST > target_input_cost:
+            if ((encoding_len := get_token_len(msg, budget=(num_tokens, token_budget))) + num_tokens) * INPUT_COST > target_input_cost:
                 break
 
             num_tokens += encoding_len
@@ -595,33 +607,22 @@ class AI(Cog):
             if (token_len := get_token_len({"role": "system", "content": new_gen_msg})) > MAX_INPUT_TOKENS:
                 return await ctx.send("Input genesis message is too long. Context was not set.")
 
-        cursor = get_cursor(self.conn)
-
-        cursor.execute("DELETE FROM Genesis WHERE channel_id = %s", [ctx.channel.id])
+        self.settings.set_genesis(ctx.channel.id, None if reset_context else new_gen_msg)
         
         if not reset_context:
-            cursor.execute("INSERT INTO Genesis (channel_id, content) VALUES (%s, %s)", [ctx.channel.id, new_gen_msg])
             await ctx.send(f"New genesis message of length {token_len} has been set!")
         else:
             await ctx.send("System context message has been reset to default settings")
 
-        self.conn.commit()
-        cursor.close()
-
     @hybrid_command(help=hlp.ADD_CONTEXT_FULL,
                     brief="Add additional system context")
     async def add_context(self, ctx, *, message: str):
         if (token_len := get_token_len({"role": "system", "content": message})) > MAX_INPUT_TOKENS:
             return await ctx.send("Input genesis message is too long. Context was not set.")
 
-        cursor = get_cursor(self.conn)
-
-        cursor.execute("INSERT INTO Genesis (channel_id, content) VALUES (%s, %s)", [ctx.channel.id, message])
+        self.settings.add_genesis(ctx.channel.id, message)
 
         await ctx.send(f"New system context message of length {token_len} has been added!")
-
-        self.conn.commit()
-        cursor.close()
     
     @add_context.error
     async def add_context_error(self, ctx, error):
@@ -634,18 +635,12 @@ class AI(Cog):
     @hybrid_command(help=hlp.VIEW_CONTEXT_FULL,
                     brief="View system context messages")
     async def view_context(self, ctx):
-        cursor = get_cursor(self.conn)
-
-        cursor.execute("SELECT content FROM Genesis WHERE channel_id = %s", [ctx.channel.id])
-
-        if not (result := cursor.fetchall()):
+        if not (result := self.settings.get_genesis(ctx.channel.id)):
             await ctx.send("No system context messages set for this channel. Try using `$add_context` first!")
         else:
-            response = "\n* ".join(i[0] for i in result)
+            response = "\n* ".join(result)
             await ctx.send(f"System context messages for this channel:\n* {response}")
 
-        cursor.close()
-
     @hybrid_command(help=hlp.IGNORE_FULL,
                     brief="Toggle unprompted responses")
     async def ignore(self, ctx, *, args: str=None):
@@ -660,47 +655,13 @@ class AI(Cog):
 
             return await self.ignore_channel(ctx, channel)
 
-        cursor = get_cursor(self.conn)
-
-        respond = False
-
-        cursor.execute("SELECT respond FROM Users WHERE user_id = %s", [ctx.author.id])
-
-        if not (result := cursor.fetchall()):
-            cursor.execute("INSERT INTO Users (user_id, respond) VALUES (%s, %s)", [ctx.author.id, 0])
-        elif result[0][0]:
-            cursor.execute("UPDATE Users SET respond = 0 WHERE user_id = %s", [ctx.author.id])
-        else:
-            cursor.execute("UPDATE Users SET respond = 1 WHERE user_id = %s", [ctx.author.id])
-            respond = True
-
-        self.conn.commit()
-        cursor.close()
-
-        if respond:
+        if self.settings.toggle_user_respond(ctx.author.id):
             await ctx.send("I will now occasionally respond your messages without being prompted.")
         else:
             await ctx.send("I will no longer respond to your messages without being prompted.")
 
     async def ignore_channel(self, ctx, channel):
-        cursor = get_cursor(self.conn)
-
-        respond = False
-
-        cursor.execute("SELECT respond FROM Channels WHERE channel_id = %s", [channel])
-
-        if not (result := cursor.fetchall()):
-            cursor.execute("INSERT INTO Channels (channel_id, respond) VALUES (%s, %s)", [channel, 0])
-        elif result[0][0]:
-            cursor.execute("UPDATE Channels SET respond = 0 WHERE channel_id = %s", [channel])
-        else:
-            cursor.execute("UPDATE Channels SET respond = 1 WHERE channel_id = %s", [channel])
-            respond = True
-
-        self.conn.commit()
-        cursor.close()
-
-        if respond:
+        if self.settings.toggle_channel_respond(int(channel)):
             await ctx.send(f"I will now occasionally respond to messages in <#{channel}> without being prompted.")
         else:
             await ctx.send(f"I will no longer respond to messages in <#{channel}> without being prompted.")
@@ -712,28 +673,20 @@ class AI(Cog):
             return
 
         # Check if the message contains the bot's name (Karn) but not as a voted item (Karn++ or Karn--)
-        # https://regex101.com/r/qA25Ux/1
-        if search(r"[Kk]arn(?:\Z|[^+\-])", msg.clean_content):
+        if mentions_bot(msg.clean_content):
             clean_lower = msg.clean_content.lower()
             
             if msg.guild is not None:
-                rude_messages = self.get_rude_messages(msg.guild.id)
-
                 # If the message contains a rude phrase, reply with a response to rude messages
-                # https://regex101.com/r/isXc6g/1
-                if any(search(fr"(?:\A| ){i}(?:\Z| )", clean_lower, flags=IGNORECASE)
-                       for i in rude_messages):
+                if self.get_rude_matcher(msg.guild.id).search(clean_lower):
                     reply = get_random_response(msg.guild.id, rude=True)
                     await msg.add_reaction("\N{PENSIVE FACE}")
                     await msg.channel.send(reply)
                     await send_tts_if_in_vc(self.bot, msg.author, reply)
                     return
 
-                nice_messages = self.get_nice_messages(msg.guild.id)
-
                 # If the message contains a nice phrase, reply with a response to nice messages
-                if any(search(fr"(?:\A| ){i}(?:\Z| )", clean_lower, flags=IGNORECASE)
-                       for i in nice_messages):
+                if self.get_nice_matcher(msg.guild.id).search(clean_lower):
                     reply = get_random_response(msg.guild.id, rude=False)
                     await msg.add_reaction("\N{PINK HEART}")
                     await msg.channel.send(reply)
@@ -746,73 +699,81 @@ class AI(Cog):
         if len(msg.clean_content.split()) <= 1:
             return
 
-        cursor = get_cursor(self.conn)
+        # Roll both chances up front, most messages fail both and can skip the filters below entirely
+        # The second roll only matters when the first fails, same as rolling it afterwards
+        will_reply = randint(1, REPLY_UPPER_LIMIT) <= self.reply_chance
+        will_increase = not will_reply and not randint(0, self.reply_chance)
 
-        # Ignore users that don't want unprompted responses
-        cursor.execute("SELECT respond FROM Users WHERE user_id = %s", [msg.author.id])
-        if (result := cursor.fetchall()) and not result[0][0]:
-            cursor.close()
-            return
-
-        # Ignore channels that don't want unprompted responses
-        cursor.execute("SELECT respond FROM Channels WHERE channel_id = %s", [msg.channel.id])
-        if (result := cursor.fetchall()) and not result[0][0]:
-            cursor.close()
+        if not (will_reply or will_increase):
             return
 
-        cursor.close()
-
-        # Don't respond to messages that only contain tags
-        # https://regex101.com/r/acF54R/3
-        if all(search(r"^<@&*\d+>$|@everyone|@here", word) for word in msg.content.split()):
+        # Ignore users that don't want unprompted responses
+        if not self.settings.get_user_respond(msg.author.id):
             return
 
-        # Don't respond to messages that contain only a voted item (i.e. "python++")
-        # https://regex101.com/r/9eJZfe/2
-        if search(r"\A(?:\([\w\s']+\)|[\w']+)(?:--|\+\+)", msg.content):
+        # Ignore channels that don't want unprompted responses
+        if not self.settings.get_channel_respond(msg.channel.id):
             return
 
-        # Don't respond to messages that contain a URL
-        # https://regex101.com/r/vFpIxB/1
-        if search(r"(?i)\b((?:https?://|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)(?:[^\s()<>]+|\(([^\s()<>]+|"
-                  r"(\([^\s()<>]+\)))*\))+(?:\(([^\s()<>]+|(\([^\s()<>]+\)))*\)|[^\s`!()\[\]{};:'\".,<>?«»“”‘’]))",
-                  msg.content):
+        # Don't respond to messages that only contain tags, that contain only a voted item (i.e. "python++"),
+        # or that contain a URL
+        if is_tag_only(msg.content) or starts_with_vote(msg.content) or has_url(msg.content):
             return
 
         # Random chance to respond to any given message
-        if randint(1, REPLY_UPPER_LIMIT) <= self.reply_chance:
+        if will_reply:
             return await self.make_llm_request(await self.bot.get_context(msg), author=msg.author, prompted=False)
 
         # Random chance to increase likelihood of responses in the future
-        if not randint(0, self.reply_chance):
-            self.reply_chance += 1
+        self.reply_chance += 1
 
 # Returns number of tokens for a given context message
-# param msg - dictionary containing the context message
-def get_token_len(messages):
+# param    msg - dictionary containing the context message
+# param static - memoize the counts, used for messages that repeat between requests (genesis messages)
+# param budget - optional (used, limit) pair, allows approximate counts while far enough below the limit
+#                only for soft budgets, the estimate can undercount so hard limits must not use it
+def get_token_len(messages, static=False, budget=None):
     messages = [messages] if isinstance(messages, dict) else messages
 
+    if static:
+        count = TOKENIZER.count_static
+    elif budget is not None:
+        count = lambda text: TOKENIZER.budget_count(text, *budget)
+    else:
+        count = TOKENIZER.count
+
     num_tokens = 0
     for msg in messages:
         num_tokens += TOKENS_PER_MESSAGE
         for key, val in msg.items():
             if isinstance(val, list):
-                num_tokens += sum(len(ENCODING.encode(str(i))) for i in val)
+                num_tokens += sum(count(str(i)) for i in val)
             elif isinstance(val, dict):
                 for _, sub_val in val.items():
-                    num_tokens += len(ENCODING.encode(str(sub_val)))
+                    num_tokens += count(str(sub_val))
             else:
-                num_tokens += len(ENCODING.encode(str(val)))
+                num_tokens += count(str(val))
 
     return num_tokens
 
+DEFAULT_RUDE_MATCHER = compile_phrase_matcher([DEFAULT_RUDE_MESSAGE])
+DEFAULT_NICE_MATCHER = compile_phrase_matcher([DEFAULT_NICE_MESSAGE])
+
+def load_phrase_matcher(path):
+    with open(path, 'r') as in_file:
+        return compile_phrase_matcher(i.strip().lower() for i in in_file)
+
+def load_descriptors(path):
+    with open(path, 'r') as in_file:
+        return [i.strip() for i in in_file] or [DEFAULT_DESCRIPTOR]
+
+def load_lines(path):
+    with open(path, 'r') as in_file:
+        return in_file.readlines()
+
 # Imports responses from the input file, and returns a random line from it
 def get_random_response(guild_id, rude=True):
     filename = RUDE_RESPONSE_FILENAME if rude else NICE_RESPONSE_FILENAME
-    filepath = f"{FILE_ROOT_DIR}/{guild_id}/{filename}"
+    default = DEFAULT_RUDE_RESPONSE if rude else DEFAULT_NICE_RESPONSE
 
-    try:
-        with open(filepath, 'r') as in_file:
-            return choice(in_file.readlines())
-    except FileNotFoundError:
-        return DEFAULT_RUDE_RESPONSE if rude else DEFAULT_NICE_RESPONSE
+    return choice(load_cached(f"{FILE_ROOT_DIR}/{guild_id}/{filename}", load_lines, [default]) or [default])
@@ -1,22 +1,24 @@
-from collections import Counter
 from dataclasses import dataclass, field
+from datetime import date
 from discord.ext.commands import Cog, hybrid_command
-from random import choice
+from discord.ext.tasks import loop
+from mysql.connector.errors import Error
 
 import src.help_messages as hlp
 from src.utils import get_flags
+from src.wordle import decode_pattern, MAX_GUESSES, pack_word, score_pattern, WORD_LENGTH, WordRepository
+from src.wordle_store import WordleStore
+from src.workers import run_in_worker
 
 
-SOLUTION_FILE_PATH = "./data/wordle_answers.txt"
-VALID_WORDS_FILE_PATH = "./data/wordle_valid_words.txt"
-WORD_LENGTH = 5
-MAX_GUESSES = 6
+WRITE_BEHIND_INTERVAL = 30     # Seconds between writes of changed games and stats to the database
 
 
 @dataclass
 class WordleGame:
     word: str
     guesses: list[str] = field(default_factory=list)
+    daily: date | None = None
 
     @property
     def remaining_guesses(self):
@@ -27,28 +29,7 @@ class WordleGame:
         return len(self.guesses) >= MAX_GUESSES
 
     def score_guess(self, guess):
-        guess = guess.lower()
-        word = self.word.lower()
-
-        result = ["absent"] * WORD_LENGTH
-        remaining = Counter(word)
-
-        # Check exact matches
-        for i, (g, w) in enumerate(zip(guess, word)):
-            if g == w:
-                result[i] = "correct"
-                remaining[g] -= 1
-
-        # Check present but misplaced matches
-        for i, g in enumerate(guess):
-            if result[i] == "correct":
-                continue
-
-            if remaining[g] > 0:
-                result[i] = "present"
-                remaining[g] -= 1
-
-        return result
+        return decode_pattern(score_pattern(pack_word(guess.lower()), pack_word(self.word.lower())))
 
     def format_guess(self, guess):
         statuses = self.score_guess(guess)
@@ -73,49 +54,30 @@ class WordleGame:
         return self.format_guess(guess), won, lost
 
 
-def load_word_file(path):
-    with open(path, 'r') as infile:
-        return {i.strip().lower() for i in infile if len(i.strip()) == 5 and i.strip().isalpha()}
-
-
-class WordRepository:
-    def __init__(self, word_length=WORD_LENGTH):
-        self.word_length = word_length
-        self.solution_words = []
-        self.valid_guesses = set()
-
-        self.load_words()
-
-    def normalize_word(self, word):
-        word = word.strip().lower()
-
-        if len(word) != self.word_length or not word.isalpha():
-            return None
-
-        return word
-
-    def load_words(self):
-        answers = load_word_file(SOLUTION_FILE_PATH)
-        allowed = load_word_file(VALID_WORDS_FILE_PATH)
-
-        self.solution_words = sorted(answers)
-        self.valid_guesses = allowed | answers
+class Games(Cog):
 
-        if not self.solution_words:
-            raise RuntimeError("No valid Wordle words could be loaded.")
+    # attr   wordle_games - channel_id -> ongoing WordleGame, restored from the database on start up
+    # attr active_channels - live view of the channels with a game, checked for every message before the listener
+    def __init__(self, conn):
+        self.word_repo = WordRepository()
+        self.store = WordleStore(conn)
+        self.wordle_games = {channel_id: WordleGame(word, guesses, daily) for channel_id, word, guesses, daily in self.store.load_games()}
+        self.active_channels = self.wordle_games.keys()
 
-    def is_valid_guess(self, guess):
-        return guess.lower() in self.valid_guesses
+        self.flush_wordle.start()
 
-    def random_solution(self):
-        return choice(self.solution_words)
+    async def cog_unload(self):
+        self.flush_wordle.cancel()
+        self.store.flush()
 
+    @loop(seconds=WRITE_BEHIND_INTERVAL)
+    async def flush_wordle(self):
+        # A failed flush keeps its changes for the next one, an error escaping the loop would stop it for good
+        try:
+            self.store.flush()
+        except Error as e:
+            print(f"Wordle flush failed, retrying in {WRITE_BEHIND_INTERVAL} seconds.\n\nException:\n{e}")
 
-class Games(Cog):
-    def __init__(self):
-        self.wordle_games = {}
-        self.word_repo = WordRepository()
-    
     @hybrid_command(help=hlp.WORDLE_FULL,
                     brief="Play a game of Wordle")
     async def wordle(self, ctx, *, flags: str=''):
@@ -126,10 +88,35 @@ class Games(Cog):
             if (game := self.wordle_games.pop(chann_id, None)) is None:
                 await ctx.send("There is not currently an ongoing Wordle game in this chat.")
             else:
+                self.store.delete_game(chann_id)
                 await ctx.send(f"World game succesfully quit. The word was: {game.word}.")
 
             return
 
+        if 'h' in flags:
+            if (game := self.wordle_games.get(chann_id)) is None:
+                await ctx.send("There is not currently an ongoing Wordle game in this chat.")
+
+                return
+
+            candidates = await run_in_worker(self.word_repo.candidates, list(game.guesses), game.word)
+            hint = await run_in_worker(self.word_repo.best_guess, candidates)
+            await ctx.send(f"{len(candidates)} possible word{'s' if len(candidates) != 1 else ''} left. Try guessing `{hint.upper()}`.")
+
+            return
+
+        if 's' in flags:
+            stats = self.store.get_stats(ctx.author.id)
+            distribution = '\n'.join(f"{i + 1}: {count}" for i, count in enumerate(stats.distribution))
+            await ctx.send(f"**Wordle stats for {ctx.author.display_name}**\n"
+                           f"Played: {stats.played}\n"
+                           f"Won: {stats.won} ({stats.won / stats.played if stats.played else 0:.0%})\n"
+                           f"Current streak: {stats.streak}\n"
+                           f"Longest streak: {stats.max_streak}\n"
+                           f"Wins by guesses:\n{distribution}")
+
+            return
+
         existing_game = self.wordle_games.get(chann_id)
 
         if existing_game:
@@ -142,9 +129,14 @@ class Games(Cog):
 
             self.wordle_games.pop(chann_id, None)
 
-        game = WordleGame(word=self.word_repo.random_solution())
+        if 'd' in flags:
+            game = WordleGame(word=self.word_repo.daily_solution(today := date.today()), daily=today)
+        else:
+            game = WordleGame(word=self.word_repo.random_solution())
+
         self.wordle_games[chann_id] = game
-        await ctx.send("New game of Wordle started. You have 6 attempts to correctly guess the word.\n"
+        self.store.save_game(chann_id, game)
+        await ctx.send(f"New {'daily ' if game.daily else ''}game of Wordle started. You have 6 attempts to correctly guess the word.\n"
                        "**Bold** letters are in the correct spot.\n"
                        "__Underlined__ letters are present in the word, but not in the correct spot.\n"
                        "Other letters are not present in the word.\n\n"
@@ -166,18 +158,23 @@ class Games(Cog):
 
         formatted, won, lost = game.submit_guess(guess)
 
+        if won or lost:
+            # The player making the final guess is credited with the result
+            self.store.record_result(msg.author.id, won, len(game.guesses))
+            self.store.delete_game(msg.channel.id)
+            self.wordle_games.pop(msg.channel.id, None)
+
         if won:
             await msg.channel.send(f"Correct! You succesfully found the word using {len(game.guesses)} guesses.")
-            self.wordle_games.pop(msg.channel.id, None)
-            
+
             return True
 
         if lost:
             await msg.channel.send(f"Incorrect! Out of guesses. The word was: {game.word.upper()}")
-            self.wordle_games.pop(msg.channel.id, None)
 
             return True
 
+        self.store.save_game(msg.channel.id, game)
         await msg.channel.send(formatted)
 
         return True
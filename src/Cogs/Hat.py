@@ -1,5 +1,4 @@
 from discord.ext.commands import Cog, hybrid_command, errors
-from random import randint
 
 import src.help_messages as hlp
 from src.utils import get_cursor, get_flags, package_message
@@ -8,9 +7,12 @@ from src.utils import get_cursor, get_flags, package_message
 DEFAULT_HAT = "main"
 
 
+# attr     conn - connection to the SQL database
+# attr settings - SettingsCache shared with the other cogs, holds each channel's default hat
 class Hat(Cog):
-    def __init__(self, conn):
+    def __init__(self, conn, settings):
         self.conn = conn
+        self.settings = settings
 
     @hybrid_command(help=hlp.ADD_FULL,
                     brief="Add an item to the hat")
@@ -18,12 +20,11 @@ class Hat(Cog):
         cursor = get_cursor(self.conn)
 
         flags, arg = get_flags(item)
-        hat = get_hat(flags, arg, cursor, ctx.channel.id)
+        hat = self.get_hat(flags, arg, ctx.channel.id)
 
         items = [i.strip() for i in ' '.join(arg).split(',')] if 'm' in flags else [' '.join(arg)]
 
-        for item in items:
-            cursor.execute("INSERT INTO Hat (guild_id, hat_name, item) VALUES (%s, %s, %s)", [ctx.guild.id, hat, item])
+        cursor.executemany("INSERT INTO Hat (guild_id, hat_name, item) VALUES (%s, %s, %s)", [(ctx.guild.id, hat, i) for i in items])
 
         await ctx.send(f"Successfully added {len(items)} item(s) to **{hat}**.")
 
@@ -43,7 +44,7 @@ class Hat(Cog):
     async def clear(self, ctx, hat: str=None):
         cursor = get_cursor(self.conn)
 
-        hat = hat if hat else get_hat([], [], cursor, ctx.channel.id)
+        hat = hat if hat else self.get_hat([], [], ctx.channel.id)
 
         cursor.execute("DELETE FROM Hat WHERE guild_id = %s AND hat_name = %s", [ctx.guild.id, hat])
 
@@ -64,6 +65,7 @@ class Hat(Cog):
         else:
             await ctx.send("* " + "\n* ".join(i[0] for i in result))
 
+        self.conn.commit()
         cursor.close()
 
     @hybrid_command(help=hlp.PICK_FULL,
@@ -80,7 +82,7 @@ class Hat(Cog):
         cursor = get_cursor(self.conn)
 
         flags, arg = get_flags(args)
-        hat = get_hat(flags, arg, cursor, ctx.channel.id)
+        hat = self.get_hat(flags, arg, ctx.channel.id)
 
         if arg:
             try:
@@ -92,21 +94,27 @@ class Hat(Cog):
         else:
             num = 1
 
-        cursor.execute("SELECT item FROM Hat WHERE guild_id = %s AND hat_name = %s", [ctx.guild.id, hat])
+        if num < 1:
+            cursor.close()
+            await ctx.send("Invalid argument, please use a positive integer!")
+            return None
+
+        # Only the chosen rows are sent back, however many items the hat has
+        cursor.execute("SELECT id, item FROM Hat WHERE guild_id = %s AND hat_name = %s ORDER BY RAND() LIMIT %s", [ctx.guild.id, hat, num])
 
         if not (result := cursor.fetchall()):
+            self.conn.commit()
             cursor.close()
             await ctx.send(f"No items found in \"{hat}\". Try using the `$add` command first!")
             return None
 
         if num > len(result):
+            self.conn.commit()
             cursor.close()
             await ctx.send(f"Not enough items in **{hat}**. Try adding more items, or select a smaller amount!")
             return None
 
-        choices = []
-        for _ in range(num):
-            choices.append(result.pop(randint(0, len(result) - 1))[0])
+        choices = [i[1] for i in result]
 
         if num == 1:
             await ctx.send(choices[0])
@@ -114,11 +122,9 @@ class Hat(Cog):
             await ctx.send("* " + "\n* ".join(choices))
 
         if delete:
-            values = [ctx.guild.id, hat, None]
-            for item in choices:
-                values[2] = item
-                cursor.execute("DELETE FROM Hat WHERE guild_id = %s and hat_name = %s and item = %s", values)
+            cursor.execute(f"DELETE FROM Hat WHERE id IN ({', '.join(['%s'] * len(result))})", [i[0] for i in result])
 
+        # Also ends a $pick's read, so the next command does not see this snapshot
         self.conn.commit()
         cursor.close()
 
@@ -127,7 +133,7 @@ class Hat(Cog):
     async def remove(self, ctx, *, num: str):
         cursor = get_cursor(self.conn)
         flags, arg = get_flags(num)
-        hat = get_hat(flags, arg, cursor, ctx.channel.id)
+        hat = self.get_hat(flags, arg, ctx.channel.id)
 
         if not arg:
             await ctx.send("You must include an index to remove. Use `$view` to see the indexes.")
@@ -143,17 +149,24 @@ class Hat(Cog):
             cursor.close()
             return
 
-        cursor.execute("SELECT item FROM Hat WHERE guild_id = %s AND hat_name = %s", [ctx.guild.id, hat])
+        if index < 1:
+            result = []
+        else:
+            cursor.execute("SELECT id, item FROM Hat WHERE guild_id = %s AND hat_name = %s ORDER BY id LIMIT 1 OFFSET %s",
+                           [ctx.guild.id, hat, index - 1])
+            result = cursor.fetchall()
 
-        if not (result := cursor.fetchall()):
-            await ctx.send(f"No items found in \"{hat}\". Try using the `$add` command first!")
-        elif index < 1 or index > len(result):
-            await ctx.send(f"Invalid index, please use an integer in the range [1, {len(result)}]")
+        if result:
+            cursor.execute("DELETE FROM Hat WHERE id = %s", [result[0][0]])
+            await ctx.send(f"Successfully removed \"*{result[0][1]}*\" from **{hat}**.")
         else:
-            removed = result.pop(index - 1)
-            values = [ctx.guild.id, hat, removed[0]]
-            cursor.execute("DELETE FROM Hat WHERE guild_id = %s AND hat_name = %s AND item = %s", values)
-            await ctx.send(f"Successfully removed \"*{removed[0]}*\" from **{hat}**.")
+            # Only counted when the index is out of range, for the error message
+            cursor.execute("SELECT COUNT(*) FROM Hat WHERE guild_id = %s AND hat_name = %s", [ctx.guild.id, hat])
+
+            if not (count := cursor.fetchall()[0][0]):
+                await ctx.send(f"No items found in \"{hat}\". Try using the `$add` command first!")
+            else:
+                await ctx.send(f"Invalid index, please use an integer in the range [1, {count}]")
 
         self.conn.commit()
         cursor.close()
@@ -171,9 +184,9 @@ class Hat(Cog):
     async def view(self, ctx, hat: str=None):
         cursor = get_cursor(self.conn)
 
-        hat = hat if hat else get_hat([], [], cursor, ctx.channel.id)
+        hat = hat if hat else self.get_hat([], [], ctx.channel.id)
 
-        cursor.execute("SELECT item FROM Hat WHERE guild_id = %s AND hat_name = %s", [ctx.guild.id, hat])
+        cursor.execute("SELECT item FROM Hat WHERE guild_id = %s AND hat_name = %s ORDER BY id", [ctx.guild.id, hat])
 
         if not (result := cursor.fetchall()):
             await ctx.send(f"No items found in \"{hat}\". Try using the `$add` command first!")
@@ -181,31 +194,20 @@ class Hat(Cog):
             message = f"# {hat}\n" + '\n'.join(f"{i[1]}. {i[0][0]}" for i in zip(result, range(1, len(result) + 1)))
             await package_message(message, ctx, multi_send=True)
 
+        self.conn.commit()
         cursor.close()
 
     @hybrid_command(help=hlp.SET_DEFAULT_FULL,
                     brief="Set the default hat")
     async def set_default(self, ctx, hat: str=DEFAULT_HAT):
-        cursor = get_cursor(self.conn)
-
-        cursor.execute("INSERT INTO Channels (channel_id, default_hat)"
-                       "VALUES (%s, %s)"
-                       "ON DUPLICATE KEY UPDATE default_hat = VALUES(default_hat)",
-                       [ctx.channel.id, hat])
+        self.settings.set_default_hat(ctx.channel.id, hat)
 
         await ctx.send(f"Successfully set **{hat}** as the default hat for {ctx.channel.name}!")
 
-        self.conn.commit()
-        cursor.close()
-
-def get_hat(flags, arg, cursor, channel_id):
-    if 'h' in flags:
-        return arg.pop(0)
-
-    cursor.execute("SELECT default_hat FROM Channels WHERE channel_id = %s", [channel_id])
+    # Returns the hat given with -h, otherwise the channel's default hat
+    # Channels without a default use DEFAULT_HAT, nothing is written until $set_default is used
+    def get_hat(self, flags, arg, channel_id):
+        if 'h' in flags:
+            return arg.pop(0)
 
-    if not (result := cursor.fetchall()):
-        cursor.execute("INSERT INTO Channels (default_hat, channel_id) VALUES(%s, %s)", [DEFAULT_HAT, channel_id])
-        return DEFAULT_HAT
-    else:
-        return result[0][0]
+        return self.settings.get_default_hat(channel_id) or DEFAULT_HAT
@@ -1,17 +1,13 @@
-from comics import directory, search
-from comics.exceptions import InvalidEndpointError
+# Client libraries for the queried services (comics, ddgs, PIL, wikipedia, xkcd) are imported by the commands
+# that use them, most commands are never used between restarts and comics alone takes a quarter second to import
 from copy import deepcopy
 from discord import Embed, File
 from discord.ext.commands import Cog, errors, hybrid_command
-from ddgs import DDGS
 from os import getenv, remove
 from os.path import exists
-from PIL import Image
 from random import choice, randint
 from requests import get
 from re import sub
-from wikipedia import DisambiguationError, page, PageError, random, set_user_agent
-from xkcd import getComic, getLatestComic, getLatestComicNum, getRandomComic
 
 from src.global_vars import USER_AGENT
 import src.help_messages as hlp
@@ -37,8 +33,6 @@ WORDNIK_URL = "https://api.wordnik.com/v4/word.json/"
 WEATHER_API_KEY = getenv("WEATHER_TOKEN")
 WEATHER_URL = "https://api.openweathermap.org/data/2.5/weather?"
 
-set_user_agent(USER_AGENT)
-
 
 class Query(Cog):
     @hybrid_command(help=hlp.CARD_FULL,
@@ -92,6 +86,9 @@ class Query(Cog):
         if is_slash_command(ctx):
             await ctx.defer()
 
+        from comics import directory, search
+        from comics.exceptions import InvalidEndpointError
+
         try:
             comic = await run_blocking(search, query, date="random")
         except InvalidEndpointError:
@@ -165,6 +162,8 @@ class Query(Cog):
 
         search_query = ' '.join(query)
 
+        from ddgs import DDGS
+
         if not (results := DDGS().images(query=search_query, safesearch="off")):
             return await ctx.send(f"No results found for \"{search_query}\".")
 
@@ -197,6 +196,8 @@ class Query(Cog):
 
         search_query = ' '.join(query)
 
+        from ddgs import DDGS
+
         if not (results := DDGS().text(query=search_query, safesearch="off")):
             return await ctx.send(f"No results found for \"{search_query}\".")
 
@@ -223,6 +224,8 @@ class Query(Cog):
 
         search_query = ' '.join(query)
 
+        from ddgs import DDGS
+
         if not (results := DDGS().videos(query=search_query, safesearch="off")):
             return await ctx.send(f"No results found for \"{search_query}\".")
 
@@ -244,6 +247,9 @@ class Query(Cog):
 
         sub_arg = int(query.pop(0)) if 'i' in flags and query and query[0].isnumeric() else None
 
+        from wikipedia import DisambiguationError, page, PageError, random, set_user_agent
+
+        set_user_agent(USER_AGENT)
         title = random() if 'r' in flags else ' '.join(query)
 
         try:
@@ -329,6 +335,8 @@ class Query(Cog):
     async def xkcd(self, ctx, number: str="-l"):
         flags, arg = get_flags(number)
 
+        from xkcd import getComic, getLatestComic, getLatestComicNum, getRandomComic
+
         if 'r' in flags:
             comic = getRandomComic()
         elif 'l' in flags:
@@ -394,6 +402,8 @@ async def send_card(ctx, card_json):
         await ctx.send(f"**Price:** ${price}")
 
 def merge_double(link0, link1):
+    from PIL import Image
+
     with open(FACE_0, "wb") as img_file:
         img_file.write(get(link0).content)
 
@@ -435,4 +445,6 @@ def remove_border_white(img, threshold=25):
     return img
 
 def build_comic_list():
+    from comics import directory
+
     return "* " + "\n* ".join(directory.listall())
@@ -1,6 +1,5 @@
 # Cog that holds all commands related to RNG
 from discord.ext.commands import Bot, Cog, errors, hybrid_command
-from randfacts import get_fact
 from random import randint, shuffle
 
 import src.help_messages as hlp
@@ -20,6 +19,8 @@ class Random(Cog):
     async def fact(self, ctx, *, args: str=None):
         flags, = get_flags(args.lower()) if args is not None else [],
 
+        from randfacts import get_fact
+
         await ctx.send(get_fact(filter_enabled=False, only_unsafe='n' in flags))
 
     # $flip command sends either "heads" or "tails" in the channel
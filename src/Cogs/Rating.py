@@ -1,7 +1,7 @@
 from discord.ext.commands import Cog, errors, hybrid_command
-from re import findall
 
 import src.help_messages as hlp
+from src.patterns import find_votes
 from src.utils import get_cursor, package_message
 
 
@@ -73,10 +73,7 @@ class Rating(Cog):
             error.handled = True
 
     def rate_listener(self, msg):
-        # https://regex101.com/r/s8gfoV/5
-        matches = findall(r"\([\w\s']+\)(?:\+\+|--)|[\w]+(?:\+\+|--)", msg.content)
-
-        if not matches:
+        if not (matches := find_votes(msg.content)):
             return
 
         cursor = get_cursor(self.conn)
@@ -1,5 +1,4 @@
 from dataclasses import dataclass
-from dateparser import parse
 from datetime import datetime, timezone
 from discord import TextChannel, Thread
 from discord.ext.commands import Cog, errors, hybrid_command
@@ -53,6 +52,9 @@ class Reminders(Cog):
         return DEFAULT_TZ
 
     def parse_when(self, when_text, tz_name):
+        # Deferred, importing dateparser loads its timezone and language data
+        from dateparser import parse
+
         tz = ZoneInfo(tz_name)
         now_local = datetime.now(tz)
 
@@ -1,15 +1,17 @@
 from discord.ext.commands import Cog, errors, guild_only, hybrid_command
 from os import remove
-from random import choice
-from re import sub
 
+from src.file_store import get_store
 from src.functions.diff import diff
 from src.functions.dig import dig
 from src.functions.find import find
+from src.functions.sort import sort
 from src.functions.terminal import *
-from src.global_vars import FILE_ROOT_DIR, SEND_LINE_CHAR
+from src.global_vars import SEND_LINE_CHAR
 import src.help_messages as hlp
+from src.patterns import SEND_LINE
 from src.utils import get_flags, send_tts_if_in_vc
+from src.workers import run_in_worker, run_terminal_command
 
 
 class Terminal(Cog):
@@ -18,7 +20,7 @@ class Terminal(Cog):
     @hybrid_command(help=hlp.CAT_FULL,
                     brief="Read from a file")
     async def cat(self, ctx, *, filename: str):
-        result = cat(ctx.guild.id, filename)
+        result = await run_terminal_command(cat, ctx.guild.id, filename)
 
         await result.send(ctx)
 
@@ -34,7 +36,7 @@ class Terminal(Cog):
     @hybrid_command(help=hlp.CP_FULL,
                     brief="Copy a file")
     async def cp(self, ctx, *, query):
-        result = cp(ctx.guild.id, query)
+        result = await run_terminal_command(cp, ctx.guild.id, query)
 
         await result.send(ctx)
 
@@ -50,7 +52,7 @@ class Terminal(Cog):
     @hybrid_command(help=hlp.DIFF_FULL,
                     brief="Compare files line by line")
     async def diff(self, ctx, *, args):
-        result = diff(ctx.guild.id, args)
+        result = await run_terminal_command(diff, ctx.guild.id, args)
 
         await result.send(ctx)
 
@@ -105,7 +107,7 @@ class Terminal(Cog):
     @hybrid_command(help='',
                     brief="Search for files")
     async def find(self, ctx, *, arguments:str=''):
-        result = find(ctx.guild.id, arguments)
+        result = await run_terminal_command(find, ctx.guild.id, arguments)
 
         await result.send(ctx)
 
@@ -113,7 +115,7 @@ class Terminal(Cog):
     @hybrid_command(help=hlp.GREP_FULL,
                     brief="Search a file")
     async def grep(self, ctx, *, arguments: str):
-        result = grep(ctx.guild.id, arguments)
+        result = await run_terminal_command(grep, ctx.guild.id, arguments)
 
         await result.send(ctx)
 
@@ -129,7 +131,7 @@ class Terminal(Cog):
     @hybrid_command(help=hlp.HEAD_FULL.format(line_count=DEFAULT_LINE_COUNT),
                     brief=f"Returns the first {DEFAULT_LINE_COUNT} lines of a given file.")
     async def head(self, ctx, *, filename: str):
-        result = get_lines(ctx.guild.id, filename, reverse=False)
+        result = await run_terminal_command(get_lines, ctx.guild.id, filename, reverse=False)
 
         await result.send(ctx)
 
@@ -137,7 +139,7 @@ class Terminal(Cog):
     @hybrid_command(help=hlp.MV_FULL,
                     brief="Rename a file")
     async def mv(self, ctx, *, query):
-        result = mv(ctx.guild.id, query)
+        result = await run_terminal_command(mv, ctx.guild.id, query)
 
         await result.send(ctx)
 
@@ -153,7 +155,7 @@ class Terminal(Cog):
     @hybrid_command(help=hlp.NL_FULL,
                     brief=f"Outputs the lines of a given file with prefixed line numbers.")
     async def nl(self, ctx, *, filename: str):
-        result = nl(ctx.guild.id, filename)
+        result = await run_terminal_command(nl, ctx.guild.id, filename)
 
         await result.send(ctx)
 
@@ -161,7 +163,7 @@ class Terminal(Cog):
     @hybrid_command(help=hlp.TAIL_FULL.format(line_count=DEFAULT_LINE_COUNT),
                     brief=f"Returns the last {DEFAULT_LINE_COUNT} lines of a given file.")
     async def tail(self, ctx, *, filename: str):
-        result = get_lines(ctx.guild.id, filename, reverse=True)
+        result = await run_terminal_command(get_lines, ctx.guild.id, filename, reverse=True)
     
         await result.send(ctx)
 
@@ -169,7 +171,7 @@ class Terminal(Cog):
     @hybrid_command(help=hlp.LS_FULL,
                     brief="Lists present text files")
     async def ls(self, ctx):
-        result = ls(ctx.guild.id)
+        result = await run_terminal_command(ls, ctx.guild.id)
 
         await result.send(ctx)
 
@@ -177,7 +179,7 @@ class Terminal(Cog):
     @hybrid_command(help=hlp.RM_FULL,
                     brief="Remove a text file")
     async def rm(self, ctx, filename: str):
-        result = rm(ctx.guild.id, filename)
+        result = await run_terminal_command(rm, ctx.guild.id, filename)
 
         await result.send(ctx)
 
@@ -193,7 +195,7 @@ class Terminal(Cog):
     @hybrid_command(help=hlp.SORT_FULL,
                     brief="Sort the lines from a file")
     async def sort(self, ctx, *, args: str):
-        result = sort(ctx.guild.id, args)
+        result = await run_terminal_command(sort, ctx.guild.id, args)
 
         await result.send(ctx)
 
@@ -201,7 +203,7 @@ class Terminal(Cog):
     @hybrid_command(help=hlp.TEE_FULL,
                     brief="Write to a file")
     async def tee(self, ctx, *, arguments: str):
-        result = tee(ctx.guild.id, arguments)
+        result = await run_terminal_command(tee, ctx.guild.id, arguments)
 
         await result.send(ctx)
 
@@ -217,7 +219,7 @@ class Terminal(Cog):
     @hybrid_command(help=hlp.UNIQ_FULL,
                     brief="Returns or omits repeated lines")
     async def uniq(self, ctx, *, args: str):
-        result = uniq(ctx.guild.id, args)
+        result = await run_terminal_command(uniq, ctx.guild.id, args)
 
         await result.send(ctx)
 
@@ -225,7 +227,7 @@ class Terminal(Cog):
     @hybrid_command(help=hlp.WC_FULL,
                     brief="Returns various counts for a file")
     async def wc(self, ctx, *, args: str):
-        response = wc(ctx.guild.id, args)
+        response = await run_terminal_command(wc, ctx.guild.id, args)
 
         await response.send(ctx)
 
@@ -244,13 +246,23 @@ async def send_line(msg, bot):
         nonlocal msg_altered
         
         try:
-            with open(f"{FILE_ROOT_DIR}/{msg.guild.id}/{match_obj[0][1:]}.txt", "r") as in_file:
-                msg_altered = True
-                return choice(in_file.readlines()).strip()
+            if (line := get_store(msg.guild.id).random_line(match_obj[0][1:])) is None:
+                return match_obj[0]
         except FileNotFoundError:
             return match_obj[0]
 
-    response = sub(fr"{SEND_LINE_CHAR}\w+", sub_line, msg.clean_content)
+        msg_altered = True
+
+        return line.strip()
+
+    if SEND_LINE_CHAR not in msg.clean_content:
+        return False
+
+    # The first line picked from a file since it changed rebuilds that file's index, so this runs off the event loop
+    try:
+        response = await run_in_worker(SEND_LINE.sub, sub_line, msg.clean_content)
+    except TimeoutError:
+        return False
     
     if not msg_altered:
         return False
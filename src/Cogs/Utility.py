@@ -5,18 +5,19 @@ from datetime import datetime, timedelta
 import discord
 import os
 from pathlib import Path
-import qrcode
 from random import choice
 
-from src.calculator import calculator, CONST, FUNCS
+from src.calculator import calculate, CONST, FUNCS
 from src.count_project_lines import count_project_lines
 import src.help_messages as hlp
 from src.tips import TIP_LIST
 from src.utils import TEMP_DIR
-from src.utils import get_flags, get_id_from_mention, is_slash_command, package_message
+from src.utils import get_flags, get_id_from_mention, is_slash_command, package_message, run_blocking
+from src.workers import run_in_worker
 
 # Filename/path for temporary storage of QR image
 QR_FILEPATH = f"{TEMP_DIR}/temp_qr.png"
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
 
 
 class Utility(Cog):
@@ -24,7 +25,14 @@ class Utility(Cog):
     # attr bot - our client
     def __init__(self, bot: Bot):
         self.bot = bot
-        self.proj_info = count_project_lines(Path(__file__).resolve().parents[2])
+        self.proj_info = None
+
+    # Counted off the event loop, by the warmup after start up or by the first $info
+    async def load_project_info(self):
+        if self.proj_info is None:
+            self.proj_info = await run_blocking(count_project_lines, PROJECT_ROOT)
+
+        return self.proj_info
 
     # $qr command used to generate QR code images
     # param arg - all user input following command-name
@@ -60,7 +68,7 @@ class Utility(Cog):
     @hybrid_command(help=hlp.CALC_FULL.format(constants="`, `".join(CONST), functions="`, `".join(FUNCS)),
                     brief="Calculates the result of a mathematical expression")
     async def calc(self, ctx, *, expression:str):
-        await ctx.send(calculator(expression))
+        await package_message(await run_in_worker(calculate, expression), ctx, multi_send=True)
 
     @calc.error
     async def calc_error(self, ctx, error):
@@ -78,6 +86,9 @@ class Utility(Cog):
             elif isinstance(error.original, OverflowError):
                 await ctx.send("Overflow")
                 error.handled = True
+            elif isinstance(error.original, TimeoutError):
+                await ctx.send("Calculation took too long and was stopped.")
+                error.handled = True
         elif isinstance(error, errors.MissingRequiredArgument):
             await ctx.send("You must include a mathematical expression with this command.\nPlease use `$help calc` for more information.")
             error.handled = True
@@ -140,6 +151,7 @@ class Utility(Cog):
     @hybrid_command(help=hlp.INFO_FULL,
                     brief="Provides a brief synopsis of Karn")
     async def info(self, ctx):
+        await self.load_project_info()
         await ctx.send("Hello! I am Karn, your friendly Time-Travelling Golem!\n"
                        "I was developed by Vertical Bar, and am hosted locally in Kalamazoo.\n"
                        f"My current version has {self.proj_info[0]} source files with {self.proj_info[1]:,} lines of code "
@@ -156,6 +168,8 @@ class Utility(Cog):
 # Used by $qr to create a QR code image
 # param data - string of data to encode in the QR image
 def make_qr(data):
+    import qrcode
+
     qr = qrcode.QRCode(version=None,                                       # None type allows dynamic QR size
                        error_correction=qrcode.constants.ERROR_CORRECT_L,  # L <= 7% error correction
                        box_size=10,
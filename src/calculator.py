@@ -1,196 +1,255 @@
-from math import acos, asin, atan, cos, degrees, e, factorial, log, log10, pi, radians, sin, tan
+from functools import lru_cache
+from math import acos, asin, atan, cos, degrees, e, factorial, floor, lgamma, log, log10, pi, radians, sin, tan, tau
+from operator import add, mod, mul, neg, sub, truediv
 from random import random
-from re import findall, fullmatch, IGNORECASE
+from re import compile
 
+from src.process_worker import run_killable
 
-FUNCS = {"log", "ln", "sin", "cos", "tan", "asin", "acos", "atan", "sqrt", "abs", "rand", "answer", "deg", "rad"}
-CONST = {"pi", "e", "tau"}
 
+UNARY_FUNCS = {"log": log10, "ln": log, "sin": sin, "cos": cos, "tan": tan, "asin": asin, "acos": acos, "atan": atan,
+               "sqrt": lambda x: x ** 0.5, "abs": abs, "deg": degrees, "rad": radians}
+NULLARY_FUNCS = {"rand": random, "answer": lambda: 42}
+CONSTANTS = {"pi": pi, "e": e, "tau": tau}
+VARIABLES = {"x"}
+
+FUNCS = UNARY_FUNCS.keys() | NULLARY_FUNCS.keys()
+CONST = CONSTANTS.keys()
+IMPURE_FUNCS = {"rand"}
+
+CALC_TIMEOUT = 2                # Seconds an expression may take before its worker is killed
+MAX_RESULT_DIGITS = 10_000      # Largest integer (in decimal digits) `!` and `^` may produce
+MAX_OUTPUT_DIGITS = 1_900       # Integers longer than this are shown in scientific notation
+MAX_RANGE_VALUES = 101          # Values a variable may take in one `for x in start..stop` expression
+RESULT_CACHE_SIZE = 1024
+PROGRAM_CACHE_SIZE = 256
+
+PRECEDENCE = {'+': 0, '-': 0, '*': 1, '/': 1, '%': 1, 'u-': 2, '^': 3, '!': 4}
+RIGHT_ASSOC = {'^', 'u-'}
+
+# Longer names first, so a name is never matched by a prefix of another
+NAMES = sorted(FUNCS | CONST | VARIABLES, key=lambda name: (-len(name), name))
+# https://regex101.com/r/rYoPQz/2
+TOKEN_PATTERN = compile(rf"(?P<number>\d+\.?\d*)|(?P<name>{'|'.join(NAMES)})|(?P<operator>[+\-/*%()^!])")
+RANGE_PATTERN = compile(r"(.+)for([a-z]+)in(-?\d+\.?\d*)\.\.(-?\d+\.?\d*)(?:step(\d+\.?\d*))?")
+
+# Kinds of step in a compiled program
+VALUE, VARIABLE, CALL_0, CALL_1, CALL_2 = range(5)
+
+
+# Returns the formatted result of `expression`, evaluated in a worker process that is killed after `CALC_TIMEOUT`
+# Raises the same exceptions as `calculator` and WorkerTimeout (a TimeoutError) if the worker was killed
+def calculate(expression):
+    expression = expression.replace(' ', '').lower()
+
+    if any(i in expression for i in IMPURE_FUNCS):
+        return run_killable(calculator, expression, timeout=CALC_TIMEOUT)
+
+    return calculate_pure(expression)
+
+# Results of expressions without random values only depend on the expression, so they are cached
+# Exceptions are not cached by lru_cache, failing expressions are evaluated again
+@lru_cache(maxsize=RESULT_CACHE_SIZE)
+def calculate_pure(expression):
+    return run_killable(calculator, expression, timeout=CALC_TIMEOUT)
+
+# Evaluates `expression`, which may end with `for x in start..stop [step n]` to list its value over a range of x
 def calculator(expression):
-    prec = {'+': 0, '-': 0, '*': 1, '/': 1, '%': 1, 'u-': 2, '^': 3, '!': 4}
-    right_assoc = {'^': True, 'u-': True}
+    expression = expression.replace(' ', '').lower()
+
+    if (match := RANGE_PATTERN.fullmatch(expression)) is None:
+        return format_result(evaluate(compile_expression(expression)))
+
+    body, variable, start, stop, step = match.groups()
+
+    if variable not in VARIABLES:
+        raise ValueError(f"Unknown variable: `{variable}`. Available variables: `{'`, `'.join(sorted(VARIABLES))}`.")
+
+    program = compile_expression(body)
+    rows = []
+
+    for value in make_range(start, stop, step):
+        try:
+            result = format_result(evaluate(program, {variable: value}))
+        except (ArithmeticError, ValueError):
+            result = "undefined"
+
+        rows.append(f"{variable} = {format_result(value)}: {result}")
+
+    return '\n'.join(rows)
+
+def make_range(start, stop, step):
+    start, stop, step = parse_number(start), parse_number(stop), parse_number(step) if step else 1
+
+    if step <= 0:
+        raise ValueError("The step of a range must be greater than 0.")
+
+    if stop < start:
+        raise ValueError("The end of a range must not be less than its start.")
+
+    if (count := floor((stop - start) / step + 1e-9) + 1) > MAX_RANGE_VALUES:
+        raise ValueError(f"A range may contain at most {MAX_RANGE_VALUES} values.")
+
+    return [start + i * step for i in range(count)]
+
+def parse_number(string):
+    try:
+        return int(string)
+    except ValueError:
+        return float(string)
 
-    # https://regex101.com/r/rYoPQz/2
-    tokens = findall(rf"\d+\.?\d*|{'|'.join(CONST)}|{'|'.join(FUNCS)}|[+\-/*%()^!]", expression.replace(' ', ''), flags=IGNORECASE)
-    tokens = inject_implicit_mul([i.lower() for i in tokens])
+# Splits an expression into (kind, token) pairs, where kind is "number", "name" or "operator"
+# Characters that are not part of any token are skipped
+def tokenize(expression):
+    tokens = []
 
+    for match in TOKEN_PATTERN.finditer(expression.replace(' ', '').lower()):
+        kind, token = match.lastgroup, match.group()
+
+        # Multiplication is implied between a value and anything that starts a value, i.e. `2pi` or `(1+2)(3+4)`
+        if tokens and ends_value(*tokens[-1]) and (kind != "operator" or token == '('):
+            tokens.append(("operator", '*'))
+
+        tokens.append((kind, token))
+
+    return tokens
+
+def ends_value(kind, token):
+    return token == ')' or kind == "number" or token in CONSTANTS or token in VARIABLES
+
+# Compiles an expression into a program in reverse polish notation (Shunting Yard algorithm), a tuple of
+# (kind, payload) steps which `evaluate` runs without looking at any tokens again
+@lru_cache(maxsize=PROGRAM_CACHE_SIZE)
+def compile_expression(expression):
     def should_pop(top, incoming):
         if top in "()":
             return False
-        
+
         if incoming == "u-" and top == '^':
             return False
 
-        prec_t, prec_i = prec.get(top, -1), prec.get(incoming, -1)
-
-        if prec_t > prec_i:
-            return True
+        prec_t, prec_i = PRECEDENCE.get(top, -1), PRECEDENCE.get(incoming, -1)
 
-        if prec_t == prec_i and not right_assoc.get(incoming, False):
-            return True
+        return prec_t > prec_i or (prec_t == prec_i and incoming not in RIGHT_ASSOC)
 
-        return False
-
-    values, ops = [], []
+    program, ops = [], []
     prev = None
 
-    # Shunting Yard alrorithm
-    for token in tokens:
-        if (result := get_as_number(token)) is not False:
-            values.append(result)
+    for kind, token in tokenize(expression):
+        if kind == "number":
+            program.append((VALUE, parse_number(token)))
             prev = "num"
-            continue
-
-        if token in FUNCS:
+        elif token in CONSTANTS:
+            program.append((VALUE, CONSTANTS[token]))
+            prev = "num"
+        elif token in VARIABLES:
+            program.append((VARIABLE, token))
+            prev = "num"
+        elif kind == "name":
             ops.append(token)
             prev = "op"
-            continue
-        
-        if token == '!':
-            apply_operator(['!'], values)
+        elif token == '!':
+            # Factorial binds to the value right before it, so it is emitted immediately
+            program.append(compile_operator('!'))
             prev = "num"
-            continue
-
-        if token == '(':
+        elif token == '(':
             ops.append(token)
             prev = token
-            continue
-
-        if token == ')':
+        elif token == ')':
             while ops and ops[-1] != '(':
-                apply_operator(ops, values)
+                program.append(compile_operator(ops.pop()))
 
             ops.pop()
 
             if ops and ops[-1] in FUNCS:
-                apply_operator(ops, values)
+                program.append(compile_operator(ops.pop()))
 
             prev = token
-            continue
-
-        if token == '-' and (prev is None or prev in ("op", '(')):
-            token = "u-"
+        else:
+            if token == '-' and (prev is None or prev in ("op", '(')):
+                token = "u-"
 
-        while ops and should_pop(ops[-1], token):
-            apply_operator(ops, values)
+            while ops and should_pop(ops[-1], token):
+                program.append(compile_operator(ops.pop()))
 
-        ops.append(token)
-        prev = 'op'
+            ops.append(token)
+            prev = "op"
 
     while ops:
-        apply_operator(ops, values)
+        if (op := ops.pop()) == '(':
+            raise ValueError("Missing closing parenthesis.")
 
-    return format_result(values[0])
+        program.append(compile_operator(op))
 
-def is_number(tok):
-    return fullmatch(r"\d+\.?\d*", tok) is not None or tok in CONST
+    return tuple(program)
 
-def is_value(tok):
-    return tok == ')' or is_number(tok)
+def compile_operator(op):
+    if op in NULLARY_FUNCS:
+        return CALL_0, NULLARY_FUNCS[op]
 
-def starts_value(tok):
-    return tok == '(' or tok in FUNCS or is_number(tok)
+    if op in UNARY_FUNCS:
+        return CALL_1, UNARY_FUNCS[op]
 
-def inject_implicit_mul(tokens):
-    out = []
+    if op in UNARY_OPERATORS:
+        return CALL_1, UNARY_OPERATORS[op]
 
-    for tok in tokens:
-        if out:
-            prev = out[-1]
+    return CALL_2, BINARY_OPERATORS[op]
 
-            if is_value(prev) and starts_value(tok):
-                out.append('*')
+# Runs a compiled program, `variables` maps variable names to their values
+def evaluate(program, variables=None):
+    values = []
 
-        out.append(tok)
+    for kind, payload in program:
+        if kind == VALUE:
+            values.append(payload)
+        elif kind == CALL_2:
+            right = values.pop()
+            values.append(payload(values.pop(), right))
+        elif kind == CALL_1:
+            values.append(payload(values.pop()))
+        elif kind == VARIABLE:
+            if not variables or payload not in variables:
+                raise ValueError(f"`{payload}` only has a value in a range, e.g. `$calc {payload}^2 for {payload} in 0..10`.")
 
-    return out
+            values.append(variables[payload])
+        else:
+            values.append(payload())
 
-def get_as_number(string):
-    string = string.lower()
+    return values[0]
 
-    if string == "pi":
-        return pi
+def checked_factorial(val):
+    if not float(val).is_integer() or val < 0:
+        raise ValueError("Factorial is only defined for non-negative integers")
 
-    if string == 'e':
-        return e
+    # log10(n!) is known without computing n!, refuse results that would take seconds and megabytes to build
+    if lgamma(val + 1) / log(10) > MAX_RESULT_DIGITS:
+        raise ValueError("Result is too large to calculate.")
 
-    if string == "tau":
-        return pi * 2
+    return factorial(int(val))
 
-    try:
-        return int(string)
-    except ValueError:
-        try:
-            return float(string)
-        except ValueError:
-            return False
+def checked_power(left, right):
+    # Float powers overflow on their own, only exact integer powers can grow without bound
+    if isinstance(left, int) and isinstance(right, int) and abs(left) > 1 and right * log10(abs(left)) > MAX_RESULT_DIGITS:
+        raise ValueError("Result is too large to calculate.")
 
-def apply_operator(ops, values):
-    op = ops.pop()
-
-    if op == '!':
-        val = values.pop()
-        
-        if not float(val).is_integer() or val < 0:
-            raise ValueError("Factorial is only defined for non-negative integers")
-
-        values.append(factorial(int(val)))
-        
-        return
-
-    if op == "ln":
-        values.append(log(values.pop()))
-    elif op == "log":
-        values.append(log10(values.pop()))
-    elif op == "sin":
-        values.append(sin(values.pop()))
-    elif op == "cos":
-        values.append(cos(values.pop()))
-    elif op == "tan":
-        values.append(tan(values.pop()))
-    elif op == "asin":
-        values.append(asin(values.pop()))
-    elif op == "acos":
-        values.append(acos(values.pop()))
-    elif op == "atan":
-        values.append(atan(values.pop()))
-    elif op == "sqrt":
-        values.append(values.pop() ** 0.5)
-    elif op == "abs":
-        values.append(abs(values.pop()))
-    elif op == "rand":
-        values.append(random())
-    elif op == "answer":
-        values.append(42)
-    elif op == "deg":
-        values.append(degrees(values.pop()))
-    elif op == "rad":
-        values.append(radians(values.pop()))
-    elif op == "u-":
-        values.append(-1 * values.pop())
-    else:
-        right = values.pop()
-        left = values.pop()
-
-        if op == '+':
-            values.append(left + right)
-        elif op == '-':
-            values.append(left - right)
-        elif op == '*':
-            values.append(left * right)
-        elif op == '/':
-            values.append(left / right)
-        elif op == '^':
-            values.append(left ** right)
-        elif op == "%":
-            values.append(left % right)
-        else:
-            raise ValueError(f"Unknown operator: {op}")
+    return left ** right
+
+UNARY_OPERATORS = {"u-": neg, '!': checked_factorial}
+BINARY_OPERATORS = {'+': add, '-': sub, '*': mul, '/': truediv, '%': mod, '^': checked_power}
 
 def format_result(x, sig=15, eps=1e-12):
     if abs(x) < eps:
         return "0"
 
+    # Exact integers are never converted to float, which overflows past 1e308
+    if isinstance(x, int):
+        if abs(x) < 10 ** MAX_OUTPUT_DIGITS:
+            return str(x)
+
+        exponent = floor(log10(abs(x)))
+
+        return f"{format(x / 10 ** exponent, f'.{sig - 1}f').rstrip('0').rstrip('.')}e+{exponent}"
+
     nearest = round(x)
 
     if abs(x - nearest) < eps * max(1.0, abs(x)):
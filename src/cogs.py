@@ -13,19 +13,26 @@ from src.Cogs.Rating import Rating
 from src.Cogs.Reminder import Reminders
 from src.Cogs.Terminal import Terminal
 from src.Cogs.Utility import Utility
+from src.settings_cache import SettingsCache
 
 # Adds each cogs to the bot, this is called once the bot is ready for the first time
 # param   bot - commands.Bot object containing our client
 # param guild - discord.Guild object containing the target server
 async def add_cogs(bot, conn):
+    # Shared by the cogs that read channel and user settings, so a change made through one is seen by the others
+    settings = SettingsCache(conn)
+
     await bot.add_cog(SlashHelp(bot))
-    await bot.add_cog(AI(bot, conn))
+    await bot.add_cog(AI(bot, conn, settings))
     await bot.add_cog(DailyLoop(bot, conn))
-    await bot.add_cog(Games())
-    await bot.add_cog(Hat(conn))
+    await bot.add_cog(Games(conn))
+    await bot.add_cog(Hat(conn, settings))
     await bot.add_cog(Query())
     await bot.add_cog(Random(bot))
     await bot.add_cog(Rating(conn))
     await bot.add_cog(Reminders(bot, conn))
     await bot.add_cog(Terminal())
     await bot.add_cog(Utility(bot))
+
+    # Commands are only registered here, so the help is rendered once they all are
+    bot.help_command.index.build(bot)
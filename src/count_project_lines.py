@@ -1,8 +1,14 @@
 from io import StringIO
+from json import dump, load
+from pathlib import Path
 import tokenize as t
 
+from src.global_vars import TEMP_DIR
+
 
 EXCLUDED_DIRS = {".git", ".venv", "venv", "__pycache__"}
+# Counts per file, keyed by path and only recounted when a file's size or modification time changes
+CACHE_PATH = Path(TEMP_DIR) / "line_counts.json"
 
 
 def count_physical_lines(path):
@@ -22,12 +28,40 @@ def count_significant_lines(path):
                 lines.update(range(token.start[0], token.end[0] + 1))
     except (IndentationError, t.TokenError, SyntaxError):
         return 0
-    
+
     return len(lines)
 
-def count_project_lines(root):
+def load_counts(cache_path):
+    try:
+        with cache_path.open('r') as infile:
+            return load(infile)
+    except (OSError, ValueError):
+        return {}
+
+def save_counts(cache_path, counts):
+    cache_path.parent.mkdir(exist_ok=True)
+
+    with cache_path.open('w') as outfile:
+        dump(counts, outfile)
+
+def count_project_lines(root, cache_path=CACHE_PATH):
     files =  [i for i in root.rglob("*.py") if not any(j in EXCLUDED_DIRS for j in i.parts)]
-    physical_lines = sum(count_physical_lines(i) for i in files)
-    significant_lines = sum(count_significant_lines(i) for i in files)
+    cached = load_counts(cache_path)
+    counts = {}
+
+    for path in files:
+        stat = path.stat()
+        signature = [stat.st_size, stat.st_mtime_ns]
+
+        if (entry := cached.get(key := str(path))) is None or entry[:2] != signature:
+            entry = [*signature, count_physical_lines(path), count_significant_lines(path)]
+
+        counts[key] = entry
+
+    if counts != cached:
+        save_counts(cache_path, counts)
+
+    physical_lines = sum(i[2] for i in counts.values())
+    significant_lines = sum(i[3] for i in counts.values())
 
     return len(files), physical_lines, significant_lines
@@ -0,0 +1,59 @@
+from dataclasses import dataclass
+from os import stat
+from os.path import normpath
+from time import monotonic
+
+
+STAT_INTERVAL = 5   # Seconds a cached entry is trusted before the file is stat'd again
+
+
+@dataclass(slots=True)
+class CacheEntry:
+    signature: tuple | None
+    value: object
+    checked: float
+
+
+# path -> {loader -> CacheEntry}
+CACHE = {}
+
+
+def get_signature(path):
+    try:
+        stats = stat(path)
+    except FileNotFoundError:
+        return None
+
+    return stats.st_mtime_ns, stats.st_size
+
+# Returns `loader(path)`, only calling the loader again once the file has changed on disk
+# param   path - path of the file to load
+# param loader - function that takes a path and returns the value to cache
+# param default - value returned (and cached) while the file does not exist
+def load_cached(path, loader, default=None):
+    path = normpath(path)
+    now = monotonic()
+    entries = CACHE.setdefault(path, {})
+
+    if (entry := entries.get(loader)) is not None and now - entry.checked < STAT_INTERVAL:
+        return entry.value
+
+    signature = get_signature(path)
+
+    if entry is not None and entry.signature == signature:
+        entry.checked = now
+
+        return entry.value
+
+    try:
+        value = default if signature is None else loader(path)
+    except FileNotFoundError:
+        signature, value = None, default
+
+    entries[loader] = CacheEntry(signature, value, now)
+
+    return value
+
+# Drops every cached value for a path, called by anything that writes to a cached file
+def invalidate(path):
+    CACHE.pop(normpath(path), None)
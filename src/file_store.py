@@ -0,0 +1,404 @@
+# Random access to the text files in a guild's directory
+# Each file gets a line-offset index, persisted next to it in a hidden directory and kept up to date as
+# lines are appended, so that reading a window of lines, counting lines, or picking a random line only
+# touches the requested lines (through mmap) instead of reading the whole file
+# Every write to a guild file goes through the store as well: appends to the same file are serialized and
+# batched, while overwrites, copies and moves replace the file atomically and keep its index coherent
+
+from array import array
+from collections import OrderedDict
+from contextlib import contextmanager, ExitStack
+from dataclasses import dataclass, field
+from itertools import accumulate
+from mmap import ACCESS_READ, mmap
+from os import fsync, listdir, replace, scandir, stat
+from pathlib import Path
+from random import sample
+from shutil import copyfile
+from struct import calcsize, error as StructError, pack, unpack
+from threading import Lock, Timer
+from time import monotonic
+
+from src.file_cache import invalidate
+from src.global_vars import FILE_ROOT_DIR
+
+
+INDEX_DIR = ".index"
+INDEX_HEADER = "<qq"            # Size and mtime (ns) of the file the index was built from
+INDEX_HEADER_SIZE = calcsize(INDEX_HEADER)
+SCAN_BLOCK_SIZE = 1 << 23       # Bytes scanned at once when (re)building an index
+FSYNC_INTERVAL = 5              # Seconds between fsyncs of a file that is being appended to
+MAX_CACHED_INDEXES = 64         # Indexes kept in memory per guild, least recently used ones are reloaded from disk
+
+
+# attr signature - (size, mtime_ns) of the file when the index was last brought up to date
+# attr   offsets - 0 followed by the offset just past every newline in the file
+@dataclass(slots=True)
+class LineIndex:
+    signature: tuple
+    offsets: array
+
+    @property
+    def size(self):
+        return self.signature[0]
+
+    # An unterminated final line still counts as a line
+    @property
+    def line_count(self):
+        return len(self.offsets) - 1 + (self.size > self.offsets[-1])
+
+    def get_span(self, line):
+        return self.offsets[line], self.offsets[line + 1] if line + 1 < len(self.offsets) else self.size
+
+
+# Appends waiting to be written to one file
+# attr    pending - data queued by `append` that has not been written yet
+# attr       lock - guards `pending`
+# attr write_lock - held while the file is being written, replaced, moved or removed
+# attr     synced - monotonic time of the last fsync
+# attr sync_timer - Timer that fsyncs the file once the interval has passed, None if none is scheduled
+@dataclass(slots=True)
+class WriteQueue:
+    pending: list = field(default_factory=list)
+    lock: Lock = field(default_factory=Lock)
+    write_lock: Lock = field(default_factory=Lock)
+    synced: float = 0.0
+    sync_timer: Timer = None
+
+
+# Metadata of one text file, taken once per directory snapshot
+@dataclass(slots=True)
+class FileEntry:
+    stem: str
+    size: int
+    mtime: float
+
+
+def get_signature(path):
+    stats = stat(path)
+
+    return stats.st_size, stats.st_mtime_ns
+
+# Appends the offset just past every newline in `data[start:end]` to `offsets`
+def scan_offsets(data, start, end, offsets):
+    for block_start in range(start, end, SCAN_BLOCK_SIZE):
+        parts = data[block_start:min(end, block_start + SCAN_BLOCK_SIZE)].split(b'\n')
+        ends = accumulate(map((1).__add__, map(len, parts[:-1])), initial=block_start)
+        next(ends)
+        offsets.extend(ends)
+
+def open_mmap(path):
+    with open(path, "rb") as in_file:
+        return mmap(in_file.fileno(), 0, access=ACCESS_READ)
+
+
+class GuildFileStore:
+    def __init__(self, guild_id):
+        self.directory = Path(FILE_ROOT_DIR) / str(guild_id)
+        self.index_dir = self.directory / INDEX_DIR
+        self.indexes = OrderedDict()
+        self.queues = {}
+        self.listing = None
+        self.lock = Lock()
+
+    # Returns the metadata of every text file in the directory, each file is stat'd once
+    def get_snapshot(self):
+        entries = []
+
+        with scandir(self.directory) as directory:
+            for entry in directory:
+                if entry.name.endswith(".txt") and entry.name != ".txt" and entry.is_file():
+                    stats = entry.stat()
+                    entries.append(FileEntry(entry.name[:-4], stats.st_size, stats.st_mtime))
+
+        return entries
+
+    # Returns the sorted names shown by `ls`, only listing the directory again once its mtime changes
+    def list_names(self):
+        mtime = stat(self.directory).st_mtime_ns
+
+        if self.listing is None or self.listing[0] != mtime:
+            names = [i.replace(".txt", '') for i in sorted(listdir(self.directory)) if i[0] != '.']
+            self.listing = mtime, names
+
+        return self.listing[1]
+
+    def get_path(self, name):
+        return self.directory / f"{name}.txt"
+
+    def get_index_path(self, name):
+        return self.index_dir / f"{name}.idx"
+
+    # Returns the index for a file, only rebuilding it if the file was changed outside of the store
+    # Raises FileNotFoundError if the file does not exist
+    def get_index(self, name):
+        signature = get_signature(path := self.get_path(name))
+
+        with self.lock:
+            if (index := self.load_index(name)) is not None and index.signature == signature:
+                return index
+
+            offsets = array('Q', [0])
+
+            if signature[0]:
+                with open_mmap(path) as data:
+                    scan_offsets(data, 0, signature[0], offsets)
+
+            index = self.cache_index(name, LineIndex(signature, offsets))
+            self.save_index(name, index)
+
+        return index
+
+    # Keeps an index in memory, dropping the least recently used one past MAX_CACHED_INDEXES
+    # The caller must hold `self.lock`
+    def cache_index(self, name, index):
+        self.indexes[name] = index
+        self.indexes.move_to_end(name)
+
+        if len(self.indexes) > MAX_CACHED_INDEXES:
+            self.indexes.popitem(last=False)
+
+        return index
+
+    # Returns the in-memory or persisted index for a file without validating it
+    def load_index(self, name):
+        if (index := self.indexes.get(name)) is not None:
+            self.indexes.move_to_end(name)
+            return index
+
+        try:
+            with open(self.get_index_path(name), "rb") as in_file:
+                signature = unpack(INDEX_HEADER, in_file.read(INDEX_HEADER_SIZE))
+                offsets = array('Q')
+                offsets.frombytes(in_file.read())
+        except (FileNotFoundError, StructError, ValueError):
+            return None
+
+        return self.cache_index(name, LineIndex(signature, offsets))
+
+    def save_index(self, name, index, start=0):
+        self.index_dir.mkdir(exist_ok=True)
+
+        if not (index_path := self.get_index_path(name)).is_file():
+            start = 0
+
+        # A new index is written next to the old one and renamed into place
+        if not start:
+            temp_path = index_path.with_name(f".{index_path.name}.tmp")
+
+            try:
+                with open(temp_path, "wb") as out_file:
+                    out_file.write(pack(INDEX_HEADER, *index.signature))
+                    out_file.write(index.offsets.tobytes())
+
+                replace(temp_path, index_path)
+            finally:
+                temp_path.unlink(missing_ok=True)
+
+            return
+
+        # Only the new offsets and then the header are written when extending an existing index. Until the header
+        # is rewritten it still holds the signature from before the append, which no longer matches the file, so
+        # an index cut short mid-write is rebuilt instead of trusted
+        with open(index_path, "r+b") as out_file:
+            out_file.seek(INDEX_HEADER_SIZE + start * index.offsets.itemsize)
+            out_file.write(index.offsets[start:].tobytes())
+            out_file.truncate()
+            out_file.flush()
+            out_file.seek(0)
+            out_file.write(pack(INDEX_HEADER, *index.signature))
+
+    # Removes the index for a file, the caller must hold `self.lock`
+    def drop_index(self, name):
+        self.indexes.pop(name, None)
+        self.get_index_path(name).unlink(missing_ok=True)
+
+    def discard(self, name):
+        with self.lock:
+            self.drop_index(name)
+
+    # Brings the index of a file up to date after an append, `previous` is the signature from before the append
+    def extend_index(self, name, previous):
+        path = self.get_path(name)
+
+        with self.lock:
+            if (index := self.load_index(name)) is None or index.signature != previous:
+                self.drop_index(name)
+                return
+
+            start = len(index.offsets) - 1
+            index.signature = get_signature(path)
+
+            if index.size > index.offsets[-1]:
+                with open_mmap(path) as mapped:
+                    scan_offsets(mapped, index.offsets[-1], index.size, index.offsets)
+
+            self.save_index(name, index, start=start)
+
+    def get_queue(self, name):
+        with self.lock:
+            if (queue := self.queues.get(name)) is None:
+                queue = self.queues[name] = WriteQueue()
+
+        return queue
+
+    # Holds the write locks of the given files, always taken in sorted order so two commands cannot deadlock
+    @contextmanager
+    def locked(self, *names):
+        with ExitStack() as stack:
+            for name in sorted(set(names)):
+                stack.enter_context(self.get_queue(name).write_lock)
+
+            yield
+
+    # Appends `data` to a file. Appends that arrive while the file is being written are queued and then
+    # written together by whichever caller gets the file next, so each append lands whole and in order
+    def append(self, name, data):
+        queue = self.get_queue(name)
+
+        with queue.lock:
+            queue.pending.append(data)
+
+        with queue.write_lock:
+            with queue.lock:
+                batch, queue.pending = queue.pending, []
+
+            # Already written as part of another caller's batch
+            if not batch:
+                return
+
+            path = self.get_path(name)
+
+            try:
+                previous = get_signature(path)
+            except FileNotFoundError:
+                previous = None
+
+            with open(path, 'a') as out_file:
+                out_file.write(''.join(batch))
+
+                if (now := monotonic()) - queue.synced >= FSYNC_INTERVAL:
+                    out_file.flush()
+                    fsync(out_file.fileno())
+                    queue.synced = now
+                # The last batch of a burst is synced once the interval has passed instead of never
+                elif queue.sync_timer is None:
+                    queue.sync_timer = Timer(FSYNC_INTERVAL - (now - queue.synced), self.sync, (name,))
+                    queue.sync_timer.daemon = True
+                    queue.sync_timer.start()
+
+            invalidate(path)
+            self.extend_index(name, previous)
+
+    # Flushes a file appended to since its last fsync to disk, run by the queue's sync timer
+    def sync(self, name):
+        queue = self.get_queue(name)
+
+        with queue.write_lock:
+            queue.sync_timer = None
+
+            try:
+                with open(self.get_path(name), "rb") as in_file:
+                    fsync(in_file.fileno())
+            except FileNotFoundError:
+                return
+
+            queue.synced = monotonic()
+
+    # Writes a new version of a file next to it and renames it into place, so readers only ever see a whole file
+    # param fill - function that writes the new contents to the temporary path it is given
+    def replace_atomic(self, name, fill):
+        path = self.get_path(name)
+        temp_path = path.with_name(f".{path.name}.tmp")
+
+        try:
+            fill(temp_path)
+
+            with open(temp_path, "rb") as temp_file:
+                fsync(temp_file.fileno())
+
+            replace(temp_path, path)
+        finally:
+            temp_path.unlink(missing_ok=True)
+
+        invalidate(path)
+        self.discard(name)
+
+    def overwrite(self, name, data):
+        with self.locked(name):
+            self.replace_atomic(name, lambda temp_path: temp_path.write_text(data))
+
+    # Raises FileNotFoundError if `source` does not exist
+    def copy(self, source, destination):
+        with self.locked(source, destination):
+            self.replace_atomic(destination, lambda temp_path: copyfile(self.get_path(source), temp_path))
+
+    # Raises FileNotFoundError if `source` does not exist
+    def move(self, source, destination):
+        with self.locked(source, destination):
+            self.get_path(source).rename(self.get_path(destination))
+            invalidate(self.get_path(source))
+            invalidate(self.get_path(destination))
+
+            # A rename keeps the file's size and mtime, so its index stays valid and moves with it
+            with self.lock:
+                index = self.load_index(source)
+                self.drop_index(destination)
+
+                if index is not None and source != destination:
+                    self.cache_index(destination, self.indexes.pop(source))
+
+                    try:
+                        self.get_index_path(source).replace(self.get_index_path(destination))
+                    except FileNotFoundError:
+                        pass
+
+    # Raises FileNotFoundError if the file does not exist
+    def remove(self, name):
+        with self.locked(name):
+            self.get_path(name).unlink()
+            invalidate(self.get_path(name))
+            self.discard(name)
+
+    def count_lines(self, name):
+        return self.get_index(name).line_count
+
+    # Returns the text of the lines selected by `lines` (a slice of line numbers) as a single string
+    def read_lines(self, name, lines):
+        index = self.get_index(name)
+        start, stop, _ = lines.indices(index.line_count)
+
+        if start >= stop:
+            return ''
+
+        with open_mmap(self.get_path(name)) as data:
+            return data[index.offsets[start]:index.get_span(stop - 1)[1]].decode()
+
+    # Returns up to `count` distinct lines chosen uniformly at random, in random order
+    # Only the chosen line numbers are generated (random.sample over a range), so this is O(count)
+    def sample_lines(self, name, count):
+        index = self.get_index(name)
+
+        if not (line_numbers := sample(range(index.line_count), min(count, index.line_count))):
+            return []
+
+        with open_mmap(self.get_path(name)) as data:
+            return [data[slice(*index.get_span(i))].decode() for i in line_numbers]
+
+    # Returns a uniformly chosen line, or None if the file is empty
+    def random_line(self, name):
+        return next(iter(self.sample_lines(name, 1)), None)
+
+
+STORES = {}
+STORES_LOCK = Lock()
+
+
+# Called from worker threads as well as the event loop, so two threads cannot create separate stores for a guild
+def get_store(guild_id):
+    if (store := STORES.get(guild_id)) is None:
+        with STORES_LOCK:
+            if (store := STORES.get(guild_id)) is None:
+                store = STORES[guild_id] = GuildFileStore(guild_id)
+
+    return store
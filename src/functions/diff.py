@@ -1,11 +1,169 @@
-from difflib import SequenceMatcher
-from re import sub
+from bisect import bisect_left
+from collections import Counter
+from difflib import Match, SequenceMatcher
+from re import compile
 
 from src.utils import get_flags, get_lines_from_file
 from src.util_objects import TerminalResult as TR
 
 
 DEFAULT_CONTEXT_LINES = 3
+MAX_EDIT_DISTANCE = 256     # Edits searched for in a region without unique lines before it is reported as one change
+
+WHITESPACE = compile(r"\s+")
+
+
+# Drop-in replacement for difflib.SequenceMatcher when comparing lines, only the matching blocks are computed
+# differently so `get_opcodes` and `get_grouped_opcodes` are inherited unchanged
+# Uses patience diff: lines that occur exactly once on both sides anchor the diff (longest increasing run),
+# and the gaps between anchors are split again the same way. Gaps without unique lines fall back to Myers'
+# O(ND) algorithm, bounded by `MAX_EDIT_DISTANCE`, so the worst case stays close to linear
+class LineMatcher(SequenceMatcher):
+    def __init__(self, a, b):
+        super().__init__(None, a, b, autojunk=False)
+
+    def set_seqs(self, a, b):
+        self.a = a
+        self.b = b
+        self.matching_blocks = self.opcodes = None
+
+    def get_matching_blocks(self):
+        if self.matching_blocks is not None:
+            return self.matching_blocks
+
+        a, b = self.a, self.b
+        blocks = []
+        regions = [(0, len(a), 0, len(b))] if a != b else []
+
+        if a and a == b:
+            blocks.append((0, 0, len(a)))
+
+        while regions:
+            alo, ahi, blo, bhi = regions.pop()
+            start = alo
+
+            while alo < ahi and blo < bhi and a[alo] == b[blo]:
+                alo += 1
+                blo += 1
+
+            if alo > start:
+                blocks.append((start, blo - (alo - start), alo - start))
+
+            end = ahi
+
+            while alo < ahi and blo < bhi and a[ahi - 1] == b[bhi - 1]:
+                ahi -= 1
+                bhi -= 1
+
+            if ahi < end:
+                blocks.append((ahi, bhi, end - ahi))
+
+            if alo == ahi or blo == bhi:
+                continue
+
+            if anchors := get_unique_anchors(a, alo, ahi, b, blo, bhi):
+                for i, j in anchors:
+                    blocks.append((i, j, 1))
+                    regions.append((alo, i, blo, j))
+                    alo, blo = i + 1, j + 1
+
+                regions.append((alo, ahi, blo, bhi))
+            else:
+                blocks.extend(get_myers_blocks(a, alo, ahi, b, blo, bhi) or ())
+
+        blocks.sort()
+        self.matching_blocks = []
+
+        for i, j, size in blocks:
+            if self.matching_blocks and (last := self.matching_blocks[-1]).a + last.size == i and last.b + last.size == j:
+                self.matching_blocks[-1] = Match(last.a, last.b, last.size + size)
+            else:
+                self.matching_blocks.append(Match(i, j, size))
+
+        self.matching_blocks.append(Match(len(a), len(b), 0))
+
+        return self.matching_blocks
+
+# Returns the longest run of (i, j) pairs of lines that are unique on both sides and appear in the same order
+def get_unique_anchors(a, alo, ahi, b, blo, bhi):
+    a_counts = Counter(a[alo:ahi])
+    b_counts = Counter(b[blo:bhi])
+    b_positions = {b[j]: j for j in range(blo, bhi) if b_counts[b[j]] == 1}
+    pairs = [(i, b_positions[a[i]]) for i in range(alo, ahi) if a_counts[a[i]] == 1 and a[i] in b_positions]
+
+    # Patience sorting, `tails[k]` is the smallest j that ends an increasing run of length k + 1
+    tails = []
+    tail_indices = []
+    previous = [None] * len(pairs)
+
+    for index, (_, j) in enumerate(pairs):
+        if k := bisect_left(tails, j):
+            previous[index] = tail_indices[k - 1]
+
+        if k == len(tails):
+            tails.append(j)
+            tail_indices.append(index)
+        else:
+            tails[k] = j
+            tail_indices[k] = index
+
+    anchors = []
+    index = tail_indices[-1] if tail_indices else None
+
+    while index is not None:
+        anchors.append(pairs[index])
+        index = previous[index]
+
+    return anchors[::-1]
+
+# Myers' greedy shortest edit script over a[alo:ahi] and b[blo:bhi], returns the matched lines as (i, j, 1) blocks
+# Returns None if more than `max_edits` insertions and deletions are needed
+def get_myers_blocks(a, alo, ahi, b, blo, bhi, max_edits=MAX_EDIT_DISTANCE):
+    n, m = ahi - alo, bhi - blo
+
+    # Every line without a partner on the other side costs an edit, skip the search if that alone is too many
+    if n + m - 2 * sum((Counter(a[alo:ahi]) & Counter(b[blo:bhi])).values()) > max_edits:
+        return None
+
+    furthest = {1: 0}
+    trace = []
+
+    for d in range(min(n + m, max_edits) + 1):
+        trace.append(furthest.copy())
+
+        for k in range(-d, d + 1, 2):
+            x = furthest[k + 1] if k == -d or (k != d and furthest[k - 1] < furthest[k + 1]) else furthest[k - 1] + 1
+            y = x - k
+
+            while x < n and y < m and a[alo + x] == b[blo + y]:
+                x += 1
+                y += 1
+
+            furthest[k] = x
+
+            if x >= n and y >= m:
+                return backtrack_myers(trace, n, m, alo, blo)
+
+    return None
+
+def backtrack_myers(trace, x, y, alo, blo):
+    blocks = []
+
+    for d in range(len(trace) - 1, -1, -1):
+        furthest = trace[d]
+        k = x - y
+        previous_k = k + 1 if k == -d or (k != d and furthest[k - 1] < furthest[k + 1]) else k - 1
+        previous_x = furthest[previous_k]
+        previous_y = previous_x - previous_k
+
+        while x > previous_x and y > previous_y:
+            x -= 1
+            y -= 1
+            blocks.append((alo + x, blo + y, 1))
+
+        x, y = previous_x, previous_y
+
+    return blocks
 
 
 def is_blank_change(opcode, left, right):
@@ -85,9 +243,9 @@ def normalize_line(line, ignore_case=False, ignore_space_changes=False, ignore_a
     content = line.rstrip('\n')
 
     if ignore_all_space:
-        content = sub(r"\s+", '', content)
+        content = WHITESPACE.sub('', content)
     elif ignore_space_changes:
-        content = sub(r"\s+", ' ', content).strip()
+        content = WHITESPACE.sub(' ', content).strip()
 
     if ignore_case:
         content = content.casefold()
@@ -114,9 +272,6 @@ def diff(guild_id, arguments, stdin=None):
     ignore_space_changes = 'b' in flags
     ignore_case = 'i' in flags
     ignore_all_space = 'w' in flags
-    compare_left = [normalize_line(line, ignore_case, ignore_space_changes, ignore_all_space) for line in left.stdout]
-    compare_right = [normalize_line(line, ignore_case, ignore_space_changes, ignore_all_space) for line in right.stdout]
-    matcher = SequenceMatcher(None, compare_left, compare_right)
 
     if 'u' in flags or 'U' in flags:
         try:
@@ -127,6 +282,29 @@ def diff(guild_id, arguments, stdin=None):
                              "Use `$help nl` for more information.",
                       exit_code=2)
 
+    # Identical files (compared by line count first) need no matching at all
+    if left.stdout == right.stdout:
+        return TR(stdout='', formatted_output=None, exit_code=0)
+
+    # Every distinct line is normalized once and replaced by a small integer, so the matcher only compares ints
+    line_ids = {}
+    normalized_ids = {}
+
+    def intern_lines(lines):
+        ids = []
+
+        for line in lines:
+            if (line_id := line_ids.get(line)) is None:
+                normalized = normalize_line(line, ignore_case, ignore_space_changes, ignore_all_space)
+                line_id = line_ids[line] = normalized_ids.setdefault(normalized, len(normalized_ids))
+
+            ids.append(line_id)
+
+        return ids
+
+    matcher = LineMatcher(intern_lines(left.stdout), intern_lines(right.stdout))
+
+    if 'u' in flags or 'U' in flags:
         output = format_unified_diff(matcher, left.stdout, right.stdout, args[0], args[1], context_lines, ignore_blank_lines=ignore_blank_lines)
     else:
         output = format_normal_diff(matcher, left.stdout, right.stdout, ignore_blank_lines=ignore_blank_lines)
@@ -1,21 +1,25 @@
-from asyncio import to_thread
-from dataclasses import dataclass
+from asyncio import create_task, DatagramProtocol, FIRST_COMPLETED, gather, get_running_loop, Semaphore, wait, wait_for
+from dataclasses import dataclass, field
 from datetime import datetime
-from dns.exception import Timeout
+from dns.asyncquery import tcp, udp
+from dns.exception import DNSException, Timeout
 import dns.flags
+import dns.message
 from dns.message import make_query
 import dns.name
 import dns.opcode
-from dns.query import tcp, udp
 import dns.rcode
 import dns.rdataclass
 import dns.rdatatype
 from ipaddress import ip_address
-from random import shuffle
-from time import perf_counter
+from itertools import islice
+from random import randrange, shuffle
+from socket import AF_INET, AF_INET6
+from time import monotonic, perf_counter
 
 from src.utils import get_flags
 from src.util_objects import TerminalResult as TR
+from src.workers import run_in_worker
 
 
 HEADER_LINE = "; <<>> Domain information Groper (Karn Style) <<>> "
@@ -27,6 +31,16 @@ DEFAULT_PORT = 53
 NAME_WIDTH = 30
 DATA_WIDTH = 7
 TRACE_MAX_STEPS = 20
+# Servers queried at once for each trace step, the first to answer is used
+TRACE_RACE_WIDTH = 3
+MAX_CACHE_ENTRIES = 4096
+ADDRESS_RECORD_TYPES = (dns.rdatatype.A, dns.rdatatype.AAAA)
+STATUS_WIDTH = 9
+# Several names (or names piped in) are looked up as one batch, queries in flight are limited by -j
+MAX_BATCH_QUERIES = 100
+DEFAULT_BATCH_LIMIT = 16
+MAX_BATCH_LIMIT = 64
+BATCH_TIMEOUT = 10
 
 ROOT_SERVERS = [
     # IPv4
@@ -45,8 +59,8 @@ ROOT_SERVERS = [
     "202.12.27.33",     # m.root-servers.net
 ]
 
-async def dig(user_query):
-    options = DigOptions(user_query)
+async def dig(user_query, stdin=None):
+    options = DigOptions(user_query, [] if stdin is None else await run_in_worker(read_stdin_lines, stdin))
 
     if options.error_status:
         return TR(stderr=options.error_message, exit_code=1)
@@ -54,6 +68,8 @@ async def dig(user_query):
     try:
         if options.trace:
             output = await trace_lookup(options)
+        elif len(options.lookups) > 1:
+            output = await batch_lookup(options)
         else:
             query = make_dig_query(options.domain, options.rdtype, options)
             response, elapsed_ms = await send_timed_dns_query(query, options.nameserver, options)
@@ -77,6 +93,94 @@ async def dig(user_query):
 
         return TR(stdout=output, formatted_output=f"```text\n{output}\n```", exit_code=0)
 
+# Runs every lookup of a batch concurrently, at most options.batch_limit at a time, over one UDP socket
+# Lookups still running after BATCH_TIMEOUT are reported as timed out, so a batch is bounded rather than each lookup
+async def batch_lookup(options):
+    limit = Semaphore(options.batch_limit)
+    sock = None if options.use_tcp else await open_dns_socket(options.nameserver, options.port)
+
+    async def lookup(domain, rdtype):
+        async with limit:
+            query = make_dig_query(domain, rdtype, options)
+            start = perf_counter()
+
+            if sock is None:
+                response = await send_dns_query(query, options.nameserver, options)
+            # Truncated answers are asked again over TCP, as dig does
+            elif (response := await sock.query(query)).flags & dns.flags.TC:
+                response = await tcp(query, options.nameserver, timeout=5, port=options.port)
+
+            return response, round((perf_counter() - start) * 1000)
+
+    start = perf_counter()
+    tasks = [create_task(lookup(*i)) for i in options.lookups]
+
+    try:
+        await wait(tasks, timeout=BATCH_TIMEOUT)
+    finally:
+        for task in tasks:
+            task.cancel()
+
+        await gather(*tasks, return_exceptions=True)
+
+        if sock is not None:
+            sock.close()
+
+    results = [get_batch_result(i) for i in tasks]
+    output = format_batch_short(options, results) if options.short else format_batch_table(options, results)
+
+    if options.show_stats and not options.short:
+        output += f"\n\n;; {len(tasks)} queries to {options.nameserver}#{options.port} in {round((perf_counter() - start) * 1000)} ms"
+
+    return output
+
+# Returns (response, elapsed_ms, status) of a finished lookup, response and elapsed_ms are None if it failed
+def get_batch_result(task):
+    if task.cancelled():
+        return None, None, "TIMEOUT"
+
+    if (error := task.exception()) is not None:
+        return None, None, "TIMEOUT" if isinstance(error, Timeout) else type(error).__name__
+
+    response, elapsed_ms = task.result()
+
+    return response, elapsed_ms, dns.rcode.to_text(response.rcode())
+
+def format_batch_short(options, results):
+    lines = []
+
+    for (domain, rdtype), (response, _, status) in zip(options.lookups, results):
+        if response is None:
+            lines.append(f";; {domain} {dns.rdatatype.to_text(rdtype)}: {status}")
+        else:
+            lines.extend(item.to_text() for rrset in response.answer for item in rrset)
+
+    return '\n'.join(lines) or "No Answer"
+
+# One row per answer record, lookups without an answer get a single row with their status
+def format_batch_table(options, results):
+    lines = [f"{'NAME':<{NAME_WIDTH}} {'TYPE':<{DATA_WIDTH}} {'STATUS':<{STATUS_WIDTH}} {'MS':<{DATA_WIDTH}} DATA"]
+
+    for (domain, rdtype), (response, elapsed_ms, status) in zip(options.lookups, results):
+        elapsed = '-' if elapsed_ms is None else str(elapsed_ms)
+        rows = [] if response is None else [(rrset.name.to_text(), dns.rdatatype.to_text(rrset.rdtype), i.to_text())
+                                            for rrset in response.answer for i in rrset]
+
+        for name, record_type, data in rows or [(domain, dns.rdatatype.to_text(rdtype), '-')]:
+            lines.append(f"{name:<{NAME_WIDTH}} {record_type:<{DATA_WIDTH}} {status:<{STATUS_WIDTH}} {elapsed:<{DATA_WIDTH}} {data}")
+
+    return '\n'.join(lines)
+
+async def open_dns_socket(server, port):
+    family = AF_INET6 if ip_address(server).version == 6 else AF_INET
+    _, protocol = await get_running_loop().create_datagram_endpoint(DnsSocket, remote_addr=(server, port), family=family)
+
+    return protocol
+
+# Returns the non-empty lines piped into dig, one more than a batch allows so that too many lines are still reported
+def read_stdin_lines(stdin):
+    return list(islice(filter(None, (i.strip() for i in stdin)), MAX_BATCH_QUERIES + 1))
+
 def make_dig_query(qname, rdtype, options, payload=512, use_recursion=None):
     use_recursion = options.use_recursion if use_recursion is None else use_recursion
 
@@ -96,9 +200,10 @@ def make_dig_query(qname, rdtype, options, payload=512, use_recursion=None):
 
     return query
 
-async def trace_lookup(options):
+async def trace_lookup(options, root_servers=ROOT_SERVERS):
     qname = dns.name.from_text(options.domain)
-    current_servers = ROOT_SERVERS[:]
+    zone = dns.name.root
+    current_servers = list(root_servers)
     output_parts = []
     
     if cmd_header := get_cmd_header(options):
@@ -111,7 +216,13 @@ async def trace_lookup(options):
         output_parts.append(f"; Root priming failed: {type(e).__name__}: {e}")
 
     for step in range(TRACE_MAX_STEPS):
-        response, elapsed_ms, server = await try_trace_servers(qname, current_servers, options)
+        # A referral from this zone that is still within its TTL saves the round trip, elapsed_ms is None when cached
+        if cached := get_cached_referral(qname, zone, options):
+            response, server = cached
+            elapsed_ms = None
+        else:
+            response, elapsed_ms, server = await try_trace_servers(qname, current_servers, options)
+
         output_parts.append(format_trace_response(response, server, elapsed_ms, options))
 
         if response.answer or response.rcode() != dns.rcode.NOERROR:
@@ -122,27 +233,36 @@ async def trace_lookup(options):
             
             return "\n\n".join(output_parts)
 
+        # A cached referral's glue is already cached, adding it again would restart its TTL on every reuse
+        if elapsed_ms is not None:
+            cache_glue(response, options)
+
         if not (next_servers := get_glue_addresses(response)):
             if not (next_servers := await resolve_nameserver_addresses(ns_names, options)):
-                    output_parts.append("; Trace stopped: could not resolve next nameserver addresses.")
-                    
-                    return "\n\n".join(output_parts)
+                output_parts.append("; Trace stopped: could not resolve next nameserver addresses.")
+
+                return "\n\n".join(output_parts)
 
+        if elapsed_ms is not None:
+            cache_referral(response, server, zone, options)
+
+        zone = get_referral_zone(response) or zone
         current_servers = next_servers
 
     output_parts.append(f"; Trace stopped after {TRACE_MAX_STEPS} steps.")
     
     return "\n\n".join(output_parts)
 
+# Queries the servers TRACE_RACE_WIDTH at a time, so a step costs the fastest server's round trip rather than
+# the sum of every unresponsive server's timeout
 async def try_trace_servers(qname, servers, options):
     candidates = servers[:]
     shuffle(candidates)
     last_error = None
 
-    for server in candidates:
+    for i in range(0, len(candidates), TRACE_RACE_WIDTH):
         try:
-            response, elapsed_ms = await trace_query(qname, options.rdtype, server, options)
-            return response, elapsed_ms, server
+            return await race_trace_servers(qname, candidates[i:i + TRACE_RACE_WIDTH], options)
         except Exception as e:
             last_error = e
 
@@ -151,6 +271,28 @@ async def try_trace_servers(qname, servers, options):
 
     raise RuntimeError("No trace servers available")
 
+async def race_trace_servers(qname, servers, options):
+    pending = {create_task(trace_query(qname, options.rdtype, server, options)): server for server in servers}
+    last_error = None
+
+    try:
+        while pending:
+            done, _ = await wait(pending, return_when=FIRST_COMPLETED)
+
+            for task in done:
+                server = pending.pop(task)
+
+                if (error := task.exception()) is None:
+                    response, elapsed_ms = task.result()
+                    return response, elapsed_ms, server
+
+                last_error = error
+    finally:
+        for task in pending:
+            task.cancel()
+
+    raise last_error
+
 async def get_root_priming_response(options):
     query = make_dig_query('.', dns.rdatatype.NS, options, payload=1232, use_recursion=True)
 
@@ -164,7 +306,7 @@ async def trace_query(qname, rdtype, server, options):
 async def send_dns_query(query, server, options, timeout=5):
     query_func = tcp if options.use_tcp else udp
 
-    return await to_thread(query_func, query, server, timeout=timeout, port=options.port)
+    return await query_func(query, server, timeout=timeout, port=options.port)
 
 async def send_timed_dns_query(query, server, options, timeout=5):
     start = perf_counter()
@@ -193,27 +335,64 @@ def get_glue_addresses(response):
     addresses = []
 
     for rrset in response.additional:
-        if rrset.rdtype == dns.rdatatype.A:
+        if rrset.rdtype in ADDRESS_RECORD_TYPES:
             addresses.extend(i.address for i in rrset)
 
     return addresses
 
+# Returns the zone a referral delegates to, None if the response has no NS records below the current zone
+def get_referral_zone(response):
+    for rrset in response.authority:
+        if rrset.rdtype == dns.rdatatype.NS:
+            return rrset.name
+
+    return None
+
+# Adds the A/AAAA glue of a referral to the address cache
+def cache_glue(response, options):
+    for rrset in response.additional:
+        if rrset.rdtype in ADDRESS_RECORD_TYPES:
+            DNS_CACHE.add(("address", rrset.name.to_text().lower(), rrset.rdtype, options.port), [i.address for i in rrset], rrset.ttl)
+
+# Referrals are cached by the zone they delegate to and the zone that gave them, so any name below that zone reuses them
+def cache_referral(response, server, zone, options):
+    if (child := get_referral_zone(response)) is None or child == zone or not child.is_subdomain(zone):
+        return
+
+    ttl = min(i.ttl for i in response.authority + response.additional if i.rdtype != dns.rdatatype.OPT)
+    DNS_CACHE.add(("referral", zone, child, options.port, options.use_dnssec), (response, server), ttl)
+
+# Returns the (response, server) of the deepest cached referral from the given zone towards qname, None if there is none
+def get_cached_referral(qname, zone, options):
+    name = qname
+
+    while name != zone and name.is_subdomain(zone):
+        if cached := DNS_CACHE.get(("referral", zone, name, options.port, options.use_dnssec)):
+            return cached
+
+        name = name.parent()
+
+    return None
+
+# Returns the A and AAAA addresses of every given nameserver, from the cache or resolved concurrently
 async def resolve_nameserver_addresses(ns_names, options):
-    addresses = []
-    rdtype = dns.rdatatype.from_text("A")
+    keys = [("address", i.lower(), rdtype, options.port) for i in ns_names for rdtype in ADDRESS_RECORD_TYPES]
+    missing = [i for i in keys if DNS_CACHE.get(i) is None]
 
-    for ns_name in ns_names:
-        try:
-            query = make_dig_query(ns_name, rdtype, options, payload=1232, use_recursion=True)
-            response = await send_dns_query(query, options.nameserver, options)
+    await gather(*[resolve_address(ns_name, rdtype, options) for _, ns_name, rdtype, _ in missing])
 
-            for rrset in response.answer:
-                if rrset.rdtype == dns.rdatatype.A:
-                    addresses.extend(i.address for i in rrset)
-        except Exception as e:
-            print(f"Nameserver resolution failed for {ns_name}: {type(e).__name__}: {e}")
+    return [address for i in keys for address in DNS_CACHE.get(i) or []]
 
-    return addresses
+async def resolve_address(ns_name, rdtype, options):
+    try:
+        query = make_dig_query(ns_name, rdtype, options, payload=1232, use_recursion=True)
+        response = await send_dns_query(query, options.nameserver, options)
+
+        for rrset in response.answer:
+            if rrset.rdtype == rdtype:
+                DNS_CACHE.add(("address", ns_name, rdtype, options.port), [i.address for i in rrset], rrset.ttl)
+    except Exception as e:
+        print(f"Nameserver resolution failed for {ns_name}: {type(e).__name__}: {e}")
 
 def format_trace_response(response, server, elapsed_ms, options, include_additional=False):
     lines = []
@@ -233,7 +412,10 @@ def format_trace_response(response, server, elapsed_ms, options, include_additio
         status = dns.rcode.to_text(response.rcode())
         lines.append(f";; status: {status}")
 
-    lines.append(f";; Received {len(response.to_wire())} bytes from {server}#{options.port}({server}) in {elapsed_ms} ms")
+    if elapsed_ms is None:
+        lines.append(f";; Received {len(response.to_wire())} bytes from {server}#{options.port}({server}) (cached)")
+    else:
+        lines.append(f";; Received {len(response.to_wire())} bytes from {server}#{options.port}({server}) in {elapsed_ms} ms")
 
     return "\n".join(lines)
 
@@ -391,9 +573,89 @@ def format_rrset_section(title, section, show_comments):
     return '\n'.join(lines)
 
 
+# UDP socket shared by the lookups of a batch, responses are matched to their query by id
+# attr transport - datagram transport connected to the nameserver
+# attr  pending - query id -> (query, future waiting for its response)
+class DnsSocket(DatagramProtocol):
+    def __init__(self):
+        self.transport = None
+        self.pending = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        try:
+            response = dns.message.from_wire(data)
+        except DNSException:
+            return
+
+        if (entry := self.pending.get(response.id)) and entry[0].is_response(response) and not entry[1].done():
+            entry[1].set_result(response)
+
+    def error_received(self, exc):
+        for _, future in self.pending.values():
+            if not future.done():
+                future.set_exception(exc)
+
+    async def query(self, query, timeout=5):
+        # Ids only have to be unique among the queries in flight on this socket
+        while query.id in self.pending:
+            query.id = randrange(1 << 16)
+
+        self.pending[query.id] = (query, future := get_running_loop().create_future())
+        self.transport.sendto(query.to_wire())
+
+        try:
+            return await wait_for(future, timeout)
+        except TimeoutError:
+            raise Timeout(timeout=timeout)
+        finally:
+            del self.pending[query.id]
+
+    def close(self):
+        self.transport.close()
+
+
+# Shared cache of the records a trace reuses, entries expire with the TTL of the records they came from
+# attr entries - key -> (expiry on the monotonic clock, value), oldest first
+class DnsCache:
+    def __init__(self):
+        self.entries = {}
+
+    def get(self, key):
+        if (entry := self.entries.get(key)) is None:
+            return None
+
+        if entry[0] <= monotonic():
+            del self.entries[key]
+            return None
+
+        return entry[1]
+
+    def add(self, key, value, ttl):
+        if ttl <= 0:
+            return
+
+        if len(self.entries) >= MAX_CACHE_ENTRIES and key not in self.entries:
+            now = monotonic()
+            self.entries = {k: v for k, v in self.entries.items() if v[0] > now}
+
+            # Nothing expired, drop the oldest entry
+            if len(self.entries) >= MAX_CACHE_ENTRIES:
+                del self.entries[next(iter(self.entries))]
+
+        self.entries.pop(key, None)
+        self.entries[key] = (monotonic() + ttl, value)
+
+
+DNS_CACHE = DnsCache()
+
+
 @dataclass
 class DigOptions:
     user_query: str
+    stdin_lines: list[str] = field(default_factory=list)
     error_status: bool = False
     error_message: str = ''
     
@@ -403,6 +665,8 @@ class DigOptions:
     rdtype: dns.rdatatype.RdataType | None = None
     port: int = DEFAULT_PORT
     reverse_lookup: bool = False
+    lookups: list[tuple[str, dns.rdatatype.RdataType]] = field(default_factory=list)
+    batch_limit: int = DEFAULT_BATCH_LIMIT
     
     short: bool = False
     show_cmd: bool = True
@@ -426,38 +690,67 @@ class DigOptions:
     def parse_query(self):
         flags, args = get_flags(self.user_query, make_dic=True, no_args=['x'], plus_args=True)
 
-        if not args:
+        if args and args[0][0] == '@':
+            self.default_nameserver_used = False
+            self.nameserver = args.pop(0)[1:]
+
+        if not args and not self.stdin_lines:
             self.error_status = True
             self.error_message = "You must include a domain name to lookup. Use `$help dig` for more information."
             return
 
-        arg = args.pop(0)
-        self.default_nameserver_used = not arg[0] == '@'
-
-        if self.default_nameserver_used:
-            self.domain = arg
-        else:   
-            if not args:
-                self.error_status = True
-                self.error_message = "You must include a domain name to lookup. Use `$help dig` for more information."
-                return
-
-            self.nameserver = arg[1:]
-            self.domain = args.pop(0)
-
         self.set_flags(flags)
 
         if self.error_status:
             return
 
-        record_type = args.pop(0).upper() if args else REVERSE_RECORD_TYPE if self.reverse_lookup else DEFAULT_RECORD_TYPE
+        # Each piped line is its own `name [record_type ...]` group, like the names given in the command
+        for arguments in [args, *(i.split() for i in self.stdin_lines)]:
+            if arguments:
+                self.add_lookups(arguments)
+
+            if self.error_status:
+                return
 
-        if record_type not in VALID_RECORD_TYPES:
+        if len(self.lookups) > MAX_BATCH_QUERIES:
             self.error_status = True
-            self.error_message = f"Unsupported record type `{record_type}`.\nSupported types include: `{', '.join(sorted(VALID_RECORD_TYPES))}`."
+            self.error_message = f"Too many lookups, at most {MAX_BATCH_QUERIES} names and record types can be queried at once."
             return
 
-        self.rdtype = dns.rdatatype.from_text(record_type)
+        if self.trace and len(self.lookups) > 1:
+            self.error_status = True
+            self.error_message = "**+trace** can only be used to look up a single name."
+            return
+
+        self.domain, self.rdtype = self.lookups[0]
+
+    # Adds a (name, record type) lookup for every name given, a name followed by several record types is looked up for each
+    # A name is anything with a `.` (or an IPv6 `:` for reverse lookups), except for the first argument which is always a name
+    # param arguments - list of names and record types
+    def add_lookups(self, arguments):
+        names = []
+
+        for index, arg in enumerate(arguments):
+            if index and arg.upper() in VALID_RECORD_TYPES:
+                names[-1][1].append(arg.upper())
+            elif index and '.' not in arg and ':' not in arg:
+                self.error_status = True
+                self.error_message = f"Unsupported record type `{arg.upper()}`.\nSupported types include: `{', '.join(sorted(VALID_RECORD_TYPES))}`."
+                return
+            else:
+                names.append((arg, []))
+
+        for name, record_types in names:
+            if self.reverse_lookup:
+                try:
+                    name = get_reverse_lookup_name(name)
+                except ValueError as e:
+                    self.error_status = True
+                    self.error_message = str(e)
+                    return
+
+            for record_type in record_types or [REVERSE_RECORD_TYPE if self.reverse_lookup else DEFAULT_RECORD_TYPE]:
+                self.lookups.append((name, dns.rdatatype.from_text(record_type)))
 
     def set_flags(self, flags):
         if 'p' in flags:
@@ -470,15 +763,17 @@ class DigOptions:
                 self.error_status = True
                 self.error_message = "Bad argument given for Port. Please use a valid integer in the range [0, 65535]."
        
-        self.reverse_lookup = 'x' in flags
-
-        if self.reverse_lookup:
+        if 'j' in flags:
             try:
-                self.domain = get_reverse_lookup_name(self.domain)
-            except ValueError as e:
+                self.batch_limit = int(flags['j'])
+
+                if not 0 < self.batch_limit <= MAX_BATCH_LIMIT:
+                    raise ValueError
+            except ValueError:
                 self.error_status = True
-                self.error_message = str(e)
-                return
+                self.error_message = f"Bad argument given for the number of parallel lookups. Please use a valid integer in the range [1, {MAX_BATCH_LIMIT}]."
+
+        self.reverse_lookup = 'x' in flags
 
         if "all" in flags:
             self.show_cmd = True
@@ -1,11 +1,11 @@
 from fnmatch import fnmatch
 from operator import eq, gt, lt
-from pathlib import Path
-from re import compile, error, IGNORECASE, search
+from re import error, search
 from shlex import split
 from time import time
 
-from src.global_vars import FILE_ROOT_DIR
+from src.file_store import get_store
+from src.safe_regex import filter_lines
 from src.util_objects import TerminalResult as TR
 
 
@@ -14,27 +14,33 @@ SECONDS_PER_DAY = 86400
 
 
 def find(guild_id, args):
-    directory = Path(FILE_ROOT_DIR) / str(guild_id)
-    files = [i for i in directory.iterdir() if i.is_file() and i.suffix == ".txt"]
+    # Every file is stat'd once up front, predicates only read from this snapshot
+    files = get_store(guild_id).get_snapshot()
 
     if not (arguments := split(args)):
         output = '\n'.join(f"./{i.stem}" for i in files)
         return TR(stdout=output, formatted_output=f"```text\n{output}\n```", exit_code=0)
 
     try:
-        predicate = FindParser(arguments, directory).parse()
+        predicate = FindParser(arguments, files).parse()
     except ValueError as e:
         return TR(stderr=str(e), exit_code=1)
+    except RecursionError:
+        return TR(stderr="Expression is nested too deeply.", exit_code=1)
+
+    output = '\n'.join(f"./{i.stem}" for i in filter(predicate, files))
 
-    output = '\n'.join(f"./{i.stem}" for i in [path for path in files if predicate(path)])
-    
     return TR(stdout=output, formatted_output=f"```text\n{output}\n```", exit_code=0)
 
+# Parses a find expression into a predicate over a FileEntry
+# `-a`/`-o` chains are flattened into one tuple of predicates each, and a single term is returned as is,
+# so a file only goes through one call per level of parentheses or `-not`
 class FindParser:
-    def __init__(self, arguments, directory):
+    def __init__(self, arguments, files):
         self.arguments = arguments
-        self.directory = directory
+        self.files = files
         self.position = 0
+        self.now = time()
 
     def parse(self):
         predicate = self.parse_expression()
@@ -64,7 +70,12 @@ class FindParser:
 
             predicates.append(self.parse_and())
 
-        return lambda path, predicates=predicates: any(x(path) for x in predicates)
+        if len(predicates) == 1:
+            return predicates[0]
+
+        predicates = tuple(predicates)
+
+        return lambda f: any(x(f) for x in predicates)
 
     def parse_and(self):
         predicates = [self.parse_unary()]
@@ -72,7 +83,12 @@ class FindParser:
         while self.peek() not in (None, "-o", ')'):
             predicates.append(self.parse_unary())
 
-        return lambda path, predicates=predicates: all(x(path) for x in predicates)
+        if len(predicates) == 1:
+            return predicates[0]
+
+        predicates = tuple(predicates)
+
+        return lambda f: all(x(f) for x in predicates)
 
     def parse_unary(self):
         if (token := self.peek()) == "-not":
@@ -83,7 +99,7 @@ class FindParser:
 
             predicate = self.parse_unary()
 
-            return lambda path, predicate=predicate: not predicate(path)
+            return lambda f: not predicate(f)
 
         if token == '(':
             self.consume()
@@ -106,9 +122,6 @@ class FindParser:
         def parse_comparison(value, parser=int):
             return (gt, parser(value[1:])) if value.startswith('+') else (lt, parser(value[1:])) if value.startswith('-') else (eq, parser(value))
 
-        def get_age(path, unit):
-            return int((time() - path.stat().st_mtime) / unit)
-
         def get_size(size_arg):
             if not size_arg:
                 raise ValueError
@@ -125,8 +138,8 @@ class FindParser:
         match expression:
             case "-empty":
                 # Visually empty files are 1 byte, the use of 1 in this comparison is deliberate
-                return lambda path: path.stat().st_size <= 1
-            
+                return lambda f: f.size <= 1
+
             case "-iname" | "-name":
                 if self.peek() is None:
                     raise ValueError(f"`{expression}` requires a pattern.")
@@ -134,11 +147,11 @@ class FindParser:
                 pattern = self.consume()
 
                 if expression == "-name":
-                    return lambda path, pattern=pattern: fnmatch(path.stem, pattern)
-                
+                    return lambda f: fnmatch(f.stem, pattern)
+
                 pattern = pattern.lower()
 
-                return lambda path, pattern=pattern: fnmatch(path.stem.lower(), pattern)
+                return lambda f: fnmatch(f.stem.lower(), pattern)
 
             case "-iregex" | "-regex":
                 if self.peek() is None:
@@ -146,12 +159,13 @@ class FindParser:
 
                 pattern = self.consume()
 
+                # Match every file name in one go so a pathological pattern is run (and killed) by the regex worker
                 try:
-                    regex = compile(pattern, IGNORECASE if expression == "-iregex" else 0)
+                    matched = set(filter_lines(pattern, [i.stem for i in self.files], ignore_case=expression == "-iregex", fullmatch=True))
                 except error:
                     raise ValueError(f"Invalid regular expression: `{pattern}`.")
 
-                return lambda path, regex=regex: regex.fullmatch(path.stem) is not None
+                return lambda f: f.stem in matched
 
             case "-mmin" | "-mtime":
                 if self.peek() is None:
@@ -166,21 +180,23 @@ class FindParser:
 
                 unit = SECONDS_PER_DAY if expression == "-mtime" else SECONDS_PER_MINUTE
 
-                return lambda path, comparison=comparison, days=days: comparison(get_age(path, unit), days)
+                now = self.now
+
+                return lambda f: comparison(int((now - f.mtime) / unit), days)
 
             case "-newer":
                 if self.peek() is None:
                    raise ValueError("`-newer` requires a filename")
 
                 filename = self.consume()
-                reference = self.directory / f"{filename}.txt"
+                reference = next((i for i in self.files if i.stem == filename), None)
 
-                if search(r"\W", filename) or not reference.is_file():
+                if search(r"\W", filename) or reference is None:
                    raise ValueError(f"No file named \"{filename}\" found.")
 
-                reference_mtime = reference.stat().st_mtime
+                mtime = reference.mtime
 
-                return lambda path, reference_mtime=reference_mtime: path.stat().st_mtime > reference_mtime
+                return lambda f: f.mtime > mtime
 
             case "-size":
                 if self.peek() is None:
@@ -193,7 +209,7 @@ class FindParser:
                 except ValueError:
                     raise ValueError(f"Invalid size: `{size_arg}`.")
 
-                return lambda path, comparison=comparison, size=size: comparison(path.stat().st_size, size)
+                return lambda f: comparison(f.size, size)
 
             case _:
                 raise ValueError(f"Unknown expression: `{expression}`.")
@@ -0,0 +1,133 @@
+from heapq import merge
+from pathlib import Path
+from sys import getsizeof
+from tempfile import TemporaryFile
+
+from src.global_vars import TEMP_DIR
+from src.utils import get_short_flags, iter_lines_from_file
+from src.util_objects import TerminalResult as TR
+
+
+MAX_RUN_SIZE = 1 << 25      # Bytes of lines held in memory before a sorted run is spilled to TEMP_DIR
+SORT_ARG_FLAGS = ('k', 't')
+
+
+def sort(guild_id, args, stdin=None):
+    try:
+        flags, args = get_short_flags(args, SORT_ARG_FLAGS, shell=True)
+    except ValueError as e:
+        return TR(stderr=f"Bad argument: {e}.", exit_code=1)
+
+    if flags is None:
+        return TR(stderr="`-k` requires a field and `-t` requires a separator.\nUse `$help sort` for more usage information.", exit_code=1)
+
+    if stdin is None and not args:
+        return TR(stderr="You must include a filename with this command.\nUse `$help sort` for more usage information.", exit_code=1)
+
+    if (separator := flags.get('t')) is not None and len(separator) != 1:
+        return TR(stderr=f"Bad separator: `{separator}`. Please use a single character.", exit_code=2)
+
+    try:
+        fields = parse_field_range(flags['k']) if 'k' in flags else None
+    except ValueError:
+        return TR(stderr=f"Bad field: `{flags['k']}`. Use `-k start[,end]` with field numbers starting from 1.", exit_code=3)
+
+    response = iter_lines_from_file(guild_id, None if stdin is not None else args[0], stdin=stdin)
+
+    if not response.succeeded:
+        return response
+
+    key = make_key(fields, separator, numeric='n' in flags, ignore_case='f' in flags)
+    lines = sort_lines(response.lines, key, reverse='r' in flags)
+
+    if 'u' in flags:
+        lines = unique_lines(lines, key)
+
+    return TR(lines=lines, exit_code=0)
+
+# Parses `-k start[,end]` into a slice of (0-indexed) fields
+def parse_field_range(value):
+    start, _, end = value.partition(',')
+
+    if (start := int(start)) < 1 or (end and int(end) < start):
+        raise ValueError
+
+    return slice(start - 1, int(end) if end else None)
+
+# Builds the sort key once, so no flag checks (or repeated stripping) happen per comparison
+def make_key(fields, separator, numeric=False, ignore_case=False):
+    def numeric_key(text):
+        text = text.strip()
+
+        try:
+            return 0, float(text)
+        except ValueError:
+            return 1, text.casefold()
+
+    compare = numeric_key if numeric else str.casefold if ignore_case else None
+
+    if fields is None:
+        return compare
+
+    joiner = separator or ' '
+
+    def field_key(line):
+        text = joiner.join(line.rstrip('\n').split(separator)[fields])
+
+        return text if compare is None else compare(text)
+
+    return field_key
+
+# Sorts lines in memory, switching to an external merge sort when the input is larger than `MAX_RUN_SIZE`
+# Each run is sorted (stable) and spilled to a temporary file, then the runs are merged lazily in input order,
+# which keeps the overall sort stable
+def sort_lines(lines, key, reverse=False):
+    runs = []
+    run = []
+    run_size = 0
+
+    try:
+        for line in lines:
+            if not line.endswith('\n'):
+                line += '\n'
+
+            run.append(line)
+
+            if (run_size := run_size + getsizeof(line)) > MAX_RUN_SIZE:
+                runs.append(spill_run(run, key, reverse))
+                run = []
+                run_size = 0
+
+        run.sort(key=key, reverse=reverse)
+
+        if not runs:
+            yield from run
+            return
+
+        # Iterating the merge holds at most one line per run in memory
+        for spilled in runs:
+            spilled.seek(0)
+
+        yield from merge(*runs, run, key=key, reverse=reverse)
+    finally:
+        for spilled in runs:
+            spilled.close()
+
+def spill_run(run, key, reverse):
+    Path(TEMP_DIR).mkdir(exist_ok=True)
+
+    run.sort(key=key, reverse=reverse)
+    spilled = TemporaryFile('w+', dir=TEMP_DIR, encoding="utf-8")
+    spilled.writelines(run)
+
+    return spilled
+
+# Drops lines whose sort key repeats the previous line's as sorted input streams past, like `sort -u` only the
+# compared part counts, so with -k, -f or -n lines that sort as equal are duplicates
+def unique_lines(lines, key=None):
+    previous = object()
+
+    for line in lines:
+        if (current := line if key is None else key(line)) != previous:
+            yield line
+            previous = current
@@ -1,12 +1,15 @@
-from itertools import groupby
-from os import listdir, remove
+from collections import deque
+from itertools import chain, groupby, islice
+from os import stat
 from os.path import isfile
 from pathlib import Path
-from re import finditer, search
-from shutil import copyfile
+from re import error, finditer, search
 
+from src.file_cache import load_cached
+from src.file_store import get_store, open_mmap
 from src.global_vars import FILE_ROOT_DIR
-from src.utils import get_flags, get_lines_from_file
+from src.safe_regex import filter_lines
+from src.utils import get_flags, get_short_flags, iter_lines_from_file
 from src.util_objects import TerminalResult as TR
 
 
@@ -14,25 +17,25 @@ DEFAULT_LINE_COUNT = 10
 DEFAULT_NUMBER_FORMAT = "rn"
 DEFAULT_NUMBER_WIDTH = 6
 DEFAULT_NUMBER_SEP = ' '
+GREP_ARG_FLAGS = ('m',)
+WC_CHUNK_SIZE = 1 << 20
 
 
 def cat(guild_id, arguments, stdin=None):
     flags, args = get_flags(arguments)
-    response = get_lines_from_file(guild_id, None if stdin else args[0], join=False, stdin=stdin)
+    response = iter_lines_from_file(guild_id, None if stdin else args[0], stdin=stdin)
 
     if not response.succeeded:
         return response
 
     number_blank = 'n' in flags
 
-    output_lines = number_lines(response.stdout, number_nonblank='b' in flags or number_blank, number_blank=number_blank, squeeze_blank='s' in flags)
+    output_lines = number_lines(response.lines, number_nonblank='b' in flags or number_blank, number_blank=number_blank, squeeze_blank='s' in flags)
 
     if 'E' in flags:
-        output_lines = [f"{i[:-1]}$\n" if i.endswith('\n') else f"{i}$" for i in output_lines]
+        output_lines = (f"{i[:-1]}$\n" if i.endswith('\n') else f"{i}$" for i in output_lines)
 
-    output = ''.join(output_lines)
-
-    return TR(stdout=output, formatted_output=f"```text\n{output}\n```", exit_code=0)
+    return TR(lines=output_lines, exit_code=0)
 
 def cp(guild_id, arguments):
     flags, args = get_flags(arguments)
@@ -47,14 +50,13 @@ def cp(guild_id, arguments):
             return TR(stderr=f"Invalid filename: `{filename}`\nPlease only use word characters.", exit_code=2)
     
     guild_dir = Path(FILE_ROOT_DIR) / str(guild_id)
-    source_path = guild_dir / f"{source}.txt"
     destination_path = guild_dir / f"{destination}.txt"
     
     if 'n' in flags and destination_path.is_file():
         return TR(stderr=f"File `{destination}` already exists.", exit_code=3)
 
     try:
-        copyfile(source_path, destination_path)
+        get_store(guild_id).copy(source, destination)
     except FileNotFoundError:
         return TR(stderr=f"No file named \"{source}\" found! Try using `$tee` first.", exit_code=4)
 
@@ -73,14 +75,13 @@ def mv(guild_id, arguments):
             return TR(stderr=f"Invalid filename: `{filename}`\nPlease only use word characters.", exit_code=2)
    
     guild_dir = Path(FILE_ROOT_DIR) / str(guild_id)
-    source_path = guild_dir / f"{source}.txt"
     destination_path = guild_dir / f"{destination}.txt"
 
     if 'f' not in flags and destination_path.exists():
         return TR(stderr=f"File `{destination}` already exists.", exit_code=3)
 
     try:
-        source_path.rename(destination_path)
+        get_store(guild_id).move(source, destination)
     except FileNotFoundError:
         return TR(stderr=f"No file named \"{source}\" found! Try using `$tee` first.", exit_code=4)
 
@@ -92,7 +93,7 @@ def nl(guild_id, arguments, stdin=None):
     if len(args) < 1 and not stdin:
         return TR(stderr="You must include a filename with this command.\nUse `$help nl` for more usage information.", exit_code=1)
 
-    response = get_lines_from_file(guild_id, None if stdin else args[0], join=False, stdin=stdin)
+    response = iter_lines_from_file(guild_id, None if stdin else args[0], stdin=stdin)
 
     if not response.succeeded:
         return response
@@ -148,7 +149,7 @@ def nl(guild_id, arguments, stdin=None):
                   exit_code=5)
 
     output_lines = number_lines(
-                                response.stdout,
+                                response.lines,
                                 number_nonblank=number_nonblank,
                                 number_blank=number_blank,
                                 width=width,
@@ -159,36 +160,53 @@ def nl(guild_id, arguments, stdin=None):
                                 zero_padded=zero_padded
                                )
 
-    output = ''.join(output_lines)
-
-    return TR(stdout=output, formatted_output=f"```text\n{output}\n```", exit_code=0)
+    return TR(lines=output_lines, exit_code=0)
 
 def grep(guild_id, arguments, stdin=None):
-    flags, args = get_flags(arguments)
+    flags, args = get_short_flags(arguments, GREP_ARG_FLAGS)
+
+    if flags is None:
+        return TR(stderr="`-m` requires a number of matches.", exit_code=1)
+
+    try:
+        if (max_count := int(flags['m']) if 'm' in flags else None) is not None and max_count < 0:
+            raise ValueError
+    except ValueError:
+        return TR(stderr="Bad argument for `-m`, please use an integer of at least 0.", exit_code=1)
 
     if len(args) < 2:
-        if stdin and args:
+        if stdin is not None and args:
             filename = None
             pattern = args[0]
         else:
-            return TR(stderr="usage: `$grep [filename] <pattern>`", exit_code=1)
+            return TR(stderr="usage: `$grep [-icv] [-m num] [filename] <pattern>`", exit_code=1)
     else:
         filename = args[0]
         pattern = ' '.join(args[1:])
 
-    response = get_lines_from_file(guild_id, filename, join=False, stdin=stdin)
+    response = iter_lines_from_file(guild_id, filename, stdin=stdin)
     
     if not response.succeeded:
         return response
 
-    lines = response.stdout
+    try:
+        matches = filter_lines(pattern, response.lines, ignore_case='i' in flags, invert='v' in flags)
+    except error:
+        return TR(stderr=f"Invalid regular expression: `{pattern}`.", exit_code=1)
+
+    # Stop reading the file as soon as enough lines have matched
+    if max_count is not None:
+        matches = islice(matches, max_count)
 
-    if matches := [i for i in lines if search(pattern, i)]:
-        output = ''.join(matches)
+    if 'c' in flags:
+        output = sum(1 for _ in matches)
+        return TR(stdout=str(output), formatted_output=f"```text\n{output}\n```", exit_code=0)
 
-        return TR(stdout=output, formatted_output=f"```text\n{output}\n```", exit_code=0)
+    # Only scan as far as the first match to decide whether this is an error
+    if (first := next(matches, None)) is None:
+        return TR(stderr=f"No matches found in `{'stdin' if stdin is not None else filename}`", exit_code=3)
 
-    return TR(stderr=f"No matches found in `{'stdin' if stdin else filename}`", exit_code=3)
+    return TR(lines=chain((first,), matches), exit_code=0)
 
 # Used by $head and $tail
 def get_lines(guild_id, filename, reverse=False, stdin=None):
@@ -205,30 +223,40 @@ def get_lines(guild_id, filename, reverse=False, stdin=None):
     multiple_files = len(files) > 1 
     response = []
 
-    def get_response_line(file, lines, num_lines):
-        return f"{f'\n==> {file} <==\n' if multiple_files else ''}{''.join(lines[-num_lines:] if reverse else lines[:num_lines])}\n"
+    # Only the requested window is kept, head stops reading as soon as it has enough lines
+    def take_lines(lines):
+        if num_lines < 0:
+            lines = list(lines)
+
+            return lines[-num_lines:] if reverse else lines[:num_lines]
+
+        return deque(lines, maxlen=num_lines) if reverse else islice(lines, num_lines)
+
+    def get_response_line(file, text):
+        return f"{f'\n==> {file} <==\n' if multiple_files else ''}{text}\n"
+
+    if stdin is None:
+        # Files are read through their line index, so only the requested lines are touched
+        store = get_store(guild_id)
+        window = slice(-num_lines, None) if reverse else slice(None, num_lines)
 
-    if not stdin:
         for file in files:
             try:
-                with open(f"{FILE_ROOT_DIR}/{guild_id}/{file}.txt", 'r') as in_file:
-                    lines = in_file.readlines()
+                if search(r"\W", file):
+                    raise FileNotFoundError
+
+                response.append(get_response_line(file, store.read_lines(file, window)))
             except FileNotFoundError:
                 response.append(f"Cannot open file `{file}`. Try using `$tee` first!\n")
-
-                continue
-
-            response.append(get_response_line(file, lines, num_lines))
     else:
-        response.append(get_response_line("stdin", [i +'\n' for i in stdin.split('\n')], num_lines))
+        response.append(get_response_line("stdin", ''.join(take_lines(i if i.endswith('\n') else i + '\n' for i in stdin))))
 
     output = ''.join(response).rstrip('\n')
 
     return TR(stdout=output, formatted_output=f"```text\n{output}\n```", exit_code=0)
 
 def ls(guild_id, stdin=None):
-	file_names = sorted(listdir(f"{FILE_ROOT_DIR}/{guild_id}"))
-	files = '\n'.join(i.replace(".txt", '') for i in file_names if i[0] != '.')
+	files = '\n'.join(get_store(guild_id).list_names())
 																																	
 	if not files:
 		return TR(stderr="No files exist in your server's directory. Try using `$tee` first!", exit_code=1)
@@ -242,46 +270,12 @@ def rm(guild_id, filename):
     filename = filename.lower()
 
     try:
-        remove(Path(FILE_ROOT_DIR) / str(guild_id) / f"{filename}.txt")
+        get_store(guild_id).remove(filename)
     except FileNotFoundError:
         return TR(stderr=f"No file named \"{filename}\" found! Try using `$tee` first.", exit_code=2)
 
     return TR(stdout=f"Successfully removed `{filename}`!", exit_code=0)
 
-def sort(guild_id, args, stdin=None):
-    def numeric_sort(line):
-        stripped_line = line.strip()
-
-        try:
-            return 0, float(stripped_line)
-        except ValueError:
-            return 1, stripped_line.casefold()
-
-    flags, args = get_flags(args)
-   
-    ignore_case = 'f' in flags
-    key = numeric_sort if 'n' in flags else str.casefold if ignore_case else None
-    response = get_lines_from_file(guild_id, None if stdin else args[0], join=False, stdin=stdin)
-    
-    if not response.succeeded:
-        return response
-    
-    lines = response.stdout
-    lines.sort(key=key, reverse='r' in flags)
-
-    if 'u' in flags:
-        unique_lines = []
-        previous_key = object()
-
-        for line in lines:
-            if (current_key := line.casefold() if ignore_case else line) != previous_key:
-                unique_lines.append(line)
-                previous_key = current_key
-
-        lines = unique_lines
-    output = ''.join(lines)
-    return TR(stdout=output, formatted_output=f"```text\n{output}\n```", exit_code=0)
-
 def tee(guild_id, arguments, stdin=None):
     flags = []
     filename = None
@@ -306,7 +300,7 @@ def tee(guild_id, arguments, stdin=None):
         return TR(stderr=f"Invalid filename: `{filename}`\nPlease only use word characters.", exit_code=2)
 
     if stdin is not None:
-        data = stdin
+        data = ''.join(stdin)
     elif blank_line:
         data = '\n'
     else:
@@ -316,8 +310,10 @@ def tee(guild_id, arguments, stdin=None):
     num_lines = len(data.split('\n'))
     filename = filename.lower()
 
-    with open(f"{FILE_ROOT_DIR}/{guild_id}/{filename}.txt", 'w' if 'o' in flags else 'a') as out_file:
-        out_file.write(f"{data}\n")
+    if 'o' in flags:
+        get_store(guild_id).overwrite(filename, f"{data}\n")
+    else:
+        get_store(guild_id).append(filename, f"{data}\n")
 
     return TR(stdout=f"Successfully wrote {num_lines} line{'' if num_lines == 1 else 's'} into `{filename}`", exit_code=0) 
 
@@ -333,51 +329,38 @@ def uniq(guild_id, args, stdin=None):
 
         return (not (repeated_only or unique_only)) or (repeated_only and count > 1) or (unique_only and count == 1)
 
-    response = get_lines_from_file(guild_id, None if stdin else args[0], join=False, stdin=stdin)
+    response = iter_lines_from_file(guild_id, None if stdin else args[0], stdin=stdin)
     
     if not response.succeeded:
         return response
-    
-    lines = response.stdout
-    output_lines = []
 
-    for _, group in groupby(lines, key=str.casefold if 'i' in flags else None):
-        first_line = next(group)
-        count = 1 + sum(1 for _ in group)
+    def get_output_lines(lines):
+        for _, group in groupby(lines, key=str.casefold if 'i' in flags else None):
+            first_line = next(group)
+            count = 1 + sum(1 for _ in group)
 
-        if not include_group(count):
-            continue
+            if not include_group(count):
+                continue
 
-        prefix = f"{count:7} " if include_count else ''
-        output_lines.append(f"{prefix}{first_line}")
+            prefix = f"{count:7} " if include_count else ''
+            
+            yield f"{prefix}{first_line}"
 
-    output = ''.join(output_lines)
-
-    return TR(stdout=output, formatted_output=f"```text\n{output}\n```", exit_code=0)
+    return TR(lines=get_output_lines(response.lines), exit_code=0)
 
 
 def wc(guild_id, args, stdin=None):
     flags, files = get_flags(args)
-    mode = "rb" if 'c' in flags else 'r'
-
-    def get_response_string(flags, lines, file):
-        response = ''
 
+    def get_response_string(file, lines=0, words=0, chars=0, size=0):
         if 'c' in flags:
-            response += str(sum(len(line) for line in lines)) + ' '
-        else:
-            if not flags or 'l' in flags:
-                response += str(len(lines)) + ' '
+            return f"{size} {file}\n"
 
-            if not flags or 'w' in flags:
-                response += str(sum(len(line.split()) for line in lines)) + ' '
+        counts = (count for count, flag in ((lines, 'l'), (words, 'w'), (chars, 'm')) if not flags or flag in flags)
 
-            if not flags or 'm' in flags:
-                response += str(sum(len(line) for line in lines)) + ' '
-
-        return response + f"{file}\n"
+        return ''.join(f"{count} " for count in counts) + f"{file}\n"
          
-    if not stdin:
+    if stdin is None:
         response = ''
         
         for file in files:
@@ -385,22 +368,76 @@ def wc(guild_id, args, stdin=None):
 
             if search(r"\W", file):
                 return TR(stdout=f"`{file}`: No such file", exit_code=1)
-                continue
+
+            filepath = f"{FILE_ROOT_DIR}/{guild_id}/{file}.txt"
 
             try:
-                with open(f"{FILE_ROOT_DIR}/{guild_id}/{file}.txt", mode) as in_file:
-                    lines = in_file.readlines()
+                # Byte counts come from the file's metadata and a line count alone from its line index
+                if 'c' in flags:
+                    response += get_response_string(file, size=stat(filepath).st_size)
+                    continue
+
+                # The index only splits on \n, while text mode also ends lines at a bare \r
+                if flags == ['l'] and not load_cached(filepath, has_carriage_return, default=True):
+                    response += get_response_string(file, lines=get_store(guild_id).count_lines(file))
+                    continue
             except FileNotFoundError:
                 return TR(stdout=f"{file}: No such file", exit_code=1)
 
-            response += get_response_string(flags, lines, file)
+            if (counts := load_cached(filepath, count_file)) is None:
+                return TR(stdout=f"{file}: No such file", exit_code=1)
+
+            response += get_response_string(file, *counts)
     else:
-        response = get_response_string(flags, [i + '\n' for i in stdin.split('\n') if i], '')
+        lines = words = chars = 0
+
+        for line in stdin:
+            if line == '\n':
+                continue
+
+            lines += 1
+            words += len(line.split())
+            chars += len(line) + (not line.endswith('\n'))
+
+        response = get_response_string('', lines, words, chars, size=chars)
 
     output = response[:-1]
 
     return TR(stdout=output, formatted_output=f"```text\n{output}\n```", exit_code=0)
 
+# Counts the lines, words and characters of a text file in one buffered pass
+# Returns whether a file contains a \r, so its lines have to be counted in text mode
+def has_carriage_return(path):
+    if not stat(path).st_size:
+        return False
+
+    with open_mmap(path) as data:
+        return data.find(b'\r') != -1
+
+def count_file(path):
+    lines = words = chars = 0
+    in_word = False
+    last_char = ''
+
+    with open(path, 'r') as in_file:
+        while chunk := in_file.read(WC_CHUNK_SIZE):
+            lines += chunk.count('\n')
+            words += len(chunk.split())
+            chars += len(chunk)
+
+            # A word split across two chunks was counted in both
+            if in_word and not chunk[0].isspace():
+                words -= 1
+
+            in_word = not chunk[-1].isspace()
+            last_char = chunk[-1]
+
+    # An unterminated final line still counts as a line
+    if last_char and last_char != '\n':
+        lines += 1
+
+    return lines, words, chars
+
 def number_lines(
         lines,
         number_nonblank=True,
@@ -413,7 +450,6 @@ def number_lines(
         right_justified=True,
         zero_padded=False
 ):
-    output = []
     count = start
     previous_blank = False
 
@@ -424,12 +460,10 @@ def number_lines(
             continue
 
         if (number_nonblank and not is_blank) or (number_blank and is_blank):
-            output.append(f"{count:{0 if zero_padded else ''}{'>' if right_justified else '<'}{width}}{separator}{line}")
+            yield f"{count:{0 if zero_padded else ''}{'>' if right_justified else '<'}{width}}{separator}{line}"
             count += increment
         else:
-            output.append(line)
+            yield line
 
         previous_blank = is_blank
 
-    return output
-
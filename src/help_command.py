@@ -1,96 +1,163 @@
+from collections import Counter
+
 from discord import Interaction
 from discord.app_commands import command, describe
 from discord.ext.commands import Cog, Command, HelpCommand
+from discord.utils import escape_mentions
 
 from src.utils import package_message
 
 
-class CustomHelpCommand(HelpCommand):
-    def __init__(self):
-        super().__init__()
+# Dice coefficient of shared trigrams a name needs to be suggested for a lookup that missed
+SUGGESTION_THRESHOLD = 0.4
+MAX_SUGGESTIONS = 3
 
-    # Called when a user gives the $help command
-    # param mapping - a mapping of cogs to commands
-    async def send_bot_help(self, mapping):
-        cog_list = {}
 
-        for cog, commands in mapping.items():
-            # Skip cogs that don't contain commands
-            if not commands:
+# Returns the set of trigrams in a word, padded so that short words and matching starts still share trigrams
+def get_trigrams(word):
+    padded = f"  {word} "
+
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def get_command_list(commands):
+    ret_list = []
+
+    for cmd in commands:
+        if isinstance(cmd, Command):
+            if cmd.hidden:
                 continue
-            
-            cog_list[cog.qualified_name if cog else "Miscellaneous"] = commands
 
-        for cmd in self.context.bot.tree.get_commands():
-            if not hasattr(cmd, "binding"):
+            ret_list.append({"name": cmd.name, "brief": cmd.brief, "prefix": "$"})
+        else:
+            if cmd.extras.get("hidden"):
                 continue
 
+            ret_list.append({"name": cmd.name, "brief": cmd.extras.get("brief", ""), "prefix": "/"})
+
+    return "* " + "\n* ".join([f"`{i['prefix']}{i['name']}` - {i['brief']}" for i in sorted(ret_list, key=lambda x: x["name"])])
+
+
+# Help text rendered once from the bot's registered commands, commands only change when cogs are added
+# so nothing is walked or sorted when help is asked for
+# attr       bot_help - the full command listing, None until built
+# attr         topics - cog name, command name or alias -> its help text (None for hidden commands)
+# attr       trigrams - trigram -> names of visible topics containing it, for suggestions when a lookup misses
+# attr trigram_counts - name -> number of trigrams in it
+class HelpIndex:
+    def __init__(self):
+        self.bot_help = None
+        self.topics = {}
+        self.trigrams = {}
+        self.trigram_counts = {}
+
+    # Renders every help message, called once the cogs are added
+    # param bot - commands.Bot object containing our client
+    def build(self, bot):
+        slash_commands = [i for i in bot.tree.get_commands() if hasattr(i, "binding")]
+        cog_list = {}
+        topics = {}
+
+        for cog in bot.cogs.values():
+            if commands := cog.get_commands():
+                cog_list[cog.qualified_name] = list(commands)
+
+        if misc := [i for i in bot.commands if i.cog is None]:
+            cog_list["Miscellaneous"] = misc
+
+        for cmd in slash_commands:
             if (cog_name := cmd.binding.__class__.__name__ if cmd.binding else "Miscellaneous") == "SlashHelp":
-                continue       
+                continue
 
             cog_list.setdefault(cog_name, [])
-            
+
             if not any(i.name == cmd.name for i in cog_list[cog_name]):
                 cog_list[cog_name].append(cmd)
 
-        command_list = [f"# {key}\n{self.get_command_list(val)}" for key, val in cog_list.items()]
-        await package_message('\n'.join(command_list), self.get_destination(), multi_send=True)
+        self.bot_help = '\n'.join([f"# {key}\n{get_command_list(val)}" for key, val in cog_list.items()])
 
-    # Called when user gives the $help {cog_name} command
-    # param cog - the cog that was requested for help
-    async def send_cog_help(self, cog, return_text=False):
-        command_list = cog.get_commands()
+        # Prefix commands are found before slash commands, then cogs, matching names case-insensitively like the bot does
+        for cmd in bot.commands:
+            text = None if cmd.hidden else f"# {cmd.name}\n{cmd.help}"
 
-        for cmd in self.context.bot.tree.get_commands():
-            if not hasattr(cmd, "binding"):
-                continue
+            for name in (cmd.name, *cmd.aliases):
+                topics[name.lower()] = text
 
-            if cmd.binding and cmd.binding.__class__.__name__ == cog.qualified_name and not any(i.name == cmd.name for i in command_list):
-                command_list.append(cmd)
-        
-        response = f"# {cog.qualified_name}\n{self.get_command_list(command_list)}"
+        for cmd in slash_commands:
+            topics.setdefault(cmd.name.lower(), f"# {cmd.name}\n{cmd.extras.get('help')}")
 
-        if return_text:
-            return response
+        for cog in bot.cogs.values():
+            commands = cog_list.get(cog.qualified_name, [])
+            text = f"# {cog.qualified_name}\n{get_command_list(commands)}"
 
-        await self.get_destination().send(response)
+            # An exact cog name wins over a command of the same name ($help Hat vs $help hat)
+            topics[cog.qualified_name] = text
+            topics.setdefault(cog.qualified_name.lower(), text)
 
-    # Called when user gives the $help {command_name} command
-    # param command - the command that was requested for help
-    async def send_command_help(self, cmd):
-        if cmd.hidden:
-            return
-        await package_message(f"# {cmd.name}\n{cmd.help}", self.get_destination(), multi_send=True)
+        self.topics = topics
+        self.trigrams = {}
+        self.trigram_counts = {}
 
-    async def command_not_found(self, name):
-        for cmd in self.context.bot.tree.get_commands():
-            if cmd.name != name:
+        for name, text in topics.items():
+            if text is None or name != name.lower():
                 continue
 
-            return f"# {name}\n{cmd.extras['help']}"
+            self.trigram_counts[name] = len(trigrams := get_trigrams(name))
+
+            for trigram in trigrams:
+                self.trigrams.setdefault(trigram, []).append(name)
+
+    def ensure_built(self, bot):
+        if self.bot_help is None:
+            self.build(bot)
+
+    # Returns up to MAX_SUGGESTIONS names similar to the given one, most similar first
+    # Names leading to the same help text (a command and its aliases) are only suggested once
+    def suggest(self, name):
+        trigrams = get_trigrams(name.lower())
+        shared = Counter(i for trigram in trigrams for i in self.trigrams.get(trigram, ()))
+        scored = [(2 * count / (len(trigrams) + self.trigram_counts[i]), i) for i, count in shared.items()]
+        suggestions = []
+        seen = set()
+
+        for score, i in sorted(scored, key=lambda x: (-x[0], x[1])):
+            if score < SUGGESTION_THRESHOLD or len(suggestions) == MAX_SUGGESTIONS:
+                break
+
+            if (text := self.topics[i]) not in seen:
+                seen.add(text)
+                suggestions.append(i)
+
+        return suggestions
+
+    # Returns the help text for a cog or command, None for hidden commands, and a not found message otherwise
+    # param name - cog name, command name, or alias
+    def get_help(self, name):
+        if (text := self.topics.get(name, self.topics.get(name.lower(), ""))) != "":
+            return text
+
+        response = f"No command or category \"{escape_mentions(name)}\" found."
 
-        for cog in self.context.bot.cogs.values():
-            if cog.qualified_name.lower() == name:
-                return await self.send_cog_help(cog, return_text=True)
+        if suggestions := self.suggest(name):
+            response += f" Did you mean {', '.join(f'`{i}`' for i in suggestions)}?"
 
-        return f"No command called \"{name}\" found."
+        return response
 
-    def get_command_list(self, commands):
-        ret_list = []
 
-        for cmd in commands:
-            if isinstance(cmd, Command):
-                if cmd.hidden:
-                    continue
-                
-                ret_list.append({"name": cmd.name, "brief": cmd.brief, "prefix": "$"})
-            else:
-                if cmd.extras.get("hidden"):
-                    continue
+class CustomHelpCommand(HelpCommand):
+    # attr index - HelpIndex holding the rendered help
+    # HelpCommand is copied for every invocation, only the bot's own instance (bot.help_command) keeps its index
+    def __init__(self):
+        super().__init__()
+        self.index = HelpIndex()
 
-                ret_list.append({"name": cmd.name, "brief": cmd.extras.get("brief", ""), "prefix": "/"})
-        
-        return "* " + "\n* ".join([f"`{i['prefix']}{i['name']}` - {i['brief']}" for i in sorted(ret_list, key=lambda x: x["name"])])
+    # Called when a user gives the $help command, with an optional command or cog name
+    # param command - the command or cog that was requested for help
+    async def command_callback(self, ctx, /, *, command=None):
+        await self.prepare_help_command(ctx, command)
+        (index := ctx.bot.help_command.index).ensure_built(ctx.bot)
+
+        if (text := index.bot_help if command is None else index.get_help(command)) is not None:
+            await package_message(text, self.get_destination(), multi_send=True)
 
 
 class SlashHelp(Cog):
@@ -100,50 +167,21 @@ class SlashHelp(Cog):
     @command(name="help", description="Gives a brief explanation of my commands")
     @describe(target="Optional command or category name")
     async def help_slash(self, interaction: Interaction, target: str=None):
-        class FakeCtx:
-            def __init__(self, interaction: Interaction, bot):
-                self.interaction = interaction
-                self.bot = bot
-                self.guild = interaction.guild
-                self.channel = interaction.channel
-                self.author = interaction.user
-
-        def slash_destination():
-            class SlashDest:
-                async def send(_, *args, **kwargs):
-                    if interaction.response.is_done():
-                        return await interaction.followup.send(*args, **kwargs)
-
-                    return await interaction.response.send_message(*args, **kwargs)
-                
-            return SlashDest()
-
-        help_cmd = self.bot.help_command
-        original_ctx = help_cmd.context
-        original_dest = help_cmd.get_destination
-        help_cmd.context = FakeCtx(interaction, self.bot)
-        help_cmd.get_destination = slash_destination
-
-        try:
-            if not target:
-                mapping = {i: [] for i in self.bot.cogs.values()}
-
-                for cmd in self.bot.commands:
-                    if cmd.cog:
-                        mapping[cmd.cog].append(cmd)
-                    else:
-                        mapping.setdefault(None, []).append(cmd)
-
-                return await help_cmd.send_bot_help(mapping)
-
-            if (cmd := self.bot.get_command(target)):
-                return await help_cmd.send_command_help(cmd)
-
-            if (cog := self.bot.cogs.get(target.capitalize()if target[0].islower() else target)):
-                return await help_cmd.send_cog_help(cog)
-
-            await help_cmd.send_error_message(f"No command or category \"{target}\" found.")
-
-        finally:
-            help_cmd.context = original_ctx
-            help_cmd.get_destination = original_dest
+        class SlashDest:
+            async def send(_, *args, **kwargs):
+                if interaction.response.is_done():
+                    return await interaction.followup.send(*args, **kwargs)
+
+                return await interaction.response.send_message(*args, **kwargs)
+
+        index = self.bot.help_command.index
+        index.ensure_built(self.bot)
+
+        if not target:
+            return await package_message(index.bot_help, SlashDest(), multi_send=True)
+
+        # Hidden commands stay hidden, but an interaction always needs a response
+        if (text := index.get_help(target)) is None:
+            text = f"No command or category \"{escape_mentions(target)}\" found."
+
+        await package_message(text, SlashDest(), multi_send=True)
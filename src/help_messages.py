@@ -24,8 +24,11 @@ Example: `$calc 6 * 7`
 This function supports, addition `+`, subtraction `-`, multiplication `*`, division `/`, modulation `%`, exponentiation `^`, factorials `!`, and parenthesis `()`.
 Additionally the constants `{constants}`, and the following functions are supported: `{functions}.`
 Example: `$calc sin(pi/2)`
+To list the value of an expression over a range, end it with `for x in start..stop`, optionally followed by `step n` (the default step is 1).
+Example: `$calc x^2 for x in 0..10`
 
-**Note**: All trig functions take input in radians and output their result in radians. To input degrees into trig functions, use the `deg` function: `$calc sin(deg(90))`. Similarly, you can use the `deg` function to interpet the output of a trig function as degrees: `$calc deg(asin(1))`'''
+**Note**: All trig functions take input in radians and output their result in radians. To input degrees into trig functions, use the `deg` function: `$calc sin(deg(90))`. Similarly, you can use the `deg` function to interpet the output of a trig function as degrees: `$calc deg(asin(1))`
+**Note**: Factorials and powers of integers are limited to results of 10,000 digits, and calculations that take longer than 2 seconds are stopped.'''
 
 CARD_FULL = \
 '''Returns Scryfall data for a given MtG card.
@@ -137,8 +140,13 @@ You can specify which nameserver to use by denoting it as an argument with a lea
 Example: `$dig @8.8.8.8 verticalbar.org`
 By default this command queries for `A` records. To query for different record types include the record type as an argument.
 Example: `$dig verticalbar.org MX`
+Several names can be looked up at once, each followed by any number of record types. The answers are shown as a table, or as just the records with **+short**. Names can also be piped in, one per line.
+Example: `$dig verticalbar.org MX gnu.org A AAAA`
+Example: `$cat domains | dig +short`
 
 This command has the following flags:
+* **-j**: Sets how many lookups of a batch are in flight at once, 16 by default.
+\tExample: `$dig -j 4 a.verticalbar.org b.verticalbar.org c.verticalbar.org`
 * **-p**: Allows you to specify a port to query through.
 \tExample: `$dig -p 5353 verticalbar.org`
 * **-x**: Performs a reverse domain lookup.
@@ -232,6 +240,17 @@ This command has the following flags:
 GREP_FULL = \
 '''Return lines from a file in your server's directory that match a given pattern string.
 Example: `grep parody_bands Von`
+Patterns are Python regular expressions. Patterns that take too long to match are stopped.
+
+This command has the following flags:
+* **-c**: Return the number of matching lines instead of the lines themselves
+\tExample: `$grep -c parody_bands Von`
+* **-i**: Ignore case when matching
+\tExample: `$grep -i parody_bands von`
+* **-m __num__**: Stop after __num__ matching lines
+\tExample: `$grep -m 3 parody_bands Von`
+* **-v**: Return the lines that do not match
+\tExample: `$grep -v parody_bands Von`
 
 This command features pipeline support.'''
 
@@ -442,12 +461,19 @@ Example: `$sort dracula`
 This command has the following flags:
 * **-f**: Ignore uppercase and lowercase differences.
 \tExample: `$sort -f dracula`
+* **-k __start[,end]__**: Sort by fields __start__ through __end__ (or the end of the line) instead of the whole line
+\tExample: `$sort -k 2,2 dracula`
 * **-n**: Compare lines numerically
 \tExample: `$sort -n dracula`
 * **-r**: Reverse the sorting order
 \tExample: `$sort -r dracula`
-* **-u**: Remove duplicate lines
-\tExample: `$sort -u dracula`
+* **-t __char__**: Use __char__ to separate fields instead of whitespace
+\tExample: `$sort -t , -k 3 dracula`
+* **-u**: Remove duplicate lines, only comparing the part of each line being sorted on (so `-k`, `-f` and `-n` apply)
+\tExample: `$sort -u -k 2 dracula`
+
+Flags can be combined, and values can be attached to their flag.
+Example: `$sort -nk2 -t, dracula`
 
 This command features pipeline support.'''
 
@@ -553,13 +579,19 @@ This command has the following flags:
 \tExample: `$wiki -r`'''
 
 WORDLE_FULL = \
-'''Starts a new game of Wordle in the chat.
+'''Starts a new game of Wordle in the chat. Ongoing games are kept when the bot restarts.
 
 This command has the following flags:
 * **-n**: Quits an ongoing game and starts a new game of Wordle.
 \tExample: `$wordle -n`
+* **-d**: Starts a game with the daily word, which is the same in every chat for the whole day.
+\tExample: `$wordle -d`
+* **-h**: Suggests the guess that reveals the most about the word, based on the guesses made so far.
+\tExample: `$wordle -h`
 * **-q**: Quits an ongoing game of Wordle.
-\tExample: `$wordle -q`'''
+\tExample: `$wordle -q`
+* **-s**: Shows your Wordle stats. Games count towards the stats of the player making the final guess.
+\tExample: `$wordle -s`'''
 
 XKCD_FULL = \
 '''Returns the XKCD comic for a given comic number.
@@ -0,0 +1,190 @@
+from asyncio import CancelledError, get_running_loop
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from heapq import heappop, heappush
+from itertools import count
+from time import monotonic
+
+
+# Lower values are admitted first
+PRIORITY_PROMPT = 0         # Explicit $prompt commands and messages that mention the bot
+PRIORITY_UNPROMPTED = 1     # Random unprompted replies from `send_reply`
+PRIORITY_BOT = 2            # Replies to other bots
+
+DEFAULT_MAX_IN_FLIGHT = 4       # Maximum concurrent OpenAI requests across every guild
+DEFAULT_BUCKET_CAPACITY = 6     # Burst size allowed per bucket (a guild, or a DM channel)
+DEFAULT_REFILL_RATE = 0.1       # Tokens regained per second per bucket (6 per minute)
+DEFAULT_STALE_AFTER = 20        # Seconds after which queued optional work is no longer worth sending
+
+
+class TokenBucket:
+    __slots__ = ("capacity", "rate", "tokens", "updated")
+
+    def __init__(self, capacity, rate):
+        self.capacity = capacity
+        self.rate = rate
+        self.tokens = capacity
+        self.updated = monotonic()
+
+    def refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, now):
+        self.refill(now)
+
+        if self.tokens < 1:
+            return False
+
+        self.tokens -= 1
+
+        return True
+
+    def time_until_token(self, now):
+        self.refill(now)
+
+        return max(0, (1 - self.tokens) / self.rate)
+
+
+@dataclass(order=True, slots=True)
+class QueuedRequest:
+    priority: int
+    sequence: int
+    bucket_key: int = field(compare=False)
+    enqueued: float = field(compare=False)
+    future: object = field(compare=False)
+
+    @property
+    def optional(self):
+        return self.priority != PRIORITY_PROMPT
+
+
+# Admits LLM requests in priority order while enforcing a global concurrency limit and per-bucket rate limits
+# A bucket is a guild, or the channel of a DM so that DM users do not share one limit
+# Explicit prompts wait for capacity, while optional work (unprompted and bot replies) is dropped when its
+# bucket is out of tokens or it has been queued for longer than `stale_after` seconds
+class LLMScheduler:
+    def __init__(self,
+                 max_in_flight=DEFAULT_MAX_IN_FLIGHT,
+                 bucket_capacity=DEFAULT_BUCKET_CAPACITY,
+                 refill_rate=DEFAULT_REFILL_RATE,
+                 stale_after=DEFAULT_STALE_AFTER):
+        self.max_in_flight = max_in_flight
+        self.bucket_capacity = bucket_capacity
+        self.refill_rate = refill_rate
+        self.stale_after = stale_after
+
+        self.queue = []
+        self.buckets = {}
+        self.in_flight = 0
+        self.sequence = count()
+        self.wakeup = None
+
+        self.admitted = 0
+        self.dropped = 0
+        self.max_depth = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    # Usage: `async with scheduler.slot(bucket_key, priority) as admitted:`
+    # `admitted` is False if the request was dropped and should not be sent
+    @asynccontextmanager
+    async def slot(self, bucket_key, priority):
+        admitted = await self.acquire(bucket_key, priority)
+
+        try:
+            yield admitted
+        finally:
+            if admitted:
+                self.release()
+
+    async def acquire(self, bucket_key, priority):
+        request = QueuedRequest(priority, next(self.sequence), bucket_key, monotonic(), get_running_loop().create_future())
+
+        heappush(self.queue, request)
+        self.max_depth = max(self.max_depth, len(self.queue))
+        self.dispatch()
+
+        try:
+            return await request.future
+        except CancelledError:
+            # The slot may have been granted in the same loop iteration the caller was cancelled
+            if request.future.done() and not request.future.cancelled() and request.future.result():
+                self.release()
+
+            raise
+
+    def release(self):
+        self.in_flight -= 1
+        self.dispatch()
+
+    def get_bucket(self, bucket_key):
+        if (bucket := self.buckets.get(bucket_key)) is None:
+            bucket = self.buckets[bucket_key] = TokenBucket(self.bucket_capacity, self.refill_rate)
+
+        return bucket
+
+    def drop(self, request):
+        self.dropped += 1
+        request.future.set_result(False)
+
+    def dispatch(self):
+        now = monotonic()
+        deferred = []
+        next_wakeup = None
+
+        while self.queue and self.in_flight < self.max_in_flight:
+            request = heappop(self.queue)
+
+            # Caller was cancelled while waiting
+            if request.future.done():
+                continue
+
+            if request.optional and now - request.enqueued > self.stale_after:
+                self.drop(request)
+                continue
+
+            if not (bucket := self.get_bucket(request.bucket_key)).try_take(now):
+                if request.optional:
+                    self.drop(request)
+                else:
+                    deferred.append(request)
+                    wait = bucket.time_until_token(now)
+                    next_wakeup = wait if next_wakeup is None else min(next_wakeup, wait)
+
+                continue
+
+            wait = now - request.enqueued
+            self.in_flight += 1
+            self.admitted += 1
+            self.total_wait += wait
+            self.max_wait = max(self.max_wait, wait)
+            request.future.set_result(True)
+
+        for request in deferred:
+            heappush(self.queue, request)
+
+        if next_wakeup is not None:
+            if self.wakeup is not None:
+                self.wakeup.cancel()
+
+            self.wakeup = get_running_loop().call_later(next_wakeup, self.dispatch)
+
+    def metrics(self):
+        return {"queue_depth": len(self.queue),
+                "max_queue_depth": self.max_depth,
+                "in_flight": self.in_flight,
+                "admitted": self.admitted,
+                "dropped": self.dropped,
+                "average_wait_ms": round(self.total_wait / self.admitted * 1000) if self.admitted else 0,
+                "max_wait_ms": round(self.max_wait * 1000)}
+
+# Guild and channel ids are both Discord snowflakes, so they never collide as keys
+def get_bucket_key(ctx):
+    return ctx.channel.id if ctx.guild is None else ctx.guild.id
+
+def get_priority(author_is_bot, prompted):
+    if author_is_bot:
+        return PRIORITY_BOT
+
+    return PRIORITY_UNPROMPTED if prompted is False else PRIORITY_PROMPT
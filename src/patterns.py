@@ -0,0 +1,93 @@
+# Precompiled regular expressions used while handling ordinary (non-command) messages
+# Each helper runs a cheap substring check first so the regex only runs when it could match
+
+from re import compile, DOTALL, escape, IGNORECASE
+
+from src.global_vars import SEND_LINE_CHAR
+
+
+# Message contains the bot's name (Karn) but not as a voted item (Karn++ or Karn--)
+# https://regex101.com/r/qA25Ux/1
+BOT_NAME = compile(r"[Kk]arn(?:\Z|[^+\-])")
+
+# A single word that is a user/role tag or a mass mention
+# https://regex101.com/r/acF54R/3
+TAG_WORD = compile(r"^<@&*\d+>$|@everyone|@here")
+
+# Message that starts with a voted item (i.e. "python++")
+# https://regex101.com/r/9eJZfe/2
+VOTED_ITEM = compile(r"\A(?:\([\w\s']+\)|[\w']+)(?:--|\+\+)")
+
+# Every voted item in a message
+# https://regex101.com/r/s8gfoV/5
+VOTES = compile(r"\([\w\s']+\)(?:\+\+|--)|[\w]+(?:\+\+|--)")
+
+# https://regex101.com/r/vFpIxB/1
+URL = compile(r"(?i)\b((?:https?://|www\d{0,3}[.]|[a-z0-9.\-]+[.][a-z]{2,4}/)(?:[^\s()<>]+|\(([^\s()<>]+|"
+              r"(\([^\s()<>]+\)))*\))+(?:\(([^\s()<>]+|(\([^\s()<>]+\)))*\)|[^\s`!()\[\]{};:'\".,<>?«»“”‘’]))")
+
+# Unprompted replies that are not helpful
+# https://regex101.com/r/8MiYow/1
+UNHELPFUL_REPLY = compile(r"If you need any assistance or|[Ff]eel free to|If you have any|[Ll]et me know|I'm sorry, but I")
+
+# Instances of the bot saying "...as an AI..."
+# https://regex101.com/r/oWjuWt/2
+AI_DESCRIPTOR = compile("([aA]s|I am)* an* (?:digital)*(?:virtual)*(?:responsible)*(?:time-traveling)* *(?:golem)* "
+                        "*(?:AI|digital|artificial intelligence|language model)"
+                        "(?: language)*(?: text-based)*(?: model)*(?: assistant)*")
+
+# Replies that echo the input formatting
+# https://regex101.com/r/Cuv7zX/1
+INPUT_FORMAT = compile(r"time: .+message: ", flags=DOTALL)
+
+PROMPT_PREFIX = compile(r"\A\$prompt ")
+SEND_LINE = compile(fr"{SEND_LINE_CHAR}\w+")
+
+# Character that can cause blank responses from OpenAI
+BLANK_CAUSING_CHAR = '‐'
+
+
+def mentions_bot(content):
+    return "arn" in content and BOT_NAME.search(content) is not None
+
+def is_tag_only(content):
+    return '@' in content and all(TAG_WORD.search(word) for word in content.split())
+
+def starts_with_vote(content):
+    return ("++" in content or "--" in content) and VOTED_ITEM.match(content) is not None
+
+def find_votes(content):
+    if "++" not in content and "--" not in content:
+        return []
+
+    return VOTES.findall(content)
+
+def has_url(content):
+    return ('.' in content or '/' in content) and URL.search(content) is not None
+
+def is_unhelpful_reply(reply):
+    return UNHELPFUL_REPLY.search(reply) is not None
+
+def replace_ai_descriptor(reply, descriptor):
+    if " a" not in reply:
+        return reply
+
+    return AI_DESCRIPTOR.sub(r"\1 " + descriptor, reply)
+
+def strip_input_format(reply):
+    if "message: " not in reply:
+        return reply
+
+    return INPUT_FORMAT.sub('', reply)
+
+def clean_context_text(content):
+    return PROMPT_PREFIX.sub('', content).replace(BLANK_CAUSING_CHAR, '')
+
+# Compiles a set of phrases into a single regex that matches any of them as whole words
+# https://regex101.com/r/isXc6g/1
+def compile_phrase_matcher(phrases):
+    if not (phrases := sorted({i for i in phrases if i}, key=len, reverse=True)):
+        # Matches nothing
+        return compile(r"(?!)")
+
+    return compile(fr"(?:\A| )(?:{'|'.join(escape(i) for i in phrases)})(?:\Z| )", flags=IGNORECASE)
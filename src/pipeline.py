@@ -3,9 +3,11 @@ import shlex
 from src.functions.diff import diff
 from src.functions.dig import dig
 from src.functions.find import find
+from src.functions.sort import sort
 from src.functions.terminal import *
 from src.response_strings import NO_DM_SUPPORT
 from src.util_objects import TerminalResult as TR
+from src.workers import CancelToken, CURRENT_TOKEN, DEFAULT_TIMEOUT, run_in_worker, WorkCancelled
 
 async def run_pipeline(ctx, pipeline):
     try:
@@ -16,7 +18,20 @@ async def run_pipeline(ctx, pipeline):
     if not segments:
         return TR(stderr="No command provided.", exit_code=2)
 
-    stdin = ''
+    # Every stage shares one deadline since the work of a stage happens lazily while later stages read from it
+    reset = CURRENT_TOKEN.set(CancelToken(DEFAULT_TIMEOUT))
+
+    try:
+        return await run_stages(ctx, segments)
+    except (TimeoutError, WorkCancelled):
+        return TR(stderr=f"Pipeline timed out after {DEFAULT_TIMEOUT} seconds.", exit_code=124)
+    finally:
+        CURRENT_TOKEN.reset(reset)
+
+async def run_stages(ctx, segments):
+    # Stages are chained as line iterators, nothing is read until the final stage is collected,
+    # which lets stages like `head` and `grep` stop reading their input early
+    result = None
 
     guild_id = None if ctx.guild is None else ctx.guild.id
 
@@ -26,14 +41,16 @@ async def run_pipeline(ctx, pipeline):
         if not command_name:
             continue
 
+        stdin = None if result is None else result.iter_lines()
         result = await process_command(guild_id, command_name, raw_arguments, stdin)
 
         if not result.succeeded:
             return result
 
-        stdin = result.stdout
+    if result is None:
+        return TR(stderr="No command provided.", exit_code=2)
 
-    return TR(stdout=stdin, formatted_output=result.formatted_output, exit_code=0)
+    return await run_in_worker(result.collect)
 
 def split_pipeline(command):
     segments = []
@@ -103,13 +120,13 @@ async def process_command(guild_id, command_name, raw_arguments, stdin):
             if guild_id is None and not stdin:
                 return TR(stderr=NO_DM_SUPPORT, exit_code=1)
 
-            return cat(guild_id, raw_arguments, stdin=stdin)
+            return await run_in_worker(cat, guild_id, raw_arguments, stdin=stdin)
 
         case "diff":
             if guild_id is None and not stdin:
                 return TR(stderr=NO_DM_SUPPORT, exit_code=1)
 
-            return diff(guild_id, raw_arguments, stdin=stdin)
+            return await run_in_worker(diff, guild_id, raw_arguments, stdin=stdin)
 
         case "dig":
             try:
@@ -117,10 +134,10 @@ async def process_command(guild_id, command_name, raw_arguments, stdin):
             except ValueError as e:
                 return TR(stderr=f"shell: {e}", exit_code=1)
             
-            if not arguments:
-                return TR(stderr="usage: `dig [@DNS] [flags] [options] <domain> [record_type]`", exit_code=1)
+            if not arguments and stdin is None:
+                return TR(stderr="usage: `dig [@DNS] [flags] [options] <domain> [record_type] [domain [record_type]...]`", exit_code=1)
 
-            return await dig(' '.join(arguments))
+            return await dig(' '.join(arguments), stdin=stdin)
 
         case "echo":
             return TR(stdout=raw_arguments, exit_code=0)
@@ -129,7 +146,7 @@ async def process_command(guild_id, command_name, raw_arguments, stdin):
             if guild_id is None:
                 return TR(stderr=NO_DM_SUPPORT, exit_code=1)
 
-            return find(guild_id, raw_arguments)
+            return await run_in_worker(find, guild_id, raw_arguments)
 
         case "grep":
             if guild_id is None and not stdin:
@@ -138,55 +155,55 @@ async def process_command(guild_id, command_name, raw_arguments, stdin):
             if not raw_arguments:
                 return TR(stderr="usage: `grep [filename] <pattern>`", exit_code=1)
 
-            return grep(guild_id, raw_arguments, stdin=stdin)
+            return await run_in_worker(grep, guild_id, raw_arguments, stdin=stdin)
 
         case "ls":
             if guild_id is None:
                 return TR(stderr=NO_DM_SUPPORT, exit_code=1)
 
-            return ls(guild_id, stdin=stdin)
+            return await run_in_worker(ls, guild_id, stdin=stdin)
 
         case "head":
             if guild_id is None and not stdin:
                 return TR(stderr=NO_DM_SUPPORT, exit_code=1)
 
-            return get_lines(guild_id, raw_arguments, reverse=False, stdin=stdin)
+            return await run_in_worker(get_lines, guild_id, raw_arguments, reverse=False, stdin=stdin)
 
         case "nl":
             if guild_id is None and not stdin:
                 return TR(stderr=NO_DM_SUPPORT, exit_code=1)
 
-            return nl(guild_id, raw_arguments, stdin=stdin)
+            return await run_in_worker(nl, guild_id, raw_arguments, stdin=stdin)
 
         case "sort":
             if guild_id is None and not stdin:
                 return TR(stderr=NO_DM_SUPPORT, exit_code=1)
 
-            return sort(guild_id, raw_arguments, stdin=stdin)
+            return await run_in_worker(sort, guild_id, raw_arguments, stdin=stdin)
 
         case "tail":
             if guild_id is None and not stdin:
                 return TR(stderr=NO_DM_SUPPORT, exit_code=1)
 
-            return get_lines(guild_id, raw_arguments, reverse=True, stdin=stdin)
+            return await run_in_worker(get_lines, guild_id, raw_arguments, reverse=True, stdin=stdin)
       
         case "uniq":
             if guild_id is None and not stdin:
                 return TR(stderr=NO_DM_SUPPORT, exit_code=1)
 
-            return uniq(guild_id, raw_arguments, stdin=stdin)
+            return await run_in_worker(uniq, guild_id, raw_arguments, stdin=stdin)
 
         case "tee":
             if guild_id is None:
                 return TR(stderr=NO_DM_SUPPORT, exit_code=1)
 
-            return tee(guild_id, raw_arguments, stdin=stdin) 
+            return await run_in_worker(tee, guild_id, raw_arguments, stdin=stdin) 
 
         case "wc":
             if guild_id is None and not stdin:
                 return TR(stderr=NO_DM_SUPPORT, exit_code=1)
 
-            return wc(guild_id, raw_arguments, stdin=stdin)
+            return await run_in_worker(wc, guild_id, raw_arguments, stdin=stdin)
 
         case _:
             return TR(stderr=f"`{command_name}` does not have pipeline support.", exit_code=2)
@@ -0,0 +1,107 @@
+# Runs functions on user input in separate worker processes that can be killed once they run past their deadline
+# Used for work that cannot be interrupted from a thread (regex backtracking, huge arithmetic)
+# Workers are started with `python -m src.process_worker` so they do not re-import the bot's main module
+
+from importlib import import_module
+from pathlib import Path
+from pickle import dump, load
+from select import select
+from subprocess import DEVNULL, PIPE, Popen
+from sys import executable, stdin, stdout
+from threading import Lock
+
+
+MAX_IDLE_WORKERS = 2            # Worker processes kept alive between calls
+MAX_WORKER_MEMORY = 1 << 30     # Bytes of address space a worker may use
+
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+
+IDLE_WORKERS = []
+WORKER_LOCK = Lock()
+
+
+class WorkerTimeout(TimeoutError):
+    pass
+
+
+# Handle to one worker process, requests and replies are pickled over its stdin/stdout
+class ProcessWorker:
+    def __init__(self):
+        self.process = Popen([executable, "-m", "src.process_worker"], stdin=PIPE, stdout=PIPE, stderr=DEVNULL, cwd=PROJECT_ROOT)
+
+    # Calls a module level function in the worker, exceptions raised by the function are raised here
+    # Raises WorkerTimeout if there is no reply within `timeout` seconds, the worker must then be killed
+    def run(self, func, args, timeout):
+        dump((func.__module__, func.__name__, args), self.process.stdin)
+        self.process.stdin.flush()
+
+        if not select([self.process.stdout], [], [], max(0, timeout))[0]:
+            raise WorkerTimeout(f"`{func.__name__}` took too long.")
+
+        succeeded, result = load(self.process.stdout)
+
+        if not succeeded:
+            raise result
+
+        return result
+
+    def kill(self):
+        self.process.kill()
+        self.process.wait()
+
+def checkout_worker():
+    with WORKER_LOCK:
+        while IDLE_WORKERS:
+            if (worker := IDLE_WORKERS.pop()).process.poll() is None:
+                return worker
+
+    return ProcessWorker()
+
+def return_worker(worker):
+    with WORKER_LOCK:
+        if len(IDLE_WORKERS) < MAX_IDLE_WORKERS:
+            IDLE_WORKERS.append(worker)
+            return
+
+    worker.kill()
+
+# Returns `func(*args)` computed in a worker process, which is killed if it takes longer than `timeout` seconds
+def run_killable(func, *args, timeout):
+    worker = checkout_worker()
+
+    try:
+        result = worker.run(func, args, timeout)
+    except WorkerTimeout:
+        worker.kill()
+        raise
+    except BaseException:
+        return_worker(worker)
+        raise
+
+    return_worker(worker)
+
+    return result
+
+def serve():
+    from resource import RLIMIT_AS, setrlimit
+
+    setrlimit(RLIMIT_AS, (MAX_WORKER_MEMORY, MAX_WORKER_MEMORY))
+    requests, replies = stdin.buffer, stdout.buffer
+
+    while True:
+        try:
+            module, name, args = load(requests)
+        except EOFError:
+            return
+
+        try:
+            reply = True, getattr(import_module(module), name)(*args)
+        except Exception as e:
+            reply = False, e
+
+        dump(reply, replies)
+        replies.flush()
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,88 @@
+# Matches user supplied regular expressions against lines of text without risking the bot's process
+# Literal patterns are matched in-process with plain substring checks, anything else is matched by a
+# worker process that is killed if it runs past the caller's deadline (catastrophic backtracking)
+
+from functools import lru_cache
+from itertools import batched
+from re import compile, IGNORECASE
+from time import monotonic
+
+from src.process_worker import checkout_worker, return_worker, WorkerTimeout
+from src.workers import DEFAULT_TIMEOUT, get_token
+
+
+CHUNK_LINES = 2048      # Lines sent to the worker per request
+REGEX_CHARS = frozenset(r".^$*+?{}[]\|()")
+
+
+class RegexTimeout(WorkerTimeout):
+    pass
+
+
+# Compiled patterns are cached in both the bot and the worker processes
+@lru_cache(maxsize=128)
+def compile_pattern(pattern, ignore_case=False):
+    return compile(pattern, IGNORECASE if ignore_case else 0)
+
+def is_literal(pattern):
+    return not REGEX_CHARS.intersection(pattern)
+
+# Returns the indices of the lines that match (or do not match, if `invert`)
+def match_chunk(pattern, ignore_case, lines, invert, fullmatch):
+    regex = compile_pattern(pattern, ignore_case)
+    method = regex.fullmatch if fullmatch else regex.search
+
+    return [i for i, line in enumerate(lines) if (method(line) is None) == invert]
+
+def match_literal(pattern, lines, ignore_case, invert, fullmatch):
+    if ignore_case:
+        pattern = pattern.lower()
+
+    for line in lines:
+        text = line.lower() if ignore_case else line
+
+        if ((text == pattern) if fullmatch else (pattern in text)) != invert:
+            yield line
+
+def match_in_worker(pattern, lines, ignore_case, invert, fullmatch, timeout):
+    token = get_token()
+    deadline = monotonic() + (token.remaining if token is not None else timeout)
+    worker = checkout_worker()
+
+    try:
+        for chunk in batched(lines, CHUNK_LINES):
+            if (remaining := deadline - monotonic()) <= 0:
+                raise RegexTimeout("Regular expression took too long to match.")
+
+            try:
+                matched = worker.run(match_chunk, (pattern, ignore_case, chunk, invert, fullmatch), remaining)
+            except WorkerTimeout:
+                raise RegexTimeout("Regular expression took too long to match.") from None
+
+            for i in matched:
+                yield chunk[i]
+    except GeneratorExit:
+        # Closed early (i.e. `grep -m`), the worker is idle between requests and can be reused
+        raise
+    except BaseException:
+        worker.kill()
+        worker = None
+        raise
+    finally:
+        if worker is not None:
+            return_worker(worker)
+
+# Returns an iterator over the lines matching `pattern`, raises re.error right away if the pattern is invalid
+# param     pattern - regular expression (or plain string) supplied by the user
+# param       lines - iterable of strings to match against
+# param ignore_case - case insensitive matching
+# param      invert - yield the lines that do not match instead
+# param   fullmatch - the whole line must match rather than any part of it
+# param     timeout - seconds allowed for matching when not running under a CancelToken
+def filter_lines(pattern, lines, ignore_case=False, invert=False, fullmatch=False, timeout=DEFAULT_TIMEOUT):
+    compile_pattern(pattern, ignore_case)
+
+    if is_literal(pattern):
+        return match_literal(pattern, lines, ignore_case, invert, fullmatch)
+
+    return match_in_worker(pattern, lines, ignore_case, invert, fullmatch, timeout)
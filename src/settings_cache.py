@@ -0,0 +1,139 @@
+from src.utils import get_cursor
+
+
+# Write-through cache of the per-user and per-channel settings read on every message
+# Rows are loaded lazily on first access and kept in sync by the commands that modify them,
+# so the common message path does not need to query the database
+# attr            conn - connection to the SQL database
+# attr    user_respond - user_id -> whether unprompted replies are allowed
+# attr channel_respond - channel_id -> whether unprompted replies are allowed
+# attr         genesis - channel_id -> list of custom genesis messages (empty if using the default)
+# attr     default_hat - channel_id -> the channel's default hat, None if it has not set one
+class SettingsCache:
+    def __init__(self, conn):
+        self.conn = conn
+        self.user_respond = {}
+        self.channel_respond = {}
+        self.genesis = {}
+        self.default_hat = {}
+
+    def fetch(self, query, params):
+        cursor = get_cursor(self.conn)
+        cursor.execute(query, params)
+        result = cursor.fetchall()
+        # Ends the read's transaction, otherwise its REPEATABLE READ snapshot stays open on the shared connection
+        self.conn.commit()
+        cursor.close()
+
+        return result
+
+    def get_user_respond(self, user_id):
+        if (respond := self.user_respond.get(user_id)) is None:
+            result = self.fetch("SELECT respond FROM Users WHERE user_id = %s", [user_id])
+            respond = self.user_respond[user_id] = bool(result[0][0]) if result else True
+
+        return respond
+
+    def get_channel_respond(self, channel_id):
+        if (respond := self.channel_respond.get(channel_id)) is None:
+            result = self.fetch("SELECT respond FROM Channels WHERE channel_id = %s", [channel_id])
+            respond = self.channel_respond[channel_id] = bool(result[0][0]) if result else True
+
+        return respond
+
+    def get_genesis(self, channel_id):
+        if (messages := self.genesis.get(channel_id)) is None:
+            result = self.fetch("SELECT content FROM Genesis WHERE channel_id = %s", [channel_id])
+            messages = self.genesis[channel_id] = [i[0] for i in result]
+
+        return messages
+
+    def get_default_hat(self, channel_id):
+        if channel_id not in self.default_hat:
+            result = self.fetch("SELECT default_hat FROM Channels WHERE channel_id = %s", [channel_id])
+            # Rows added for other channel settings leave default_hat NULL
+            self.default_hat[channel_id] = result[0][0] if result and result[0][0] else None
+
+        return self.default_hat[channel_id]
+
+    # Flips the respond flag for a user, returns the new value
+    def toggle_user_respond(self, user_id):
+        cursor = get_cursor(self.conn)
+        respond = False
+
+        cursor.execute("SELECT respond FROM Users WHERE user_id = %s", [user_id])
+
+        if not (result := cursor.fetchall()):
+            cursor.execute("INSERT INTO Users (user_id, respond) VALUES (%s, %s)", [user_id, 0])
+        elif result[0][0]:
+            cursor.execute("UPDATE Users SET respond = 0 WHERE user_id = %s", [user_id])
+        else:
+            cursor.execute("UPDATE Users SET respond = 1 WHERE user_id = %s", [user_id])
+            respond = True
+
+        self.conn.commit()
+        cursor.close()
+
+        self.user_respond[user_id] = respond
+
+        return respond
+
+    # Flips the respond flag for a channel, returns the new value
+    def toggle_channel_respond(self, channel_id):
+        cursor = get_cursor(self.conn)
+        respond = False
+
+        cursor.execute("SELECT respond FROM Channels WHERE channel_id = %s", [channel_id])
+
+        if not (result := cursor.fetchall()):
+            cursor.execute("INSERT INTO Channels (channel_id, respond) VALUES (%s, %s)", [channel_id, 0])
+        elif result[0][0]:
+            cursor.execute("UPDATE Channels SET respond = 0 WHERE channel_id = %s", [channel_id])
+        else:
+            cursor.execute("UPDATE Channels SET respond = 1 WHERE channel_id = %s", [channel_id])
+            respond = True
+
+        self.conn.commit()
+        cursor.close()
+
+        self.channel_respond[channel_id] = respond
+
+        return respond
+
+    # Replaces all genesis messages for a channel, passing None resets the channel to the default
+    def set_genesis(self, channel_id, content):
+        cursor = get_cursor(self.conn)
+
+        cursor.execute("DELETE FROM Genesis WHERE channel_id = %s", [channel_id])
+
+        if content is not None:
+            cursor.execute("INSERT INTO Genesis (channel_id, content) VALUES (%s, %s)", [channel_id, content])
+
+        self.conn.commit()
+        cursor.close()
+
+        self.genesis[channel_id] = [] if content is None else [content]
+
+    def add_genesis(self, channel_id, content):
+        cursor = get_cursor(self.conn)
+
+        cursor.execute("INSERT INTO Genesis (channel_id, content) VALUES (%s, %s)", [channel_id, content])
+
+        self.conn.commit()
+        cursor.close()
+
+        if channel_id in self.genesis:
+            self.genesis[channel_id].append(content)
+
+    def set_default_hat(self, channel_id, hat):
+        cursor = get_cursor(self.conn)
+
+        cursor.execute("INSERT INTO Channels (channel_id, default_hat)"
+                       "VALUES (%s, %s)"
+                       "ON DUPLICATE KEY UPDATE default_hat = VALUES(default_hat)",
+                       [channel_id, hat])
+
+        self.conn.commit()
+        cursor.close()
+
+        self.default_hat[channel_id] = hat
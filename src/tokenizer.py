@@ -0,0 +1,73 @@
+from functools import lru_cache
+from math import ceil
+from threading import Lock, Thread
+
+
+CHARS_PER_TOKEN = 4         # Rough average for English text with OpenAI's BPE encodings
+EXACT_THRESHOLD = 0.75      # Fraction of a budget after which approximate counts are no longer trusted
+STATIC_CACHE_SIZE = 1024    # Maximum number of memoized static strings (tools, genesis messages, etc.)
+
+
+# Lazily loads the tiktoken encoding for a model and provides exact, memoized, and approximate token counts
+# attr model - name of the OpenAI model whose encoding should be used
+class Tokenizer:
+    def __init__(self, model):
+        self.model = model
+        self._encoding = None
+        self._lock = Lock()
+        self._warmup_thread = None
+        self._count_static = lru_cache(maxsize=STATIC_CACHE_SIZE)(self.count)
+
+    @property
+    def encoding(self):
+        if self._encoding is None:
+            with self._lock:
+                if self._encoding is None:
+                    # Deferred so that importing this module does not pay the cost of loading the BPE ranks
+                    from tiktoken import encoding_for_model
+
+                    self._encoding = encoding_for_model(self.model)
+
+        return self._encoding
+
+    @property
+    def is_ready(self):
+        return self._encoding is not None
+
+    # Loads the encoding and pre-counts any given static strings on a background thread
+    # param static_texts - iterable of strings that will be counted repeatedly later on
+    def warmup(self, static_texts=()):
+        if self._warmup_thread is not None:
+            return
+
+        def run():
+            self.encoding
+
+            for text in static_texts:
+                self.count_static(text)
+
+        self._warmup_thread = Thread(target=run, name="tokenizer-warmup", daemon=True)
+        self._warmup_thread.start()
+
+    # Returns the exact number of tokens in a string
+    def count(self, text):
+        return len(self.encoding.encode(text))
+
+    # Returns the exact number of tokens in a string that is expected to be seen again (memoized)
+    def count_static(self, text):
+        return self._count_static(text)
+
+    # Returns a cheap estimate of the number of tokens in a string without encoding it
+    def approx_count(self, text):
+        return ceil(len(text) / CHARS_PER_TOKEN)
+
+    # Returns an approximate count while `used` is comfortably below `limit`, otherwise an exact count
+    # The estimate can undercount non-English text by several times, only use this for soft budgets such as cost targets
+    # param  text - string to count
+    # param  used - tokens already committed to the budget
+    # param limit - total token budget
+    def budget_count(self, text, used, limit):
+        if (estimate := self.approx_count(text)) + used < limit * EXACT_THRESHOLD:
+            return estimate
+
+        return self.count(text)
@@ -1,3 +1,6 @@
+from json import dumps
+
+
 tools = [
     {
         "type": "web_search"
@@ -100,17 +103,48 @@ ENUM_ITEM = 3
 FUNC_END = 12
 
 
-def get_tool_token_cost(tools, encoding):
+TOOL_COST_CACHE = {}
+
+
+# Returns the number of tokens the tool schemas add to a request, memoized per unique tool list
+# param     tools - list of tool schemas sent to OpenAI
+# param tokenizer - src.tokenizer.Tokenizer used to count the static schema strings
+def get_tool_token_cost(tools, tokenizer):
     if not tools:
         return 0
 
+    if (key := dumps(tools, sort_keys=True)) not in TOOL_COST_CACHE:
+        TOOL_COST_CACHE[key] = count_tool_tokens(tools, tokenizer)
+
+    return TOOL_COST_CACHE[key]
+
+# Returns every static string in the tool schemas that is counted by `get_tool_token_cost`
+def get_tool_strings(tools):
+    strings = []
+
+    for tool in tools:
+        if tool["type"] != "function":
+            continue
+
+        strings.append(f"{tool['name']}:{tool['description'].rstrip('.')}")
+
+        if "parameters" not in tool:
+            continue
+
+        for key, val in tool["parameters"]["properties"].items():
+            strings.extend(val.get("enum", []))
+            strings.append(f"{key}:{val['type']}:{val['description'].rstrip('.')}")
+
+    return strings
+
+def count_tool_tokens(tools, tokenizer):
     num_tokens = 0
 
     for tool in tools:
         if tool["type"] != "function":
             continue
             
-        num_tokens += FUNC_INIT + FUNC_END + len(encoding.encode(f"{tool['name']}:{tool['description'].rstrip('.')}"))
+        num_tokens += FUNC_INIT + FUNC_END + tokenizer.count_static(f"{tool['name']}:{tool['description'].rstrip('.')}")
         
         if "parameters" not in tool or not len(tool["parameters"]["properties"]):
             continue
@@ -124,9 +158,9 @@ def get_tool_token_cost(tools, encoding):
                 num_tokens += ENUM_INIT
 
                 for item in val["enum"]:
-                    num_tokens += ENUM_ITEM + len(encoding.encode(item))
+                    num_tokens += ENUM_ITEM + tokenizer.count_static(item)
 
-            num_tokens += len(encoding.encode(f"{key}:{val['type']}:{val['description'].rstrip('.')}"))
+            num_tokens += tokenizer.count_static(f"{key}:{val['type']}:{val['description'].rstrip('.')}")
 
         num_tokens += FUNC_END
 
@@ -1,6 +1,7 @@
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from random import randint
+from typing import Iterator
 
 
 MAX_TIME = timedelta(hours = 1)
@@ -30,20 +31,44 @@ class BoTracker:
         return True
 
 
+# Output of a terminal command
+# Commands that can stream set `lines` to an iterator of output lines instead of filling `stdout`,
+# the lines are only produced once the result is collected or consumed by the next pipeline stage
 @dataclass(slots=True)
 class TerminalResult:
     stdout: str = ''
     stderr: str = ''
     formatted_output: str = ''
     exit_code: int = 0
+    lines: Iterator[str] | None = None
     multi_send = False
 
     @property
     def succeeded(self):
         return self.exit_code == 0
 
+    # Returns an iterator over the output lines (including line endings) without joining them first
+    def iter_lines(self):
+        if self.lines is not None:
+            lines, self.lines = self.lines, None
+
+            return lines
+
+        return iter(self.stdout.splitlines(keepends=True))
+
+    # Drains any streamed lines into `stdout`
+    def collect(self):
+        if self.lines is not None:
+            self.stdout = ''.join(self.lines)
+            self.lines = None
+            self.formatted_output = f"```text\n{self.stdout}\n```"
+
+        return self
+
     async def send(self, ctx):
         from src.utils import package_message
+
+        self.collect()
         
         if self.stderr:
             await package_message(self.stderr, ctx, self.multi_send)
@@ -1,8 +1,8 @@
 from asyncio import get_running_loop, sleep
 import discord
+from functools import cache
 from json import loads
 from mysql.connector.errors import OperationalError
-from openai import OpenAI
 import os
 from pathlib import Path
 from random import choices, randint
@@ -13,8 +13,7 @@ from string import ascii_letters, digits
 
 from src.global_vars import FILE_ROOT_DIR, TEMP_DIR
 from src.util_objects import TerminalResult as TR
-
-OPENAI_CLIENT = OpenAI(api_key=os.getenv("CHATGPT_TOKEN"), organization=os.getenv("CHATGPT_ORG"))
+from src.workers import CHECK_INTERVAL, get_token
 
 SUPPORTED_FILE_FORMATS = (".jpg", ".jpeg", ".JPG", ".JPEG", ".png", ".PNG", ".gif", ".gifv", ".webm", ".mp4", ".wav")
 TTS_RAND_STR_LEN = 8
@@ -81,6 +80,39 @@ def get_flags(args, join=False, make_dic=False, no_args=None, plus_args=False, s
 
     return flags, not_flags
 
+# Parses short flags the way POSIX tools do. Flags can be combined (-ic), and only the flags in `value_flags` take a
+# value, either attached or as the next word (-m3, -m 3, -nk2). Everything after `--` is an argument
+# Returns (flag -> value or None, arguments), flags is None if a value is missing
+def get_short_flags(args, value_flags, shell=False):
+    words = split(args) if shell else args.split()
+    flags = {}
+    not_flags = []
+
+    while words:
+        if (word := words.pop(0)) == "--":
+            not_flags.extend(words)
+            break
+
+        if len(word) < 2 or word[0] != '-':
+            not_flags.append(word)
+            continue
+
+        for index, char in enumerate(word[1:], 2):
+            if char not in value_flags:
+                flags[char] = None
+                continue
+
+            if not (value := word[index:]):
+                if not words:
+                    return None, not_flags
+
+                value = words.pop(0)
+
+            flags[char] = value
+            break
+
+    return flags, not_flags
+
 def get_id_from_mention(mention):
     # regex101.com/r/OeJ1dG/1
     if not (match := search(r"<#(\d+)>", mention)):
@@ -114,24 +146,43 @@ def get_json_from_socket(auth):
     return json_data["content"]
 
 def get_lines_from_file(guild_id, filename, join=False, stdin=None):
-    if not stdin:
-        if not filename:
-            return TR(stderr="You must include a filename with this command.\nUse `$help uniq` for more usage information.")
+    if not (response := iter_lines_from_file(guild_id, filename, stdin=stdin)).succeeded:
+        return response
 
-        filename = filename.lower()
+    lines = list(response.lines)
 
-        if search(r"\W", filename):
-            return TR(stderr=f"Invalid filename: `{filename}`\nPlease only use word characters.", exit_code=1)
+    return TR(stdout=''.join(lines) if join else lines, exit_code=0)
 
-        try:
-            with open(f"{FILE_ROOT_DIR}/{guild_id}/{filename}.txt", "r") as in_file:
-                lines = in_file.readlines()
-        except FileNotFoundError:
-            return TR(stderr=f"No file named \"{filename}\" found! Try using `$tee` first.", exit_code=2)
-    else:
-        lines = stdin.splitlines(keepends=True)
+# Same as `get_lines_from_file`, but the result's `lines` is a lazy iterator
+# The file is opened immediately so that errors are reported before any output is consumed
+def iter_lines_from_file(guild_id, filename, stdin=None):
+    if stdin is not None:
+        return TR(lines=iter(stdin), exit_code=0)
 
-    return TR(stdout=''.join(lines) if join else lines, exit_code=0)
+    if not filename:
+        return TR(stderr="You must include a filename with this command.\nUse `$help uniq` for more usage information.", exit_code=1)
+
+    filename = filename.lower()
+
+    if search(r"\W", filename):
+        return TR(stderr=f"Invalid filename: `{filename}`\nPlease only use word characters.", exit_code=1)
+
+    try:
+        in_file = open(f"{FILE_ROOT_DIR}/{guild_id}/{filename}.txt", "r")
+    except FileNotFoundError:
+        return TR(stderr=f"No file named \"{filename}\" found! Try using `$tee` first.", exit_code=2)
+
+    return TR(lines=read_lines(in_file), exit_code=0)
+
+def read_lines(in_file):
+    token = get_token()
+
+    with in_file:
+        for count, line in enumerate(in_file):
+            if token is not None and not count % CHECK_INTERVAL:
+                token.check()
+
+            yield line
 
 def get_readme():
     with open("README.md", 'r') as infile:
@@ -206,8 +257,15 @@ def is_slash_command(ctx):
 def smart_typing(ctx):
     return ctx.interaction.channel.typing() if is_slash_command(ctx) else ctx.typing()
 
+# Created on first use, importing openai takes most of a second
+@cache
+def get_openai_client():
+    from openai import OpenAI
+
+    return OpenAI(api_key=os.getenv("CHATGPT_TOKEN"), organization=os.getenv("CHATGPT_ORG"))
+
 async def text_to_speech(text, client, voice=DEFAULT_TTS_VOICE, speed=DEFAULT_TTS_SPEED):
-    response = OPENAI_CLIENT.audio.speech.create(model="tts-1", input=text, voice=voice, speed=speed)
+    response = get_openai_client().audio.speech.create(model="tts-1", input=text, voice=voice, speed=speed)
 
     filename = f"output_{''.join(choices(ascii_letters + digits, k=TTS_RAND_STR_LEN))}.mp3"
     TTS_TEMP_FILE = f"{TEMP_DIR}/{filename}"
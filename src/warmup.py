@@ -0,0 +1,23 @@
+# Loads what commands defer until their first use, once the bot is connected and handling messages
+# Heavy client libraries are imported by the commands that need them so that start up (and with it the time until
+# the first command is handled) does not wait on them, the warmup then imports them in the background
+
+from importlib import import_module
+
+from src.utils import run_blocking
+
+
+# Ordered by how often the commands using them are used, the earliest commands benefit the most
+WARMUP_MODULES = ("openai", "dateparser", "wikipedia", "ddgs", "comics", "xkcd", "PIL.Image", "qrcode", "randfacts")
+
+
+async def warmup(bot):
+    # One module at a time, a thread importing holds the GIL for most of its import
+    for name in WARMUP_MODULES:
+        try:
+            await run_blocking(import_module, name)
+        except ImportError as e:
+            print(f"Warmup failed to import {name}: {e}")
+
+    if (utility := bot.get_cog("Utility")) is not None:
+        await utility.load_project_info()
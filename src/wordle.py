@@ -0,0 +1,180 @@
+# Word lists, feedback scoring and the hint solver for $wordle
+# Words are packed into integers, 5 bits per letter (first letter in the lowest bits), and feedback for a guess is
+# a pattern in base 3 (one digit per letter, the first letter being the lowest digit)
+
+from array import array
+from bisect import bisect_left
+from collections import Counter
+from math import log2
+from random import choice, Random
+
+
+SOLUTION_FILE_PATH = "./data/wordle_answers.txt"
+VALID_WORDS_FILE_PATH = "./data/wordle_valid_words.txt"
+WORD_LENGTH = 5
+MAX_GUESSES = 6
+
+ABSENT, PRESENT, CORRECT = range(3)
+STATUSES = ("absent", "present", "correct")
+SOLVED_PATTERN = sum(CORRECT * 3 ** i for i in range(WORD_LENGTH))
+
+LETTER_BITS = 5
+LETTER_MASK = (1 << LETTER_BITS) - 1
+POSITIONS = tuple((3 ** i, LETTER_BITS * i) for i in range(WORD_LENGTH))     # (pattern digit weight, letter shift)
+# Letter counts are kept 3 bits per letter in a single int while scoring
+COUNT_UNITS = tuple(1 << 3 * i for i in range(26))
+COUNT_MASKS = tuple(7 << 3 * i for i in range(26))
+
+FEEDBACK_CACHE_ROWS = 4096      # Rows of the guess x answer feedback table kept in memory (2,315 bytes each)
+HINT_BUDGET = 12_000            # Guess/answer pairs scored when looking for a hint
+MIN_HINT_POOL = 32              # Guesses scored for a hint, no matter how many answers remain
+# Best guess without any feedback, the highest entropy guess over every answer (precomputed, it never changes)
+OPENING_GUESS = "soare"
+
+
+def pack_word(word):
+    code = 0
+
+    for i, letter in enumerate(word):
+        code |= (ord(letter) - 97) << LETTER_BITS * i
+
+    return code
+
+def unpack_word(code):
+    return ''.join(chr(97 + (code >> shift & LETTER_MASK)) for _, shift in POSITIONS)
+
+# Returns the feedback pattern for `guess` against `answer`, both packed
+# Letters in the right spot are matched first, the remaining letters of the answer are then matched left to right
+def score_pattern(guess, answer):
+    pattern = 0
+    remaining = 0
+    misses = []
+
+    for weight, shift in POSITIONS:
+        if (letter := guess >> shift & LETTER_MASK) == (target := answer >> shift & LETTER_MASK):
+            pattern += CORRECT * weight
+        else:
+            remaining += COUNT_UNITS[target]
+            misses.append((weight, letter))
+
+    for weight, letter in misses:
+        if remaining & COUNT_MASKS[letter]:
+            pattern += PRESENT * weight
+            remaining -= COUNT_UNITS[letter]
+
+    return pattern
+
+def decode_pattern(pattern):
+    return [STATUSES[pattern // weight % 3] for weight, _ in POSITIONS]
+
+def load_word_file(path):
+    with open(path, 'r') as infile:
+        return {i.strip().lower() for i in infile if len(i.strip()) == WORD_LENGTH and i.strip().isalpha()}
+
+
+# Answers and valid guesses as sorted arrays of packed words
+class WordRepository:
+    def __init__(self, word_length=WORD_LENGTH):
+        self.word_length = word_length
+        self.answers = array('I')
+        self.guesses = array('I')
+        self.feedback = None
+
+        self.load_words()
+
+    def normalize_word(self, word):
+        word = word.strip().lower()
+
+        if len(word) != self.word_length or not word.isalpha() or not word.isascii():
+            return None
+
+        return word
+
+    def load_words(self):
+        answers = load_word_file(SOLUTION_FILE_PATH)
+        allowed = load_word_file(VALID_WORDS_FILE_PATH)
+
+        if not answers:
+            raise RuntimeError("No valid Wordle words could be loaded.")
+
+        self.answers = array('I', sorted(map(pack_word, answers)))
+        self.guesses = array('I', sorted(map(pack_word, allowed | answers)))
+        self.feedback = FeedbackTable(self.answers)
+
+    def is_valid_guess(self, guess):
+        if (guess := self.normalize_word(guess)) is None:
+            return False
+
+        code = pack_word(guess)
+        i = bisect_left(self.guesses, code)
+
+        return i < len(self.guesses) and self.guesses[i] == code
+
+    def random_solution(self):
+        return unpack_word(choice(self.answers))
+
+    # Every channel playing on the same day gets the same word, seeded by the date so it survives restarts
+    def daily_solution(self, day):
+        return unpack_word(self.answers[Random(day.toordinal()).randrange(len(self.answers))])
+
+    # Returns the packed answers that would have produced the same feedback for every previous guess
+    def candidates(self, guesses, word):
+        answer = pack_word(word)
+        indices = range(len(self.answers))
+
+        for guess in map(pack_word, guesses):
+            row = self.feedback.row(guess)
+            pattern = score_pattern(guess, answer)
+            indices = [i for i in indices if row[i] == pattern]
+
+        return [self.answers[i] for i in indices]
+
+    # Returns the guess that is expected to reveal the most information (entropy of its feedback) about the answer
+    # param candidates - packed answers still possible, as returned by `candidates`
+    def best_guess(self, candidates):
+        if len(candidates) == len(self.answers):
+            return OPENING_GUESS
+
+        if len(candidates) <= 2:
+            return unpack_word(candidates[0])
+
+        # Scoring every guess against every candidate is too slow, so guesses are first ranked by how evenly
+        # their letters split the candidates and only the best of them are scored exactly
+        pool = self.rank_guesses(candidates)[:max(MIN_HINT_POOL, HINT_BUDGET // len(candidates))]
+        possible = set(candidates)
+
+        return unpack_word(max(pool, key=lambda guess: (entropy(guess, candidates), guess in possible)))
+
+    def rank_guesses(self, candidates):
+        frequencies = Counter(letter for answer in candidates for letter in {answer >> shift & LETTER_MASK for _, shift in POSITIONS})
+        # A letter tells the most when it is in about half of the candidates
+        weights = [frequencies[i] * (len(candidates) - frequencies[i]) for i in range(26)]
+        possible = set(candidates)
+
+        def heuristic(guess):
+            return sum(weights[i] for i in {guess >> shift & LETTER_MASK for _, shift in POSITIONS}), guess in possible
+
+        return sorted(self.guesses, key=heuristic, reverse=True)
+
+
+# Feedback patterns of guesses against every answer, rows are computed the first time a guess is needed
+class FeedbackTable:
+    def __init__(self, answers):
+        self.answers = answers
+        self.rows = {}
+
+    def row(self, guess):
+        if (row := self.rows.get(guess)) is None:
+            if len(self.rows) >= FEEDBACK_CACHE_ROWS:
+                self.rows.pop(next(iter(self.rows)), None)
+
+            row = self.rows[guess] = bytes(score_pattern(guess, i) for i in self.answers)
+
+        return row
+
+# Entropy (in bits) of the feedback `guess` gets over `candidates`
+def entropy(guess, candidates):
+    counts = Counter(score_pattern(guess, i) for i in candidates)
+    total = len(candidates)
+
+    return log2(total) - sum(i * log2(i) for i in counts.values()) / total
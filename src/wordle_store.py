@@ -0,0 +1,119 @@
+from array import array
+from dataclasses import dataclass, field
+
+from src.utils import get_cursor
+from src.wordle import MAX_GUESSES, pack_word, unpack_word
+
+
+# Per-user results, updated as each game ends instead of being recounted from past games
+# attr       played - games finished by the user
+# attr          won - games won by the user
+# attr       streak - games won in a row, up to the user's latest game
+# attr   max_streak - longest streak the user has had
+# attr distribution - wins by the number of guesses used, index 0 being a win in one guess
+@dataclass
+class WordleStats:
+    played: int = 0
+    won: int = 0
+    streak: int = 0
+    max_streak: int = 0
+    distribution: list[int] = field(default_factory=lambda: [0] * MAX_GUESSES)
+
+    def record(self, won, guess_count):
+        self.played += 1
+
+        if not won:
+            self.streak = 0
+            return
+
+        self.won += 1
+        self.streak += 1
+        self.max_streak = max(self.max_streak, self.streak)
+        self.distribution[guess_count - 1] += 1
+
+
+# Write-behind store for ongoing Wordle games and player stats
+# Changes are only recorded in memory, `flush` writes everything changed since the last flush in one batch,
+# so a game costs no database round trips per guess. Words are stored packed, 4 bytes each
+# The WordleGames and WordleStats tables are part of setup/discord.sql (setup/migrations for existing databases)
+# attr         conn - connection to the SQL database
+# attr  dirty_games - channel_id -> game changed since the last flush, or None if the game ended
+# attr        stats - user_id -> WordleStats, loaded on first access
+# attr  dirty_stats - user_ids whose stats changed since the last flush
+class WordleStore:
+    def __init__(self, conn):
+        self.conn = conn
+        self.dirty_games = {}
+        self.stats = {}
+        self.dirty_stats = set()
+
+    # Returns (channel_id, word, guesses, daily) for every game that was ongoing when the bot last stopped
+    def load_games(self):
+        cursor = get_cursor(self.conn)
+        cursor.execute("SELECT channel_id, word, guesses, daily FROM WordleGames")
+        result = cursor.fetchall()
+        cursor.close()
+
+        return [(channel_id, unpack_word(word), [unpack_word(i) for i in array('I', bytes(guesses))], daily)
+                for channel_id, word, guesses, daily in result]
+
+    def save_game(self, channel_id, game):
+        self.dirty_games[channel_id] = game
+
+    def delete_game(self, channel_id):
+        self.dirty_games[channel_id] = None
+
+    def get_stats(self, user_id):
+        if (stats := self.stats.get(user_id)) is None:
+            cursor = get_cursor(self.conn)
+            cursor.execute("SELECT played, won, streak, max_streak, distribution FROM WordleStats WHERE user_id = %s", [user_id])
+            result = cursor.fetchall()
+            cursor.close()
+
+            if result:
+                played, won, streak, max_streak, distribution = result[0]
+                stats = WordleStats(played, won, streak, max_streak, list(array('I', bytes(distribution))))
+            else:
+                stats = WordleStats()
+
+            self.stats[user_id] = stats
+
+        return stats
+
+    def record_result(self, user_id, won, guess_count):
+        self.get_stats(user_id).record(won, guess_count)
+        self.dirty_stats.add(user_id)
+
+    # Writes every change since the last flush, games are read at this point so several guesses cost one write
+    def flush(self):
+        if not self.dirty_games and not self.dirty_stats:
+            return
+
+        games, self.dirty_games = self.dirty_games, {}
+        users, self.dirty_stats = self.dirty_stats, set()
+        saved = [(channel_id, pack_word(game.word), array('I', map(pack_word, game.guesses)).tobytes(), game.daily)
+                 for channel_id, game in games.items() if game is not None]
+        deleted = [channel_id for channel_id, game in games.items() if game is None]
+
+        cursor = get_cursor(self.conn)
+
+        try:
+            if saved:
+                cursor.executemany("REPLACE INTO WordleGames (channel_id, word, guesses, daily) VALUES (%s, %s, %s, %s)", saved)
+
+            if deleted:
+                cursor.execute(f"DELETE FROM WordleGames WHERE channel_id IN ({', '.join(['%s'] * len(deleted))})", deleted)
+
+            if users:
+                cursor.executemany("REPLACE INTO WordleStats (user_id, played, won, streak, max_streak, distribution) VALUES (%s, %s, %s, %s, %s, %s)",
+                                   [(i, (stats := self.stats[i]).played, stats.won, stats.streak, stats.max_streak,
+                                     array('I', stats.distribution).tobytes()) for i in users])
+
+            self.conn.commit()
+        except Exception:
+            # Keep the changes for the next flush, anything changed since then is newer
+            self.dirty_games = games | self.dirty_games
+            self.dirty_stats |= users
+            raise
+        finally:
+            cursor.close()
@@ -0,0 +1,75 @@
+# Runs blocking terminal work on a bounded thread pool so that file I/O and CPU heavy commands
+# do not stall the event loop (and with it the gateway heartbeat) for every guild
+
+from asyncio import CancelledError, get_running_loop, wait_for
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import ContextVar
+from time import monotonic
+
+from src.util_objects import TerminalResult as TR
+
+
+MAX_WORKERS = 4
+DEFAULT_TIMEOUT = 10    # Seconds a terminal command or pipeline may run before it is cancelled
+CHECK_INTERVAL = 1024   # Lines read between cancellation checks
+
+EXECUTOR = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="terminal")
+
+
+class WorkCancelled(Exception):
+    pass
+
+
+# Shared by every piece of work belonging to one command, long running loops call `check` periodically
+# so that work which has timed out (or whose caller went away) stops at the next check
+class CancelToken:
+    __slots__ = ("deadline", "cancelled")
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT):
+        self.deadline = monotonic() + timeout
+        self.cancelled = False
+
+    @property
+    def remaining(self):
+        return max(0, self.deadline - monotonic())
+
+    def check(self):
+        if self.cancelled or monotonic() > self.deadline:
+            self.cancelled = True
+            raise WorkCancelled
+
+
+CURRENT_TOKEN = ContextVar("CURRENT_TOKEN", default=None)
+
+
+# Returns the token of the work currently running, or None outside of a worker
+def get_token():
+    return CURRENT_TOKEN.get()
+
+# Runs `func` on the worker pool, raises TimeoutError if it has not finished within the token's deadline
+# param token - CancelToken to share with other work, defaults to the caller's token or a new one using `timeout`
+async def run_in_worker(func, *args, token=None, timeout=DEFAULT_TIMEOUT, **kwargs):
+    if token is None:
+        token = CURRENT_TOKEN.get() or CancelToken(timeout)
+
+    def run():
+        reset = CURRENT_TOKEN.set(token)
+
+        try:
+            return func(*args, **kwargs)
+        finally:
+            CURRENT_TOKEN.reset(reset)
+
+    try:
+        return await wait_for(get_running_loop().run_in_executor(EXECUTOR, run), token.remaining)
+    except (TimeoutError, CancelledError):
+        token.cancelled = True
+        raise
+
+# Runs a terminal command on the worker pool and collects its output there as well
+async def run_terminal_command(func, *args, timeout=DEFAULT_TIMEOUT, **kwargs):
+    try:
+        return await run_in_worker(lambda: func(*args, **kwargs).collect(), token=CancelToken(timeout))
+    except (TimeoutError, WorkCancelled):
+        return TR(stderr=f"`{func.__name__}` timed out after {timeout} seconds.", exit_code=124)
+